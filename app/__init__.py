@@ -1,22 +1,32 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from pathlib import Path
+import logging
 import os
 
+from app.utils.database import sqlite_engine_options
+
 # Create directories if they don't exist
 Path("db").mkdir(exist_ok=True)
 Path("app/static").mkdir(parents=True, exist_ok=True)
 Path("app/templates").mkdir(exist_ok=True)
 
+# Log level of scraper/helper messages outside of traced requests (DEBUG shows everything)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(), format='%(asctime)s %(levelname)s %(message)s')
+
 # Create Flask app
 app = Flask(__name__)
 
 # Configure database
 basedir = os.path.abspath(os.path.dirname(__file__))
 db_path = os.path.join(os.path.dirname(basedir), 'db', 'lyrics_finder.db')
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or f'sqlite:///{db_path}'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# WAL, busy timeout and a connection pool for SQLite (see app/utils/database.py for the environment overrides)
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite:///'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_engine_options()
+
 # Set a secret key for flash messages and sessions
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or 'lyraclipmap-secret-key'
 
@@ -24,3 +34,4 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or 'lyraclipmap-secret-k
 db = SQLAlchemy(app)
 
 from app import routes
+from app import commands
@@ -0,0 +1,321 @@
+import json
+import logging
+import os
+from datetime import timedelta
+
+import click
+
+from app import app
+from app.utils.benchmark import (
+    DEFAULT_FIXTURES_DIR,
+    benchmark_scrapers,
+    benchmark_parsing,
+    find_regressions,
+    load_cases,
+    get_case_function
+)
+from app.utils.parsers import HTML_PARSER
+from app.utils.replay import record_fixtures
+from app.utils import tracing
+from app.utils.backfill import DEFAULT_CHECKPOINT, backfill_lyrics
+from app.utils.revalidate import revalidate_lyrics
+from app.utils.migrations import migrate, migration_status
+from app.utils.orphans import collect_garbage
+from app.utils.library import export_library, import_library, open_library_file, read_ndjson, write_ndjson
+from app.utils.timing_import import PARSERS, parse_word_timings, save_word_timings, timing_format_for
+from app.utils.audio import AudioFormatError, local_audio_path
+from app.utils.waveform import waveform_for
+from app.utils.analysis import analyze_audio
+from app.utils.alignment import align_text
+from app.utils.montage import CROSSFADE_SECONDS, Montage
+from app.utils.clip_export import ClipExport
+from app.models.models import AudioSource, Clip, Song, TextContent
+
+def print_table(title: str, results: dict, columns: list):
+    """Print benchmark results as a plain text table"""
+    click.echo(f"\n{title}")
+    header = f"{'name':<36}" + "".join(f"{column:>14}" for column in columns)
+    click.echo(header)
+    click.echo("-" * len(header))
+    for name, values in results.items():
+        click.echo(f"{name:<36}" + "".join(f"{str(values.get(column, '')):>14}" for column in columns))
+
+def timed_text(text_id: int, song_id: int = None) -> TextContent:
+    """The text to store word timings in - a private copy for the song when other songs share it"""
+    text = TextContent.query.get(text_id)
+    if text is None:
+        raise click.ClickException(f"No text with id {text_id}")
+    song = None
+    if song_id is not None:
+        song = Song.query.get(song_id)
+        if song is None:
+            raise click.ClickException(f"No song with id {song_id}")
+    try:
+        return text.timed_for(song)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+@app.cli.command('bench-scrapers')
+@click.option('--fixtures', default=DEFAULT_FIXTURES_DIR, show_default=True, help='Directory with recorded fixtures and cases.json')
+@click.option('--repeat', default=10, show_default=True, help='Timed runs per case')
+@click.option('--provider', default=None, help='Only run cases of this provider')
+@click.option('--save', type=click.Path(), help='Write results as JSON (e.g. to use as a baseline)')
+@click.option('--baseline', type=click.Path(exists=True), help='Fail if results regressed compared to this JSON file')
+@click.option('--tolerance', default=0.25, show_default=True, help='Allowed relative growth before reporting a regression')
+@click.option('--check-time', is_flag=True, help='Also compare timings with the baseline (noisy on shared machines)')
+def bench_scrapers_command(fixtures, repeat, provider, save, baseline, tolerance, check_time):
+    """Benchmark lyrics and YouTube scrapers offline against recorded fixtures"""
+    results = {
+        'scrapers': benchmark_scrapers(fixtures, repeat, provider),
+        'parsing': benchmark_parsing(fixtures, repeat),
+        'partial_parsing': benchmark_parsing(fixtures, repeat, partial=True)
+    }
+
+    columns = ['mean_ms', 'min_ms', 'peak_kb', 'allocations', 'found']
+    print_table('Scrapers (replayed)', results['scrapers'], columns)
+    print_table('Full page parse (html.parser)', results['parsing'], ['size_kb'] + columns[:-1])
+    print_table(f'Provider parsers (strained, {HTML_PARSER})', results['partial_parsing'], ['size_kb'] + columns[:-1])
+
+    comparison = {}
+    for name, partial in results['partial_parsing'].items():
+        full = results['parsing'].get(name)
+        if full:
+            comparison[name] = {
+                'full_ms': full['min_ms'],
+                'partial_ms': partial['min_ms'],
+                'speedup': f"{full['min_ms'] / max(partial['min_ms'], 0.001):.1f}x",
+                'full_kb': full['peak_kb'],
+                'partial_kb': partial['peak_kb']
+            }
+    print_table('Full vs partial parsing (CPU and peak memory per page)', comparison,
+                ['full_ms', 'partial_ms', 'speedup', 'full_kb', 'partial_kb'])
+
+    for name, values in results['scrapers'].items():
+        if values['unrecorded_urls']:
+            click.echo(f"\n{name} requested URLs without fixtures:")
+            for url in values['unrecorded_urls']:
+                click.echo(f"  {url}")
+
+    if save:
+        with open(save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        click.echo(f"\nSaved results to {save}")
+
+    if baseline:
+        with open(baseline, encoding='utf-8') as f:
+            previous = json.load(f)
+        regressions = []
+        for section in ('scrapers', 'parsing', 'partial_parsing'):
+            regressions += find_regressions(results[section], previous.get(section, {}), tolerance, check_time)
+        if regressions:
+            click.echo("\nRegressions against baseline:")
+            for message in regressions:
+                click.echo(f"  {message}")
+            raise SystemExit(1)
+        click.echo("\nNo regressions against baseline")
+
+@app.cli.command('record-fixtures')
+@click.option('--fixtures', default=DEFAULT_FIXTURES_DIR, show_default=True, help='Directory to write fixtures to')
+@click.option('--case', 'case_names', multiple=True, help='Only record these cases (by name)')
+def record_fixtures_command(fixtures, case_names):
+    """Run benchmark cases against the live sites and save the responses as fixtures"""
+    with record_fixtures(fixtures):
+        for case in load_cases(fixtures):
+            if case_names and case['name'] not in case_names:
+                continue
+            click.echo(f"Recording {case['name']}...")
+            get_case_function(case)()
+
+@app.cli.command('backfill-lyrics')
+@click.option('--workers', default=4, show_default=True, help='Concurrent lyrics lookups')
+@click.option('--batch-size', default=20, show_default=True, help='Songs per commit and checkpoint')
+@click.option('--limit', type=int, default=None, help='Stop after this many songs')
+@click.option('--checkpoint', default=DEFAULT_CHECKPOINT, show_default=True, help='Progress file used to resume')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and scan all songs again (retries failures)')
+@click.option('--quiet', is_flag=True, help='Only show scraper warnings and errors')
+def backfill_lyrics_command(workers, batch_size, limit, checkpoint, restart, quiet):
+    """Fetch lyrics for songs that don't have any, resuming where the last run stopped"""
+    def report(progress):
+        click.echo(f"Processed {progress['processed']} songs (up to id {progress['last_song_id']}), "
+                   f"found {progress['found']}, skipped {progress['skipped']}, failed {len(progress['failed'])}", err=True)
+
+    if quiet:
+        tracing.logger.setLevel(logging.WARNING)
+    result = backfill_lyrics(workers, batch_size, checkpoint, limit, restart, progress=report)
+
+    click.echo(f"Done: {result['found']} of {result['processed']} songs got lyrics", err=True)
+
+@app.cli.command('revalidate-lyrics')
+@click.option('--older-than-days', default=7.0, show_default=True, help='Only check lyrics not checked for this many days')
+@click.option('--workers', default=4, show_default=True, help='Concurrent conditional requests')
+@click.option('--batch-size', default=50, show_default=True, help='Texts per commit')
+@click.option('--limit', type=int, default=None, help='Stop after this many texts')
+def revalidate_lyrics_command(older_than_days, workers, batch_size, limit):
+    """Refresh fetched lyrics whose source page changed, using conditional requests (run from cron)"""
+    def report(counts):
+        click.echo(f"Checked {counts['checked']}: {counts['not_modified']} not modified, "
+                   f"{counts['updated']} updated, {counts['unchanged']} unchanged, {counts['failed']} failed", err=True)
+
+    counts = revalidate_lyrics(timedelta(days=older_than_days), workers, batch_size, limit, progress=report)
+    report(counts)
+
+@app.cli.command('import-timestamps')
+@click.argument('text_id', type=int)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'timing_format', type=click.Choice(list(PARSERS)), default=None, help='Defaults to the file extension')
+@click.option('--rows', is_flag=True, help='Store WordTimestamp rows instead of a packed blob')
+@click.option('--song-id', type=int, default=None, help='Song to time a shared text for (it gets its own copy)')
+def import_timestamps_command(text_id, path, timing_format, rows, song_id):
+    """Replace the word timestamps of a text with a JSON, LRC or CSV file"""
+    text = timed_text(text_id, song_id)
+    timing_format = timing_format or timing_format_for(None, path)
+    if not timing_format:
+        raise click.ClickException("Cannot tell the format from the file name, pass --format")
+
+    with open(path, encoding='utf-8') as f:
+        try:
+            words = parse_word_timings(f.read(), timing_format)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    summary = save_word_timings(text, words, packed=not rows)
+    click.echo(f"Stored {summary['word_count']} words ({summary['start_time']:.2f}s - {summary['end_time']:.2f}s) as {summary['storage']}")
+
+@app.cli.command('align-timestamps')
+@click.argument('text_id', type=int)
+@click.argument('taps', nargs=-1, required=True)
+@click.option('--audio', type=click.Path(exists=True, dir_okay=False), default=None, help='Audio file to align to (default: the first local file of the text\'s songs)')
+@click.option('--rows', is_flag=True, help='Store WordTimestamp rows instead of a packed blob')
+@click.option('--song-id', type=int, default=None, help='Song to time a shared text for (it gets its own copy)')
+def align_timestamps_command(text_id, taps, audio, rows, song_id):
+    """Time all words of a text from tapped line starts given as LINE:SECONDS (lines count from 0)"""
+    text = timed_text(text_id, song_id)
+    try:
+        summary = align_text(text, [tap.split(':', 1) for tap in taps], audio, packed=not rows)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Aligned {summary['word_count']} words in {summary['line_count']} lines from {summary['tap_count']} taps "
+               f"({summary['start_time']:.2f}s - {summary['end_time']:.2f}s){'' if summary['audio'] else ' without audio'}")
+
+@app.cli.command('gc-orphans')
+@click.option('--batch-size', default=500, show_default=True, help='Rows deleted per transaction')
+@click.option('--vacuum-pages', type=int, default=None, help='Free at most this many pages (default: all)')
+@click.option('--no-vacuum', is_flag=True, help='Only delete orphans, keep the free pages in the file')
+def gc_orphans_command(batch_size, vacuum_pages, no_vacuum):
+    """Delete texts, audio sources and timestamps no song uses and shrink the database file"""
+    counts = collect_garbage(batch_size, vacuum_pages, vacuum=not no_vacuum,
+                             progress=lambda table, count: click.echo(f"{table}: {count} deleted", err=True))
+    reclaimed = counts.pop('reclaimed_bytes')
+    click.echo(f"Deleted {sum(counts.values())} orphaned rows, reclaimed {reclaimed / 1024:.1f} KB")
+
+@app.cli.command('export-library')
+@click.argument('path', default='-')
+@click.option('--batch-size', default=500, show_default=True, help='Songs read per query')
+def export_library_command(path, batch_size):
+    """Write all songs with texts, timestamps, audio sources and clips as NDJSON (.gz paths are compressed, - is stdout)"""
+    with open_library_file(path, 'w') as stream:
+        lines = write_ndjson(export_library(batch_size), stream)
+    click.echo(f"Exported {lines - 1} songs", err=True)
+
+@app.cli.command('import-library')
+@click.argument('path', default='-')
+@click.option('--batch-size', default=1000, show_default=True, help='Songs per transaction')
+def import_library_command(path, batch_size):
+    """Import songs from an export-library file; songs already stored (same title and artist) are skipped"""
+    def report(counts):
+        click.echo(f"Imported {counts['songs']} songs ({counts['skipped']} skipped), "
+                   f"{counts['texts']} new texts, {counts['audio_sources']} audio sources, {counts['clips']} clips", err=True)
+
+    with open_library_file(path) as stream:
+        try:
+            counts = import_library(read_ndjson(stream), batch_size, progress=report)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    report(counts)
+
+@app.cli.command('build-waveforms')
+@click.option('--source-id', type=int, default=None, help='Only this audio source')
+def build_waveforms_command(source_id):
+    """Build the envelope pyramids of local audio sources that don't have one yet"""
+    query = AudioSource.query.filter(AudioSource.source_type != 'youtube').order_by(AudioSource.id)
+    if source_id is not None:
+        query = query.filter(AudioSource.id == source_id)
+
+    built = 0
+    for source in query:
+        path = local_audio_path(source.url)
+        if path is None or not os.path.isfile(path):
+            continue
+        try:
+            if waveform_for(path, build=False) is None:
+                waveform = waveform_for(path)
+                built += 1
+                click.echo(f"{source.id}: {waveform.duration:.1f}s, {waveform.levels} levels", err=True)
+        except AudioFormatError as e:
+            click.echo(f"{source.id}: {e}", err=True)
+    click.echo(f"Built {built} waveforms")
+
+@app.cli.command('analyze-audio')
+@click.option('--workers', default=os.cpu_count() or 2, show_default='CPU count', help='Analysis processes')
+@click.option('--batch-size', default=8, show_default=True, help='Sources per commit')
+@click.option('--limit', type=int, default=None, help='Stop after this many sources')
+@click.option('--force', is_flag=True, help='Analyze again even if the file did not change')
+def analyze_audio_command(workers, batch_size, limit, force):
+    """Detect tempo, beats and sections of local audio sources"""
+    def report(counts):
+        click.echo(', '.join(f"{name} {count}" for name, count in counts.items()), err=True)
+
+    counts = analyze_audio(workers, batch_size, force, limit, progress=report)
+    click.echo(f"Analyzed {counts['analyzed']} sources, reused {counts['reused']}, {counts['cached']} unchanged")
+
+@app.cli.command('render-montage')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.argument('clip_ids', type=int, nargs=-1, required=True)
+@click.option('--crossfade', default=CROSSFADE_SECONDS, show_default=True, help='Crossfade between clips in seconds')
+@click.option('--sample-rate', type=int, default=None, help='Output sample rate (default: the first clip\'s)')
+def render_montage_command(path, clip_ids, crossfade, sample_rate):
+    """Write clips, in the given order, one after another to a WAV file"""
+    clips = []
+    for clip_id in clip_ids:
+        clip = Clip.query.get(clip_id)
+        if clip is None:
+            raise click.ClickException(f"No clip with id {clip_id}")
+        clips.append(clip)
+    try:
+        montage = Montage(clips, crossfade, sample_rate)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    montage.write(path)
+    click.echo(f"Wrote {len(montage.segments)} clips, {montage.duration:.1f}s at {montage.sample_rate} Hz to {path}")
+
+@app.cli.command('export-clip')
+@click.argument('clip_id', type=int)
+@click.argument('path', required=False)
+def export_clip_command(clip_id, path):
+    """Write a clip to a WAV file (by default named after the song and times)"""
+    clip = Clip.query.get(clip_id)
+    if clip is None:
+        raise click.ClickException(f"No clip with id {clip_id}")
+    try:
+        export = ClipExport(clip)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    path = path or export.filename
+    export.write(path)
+    click.echo(f"Wrote {export.frames / export.audio.sample_rate:.1f}s ({export.size} bytes) to {path}")
+
+db_cli = click.Group('db', help='Database schema migrations')
+app.cli.add_command(db_cli)
+
+@db_cli.command('upgrade')
+@click.option('--to', 'target', type=int, default=None, help='Stop after this migration version')
+def db_upgrade_command(target):
+    """Apply pending schema migrations"""
+    applied = migrate(target, progress=lambda migration: click.echo(f"Applying {migration.version} {migration.name}...", err=True))
+    click.echo(f"Applied {len(applied)} migrations" if applied else "Database schema is up to date")
+
+@db_cli.command('status')
+def db_status_command():
+    """List schema migrations and when they were applied"""
+    for migration in migration_status():
+        applied_at = migration['applied_at'] or 'pending'
+        click.echo(f"{migration['version']:>4}  {migration['name']:<36} {applied_at}")
@@ -1,6 +1,7 @@
 from app import app, db
+from app.utils.migrations import migrate
 
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all()
+        migrate()
     app.run(host='0.0.0.0', port=8000, debug=True)
@@ -0,0 +1,397 @@
+# Versioned schema changes, applied in order by `flask db upgrade` (see app/utils/migrations.py)
+#
+# Add new migrations at the end with the next version number and never edit
+# one that has been released - databases record which versions they have.
+# New databases are created from the models directly, so every change here
+# must also be reflected in app/models/models.py.
+
+import json
+from collections import Counter
+from typing import Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+
+from app.models.models import CLIP_INTERVALS_DDL
+from app.utils.artists import normalize_artist_name
+from app.utils.compression import compress_text, content_hash
+from app.utils.helpers import parse_youtube_video_id
+from app.utils.timestamps import WordTimings
+from app.utils.migrations import Migration, add_column, backfill, create_index, rebuild_table
+from app.utils.tracing import info
+
+def text_content_source(connection):
+    """Where fetched lyrics came from, for conditional revalidation"""
+    for column, column_type in [('source_url', 'VARCHAR'), ('etag', 'VARCHAR'), ('last_modified', 'VARCHAR'),
+                                ('fetched_at', 'DATETIME'), ('checked_at', 'DATETIME')]:
+        add_column(connection, 'text_contents', column, column_type)
+
+ASSOCIATION_TABLES = {
+    'song_text_association': ('text_content_id', 'text_contents'),
+    'song_audio_association': ('audio_source_id', 'audio_sources')
+}
+
+def association_primary_keys(connection):
+    """Composite primary keys on the association tables, dropping duplicate rows"""
+    for table, (child_column, child_table) in ASSOCIATION_TABLES.items():
+        if inspect(connection).get_pk_constraint(table)['constrained_columns']:
+            continue
+        removed = rebuild_table(connection, table, f'''
+            CREATE TABLE {table} (
+                song_id INTEGER NOT NULL,
+                {child_column} INTEGER NOT NULL,
+                PRIMARY KEY (song_id, {child_column}),
+                FOREIGN KEY(song_id) REFERENCES songs (id),
+                FOREIGN KEY({child_column}) REFERENCES {child_table} (id)
+            ) WITHOUT ROWID
+        ''', ['song_id', child_column], where=f'song_id IS NOT NULL AND {child_column} IS NOT NULL')
+        info("Rebuilt %s with a primary key, removed %s duplicate rows", table, removed)
+
+def hot_column_indexes(connection):
+    """Indexes for the reverse association lookups and frequently filtered columns"""
+    create_index(connection, 'ix_song_text_association_text_content_id', 'song_text_association', ['text_content_id', 'song_id'])
+    create_index(connection, 'ix_song_audio_association_audio_source_id', 'song_audio_association', ['audio_source_id', 'song_id'])
+    create_index(connection, 'ix_songs_artist', 'songs', ['artist'])
+    create_index(connection, 'ix_text_contents_content_type', 'text_contents', ['content_type'])
+    create_index(connection, 'ix_audio_sources_source_type', 'audio_sources', ['source_type'])
+    create_index(connection, 'ix_word_timestamps_text_content_id_start_time', 'word_timestamps', ['text_content_id', 'start_time'])
+
+def audio_source_video_id(connection):
+    """YouTube video ID stored with the audio source instead of parsed on every page view"""
+    add_column(connection, 'audio_sources', 'video_id', 'VARCHAR')
+
+def backfill_video_ids(connection):
+    backfill(connection, 'audio_sources', ['url'],
+             lambda row: {'video_id': parse_youtube_video_id(row['url'])},
+             where="video_id IS NULL AND source_type = 'youtube'")
+
+def artists_table(connection):
+    """Artist table with maintained song counts, linked from songs"""
+    connection.execute(text('''
+        CREATE TABLE IF NOT EXISTS artists (
+            id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            normalized_name VARCHAR NOT NULL,
+            aliases JSON NOT NULL,
+            song_count INTEGER NOT NULL,
+            last_added_at DATETIME,
+            PRIMARY KEY (id),
+            UNIQUE (normalized_name)
+        )
+    '''))
+    add_column(connection, 'songs', 'artist_id', 'INTEGER REFERENCES artists (id)')
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_songs_artist_id ON songs (artist_id)'))
+
+def link_songs_to_artists(connection):
+    """
+    One Artist per distinct normalized artist name - the most common spelling
+    becomes the display name, the others are kept as aliases
+    """
+    songs = connection.execute(text('SELECT id, artist FROM songs WHERE artist_id IS NULL')).all()
+    spellings = {}
+    for song_id, name in songs:
+        spellings.setdefault(normalize_artist_name(name), []).append((song_id, name))
+
+    for normalized, group in spellings.items():
+        counts = Counter(name for _, name in group)
+        artist = connection.execute(text('SELECT id, name, aliases FROM artists WHERE normalized_name = :normalized'),
+                                    {'normalized': normalized}).first()
+        if artist:
+            artist_id, name, aliases = artist.id, artist.name, json.loads(artist.aliases)
+        else:
+            name, aliases = counts.most_common(1)[0][0], []
+            artist_id = connection.execute(text(
+                "INSERT INTO artists (name, normalized_name, aliases, song_count) VALUES (:name, :normalized, '[]', 0)"
+            ), {'name': name, 'normalized': normalized}).lastrowid
+
+        aliases += sorted(spelling for spelling in counts if spelling != name and spelling not in aliases)
+        connection.execute(text(
+            'UPDATE artists SET aliases = :aliases, song_count = song_count + :count WHERE id = :id'
+        ), {'aliases': json.dumps(aliases), 'count': len(group), 'id': artist_id})
+        connection.execute(text('UPDATE songs SET artist_id = :artist_id WHERE id = :id'),
+                           [{'artist_id': artist_id, 'id': song_id} for song_id, _ in group])
+
+    info("Linked %s songs to %s artists", len(songs), len(spellings))
+
+def packed_word_timestamps_table(connection):
+    """Word timestamps of a text packed into one blob"""
+    connection.execute(text('''
+        CREATE TABLE IF NOT EXISTS packed_word_timestamps (
+            text_content_id INTEGER NOT NULL,
+            word_count INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (text_content_id),
+            FOREIGN KEY(text_content_id) REFERENCES text_contents (id)
+        )
+    '''))
+
+def pack_word_timestamps(connection, batch_size=50):
+    """Move WordTimestamp rows into packed blobs, one transaction per batch of texts"""
+    packed = 0
+    while True:
+        text_ids = connection.execute(text(
+            'SELECT DISTINCT text_content_id FROM word_timestamps WHERE text_content_id IS NOT NULL '
+            'ORDER BY text_content_id LIMIT :limit'
+        ), {'limit': batch_size}).scalars().all()
+        if not text_ids:
+            break
+
+        with connection.begin():
+            for text_id in text_ids:
+                rows = connection.execute(text(
+                    'SELECT word, start_time, end_time FROM word_timestamps WHERE text_content_id = :id ORDER BY start_time, id'
+                ), {'id': text_id}).all()
+                timings = WordTimings.from_words(rows)
+                connection.execute(text(
+                    'INSERT OR IGNORE INTO packed_word_timestamps (text_content_id, word_count, data) VALUES (:id, :count, :data)'
+                ), {'id': text_id, 'count': len(timings), 'data': timings.pack()})
+                connection.execute(text('DELETE FROM word_timestamps WHERE text_content_id = :id'), {'id': text_id})
+        packed += len(text_ids)
+
+    info("Packed word timestamps of %s texts", packed)
+
+def text_content_hash_columns(connection):
+    """Content hash for sharing identical texts, columns for compressed text"""
+    add_column(connection, 'text_contents', 'content_compressed', 'BLOB')
+    add_column(connection, 'text_contents', 'content_encoding', 'VARCHAR')
+    add_column(connection, 'text_contents', 'content_hash', 'VARCHAR')
+
+def _text_bytes(connection) -> int:
+    return connection.execute(text(
+        'SELECT COALESCE(SUM(LENGTH(CAST(content AS BLOB)) + COALESCE(LENGTH(content_compressed), 0)), 0) FROM text_contents'
+    )).scalar()
+
+def hash_and_compress_texts(connection):
+    """Hash every text and compress the large ones"""
+    before = _text_bytes(connection)
+
+    def compute(row):
+        data, encoding = compress_text(row['content'])
+        return {
+            'content_hash': content_hash(row['content']),
+            'content': '' if encoding else row['content'],
+            'content_compressed': data,
+            'content_encoding': encoding
+        }
+
+    count = backfill(connection, 'text_contents', ['content'], compute, where='content_hash IS NULL', batch_size=200)
+    after = _text_bytes(connection)
+    info("Hashed %s texts, compression reclaimed %.1f KB (%.1f KB -> %.1f KB)",
+         count, (before - after) / 1024, before / 1024, after / 1024)
+
+# Columns copied when a timed text gets a shared untimed twin
+TEXT_COPY_COLUMNS = ('content, content_compressed, content_encoding, content_hash, content_type, language, '
+                     'source_url, etag, last_modified, fetched_at, checked_at')
+
+# Texts with word timings in either storage
+TIMED_TEXT_SQL = ('(EXISTS (SELECT 1 FROM packed_word_timestamps p WHERE p.text_content_id = t.id) '
+                  'OR EXISTS (SELECT 1 FROM word_timestamps w WHERE w.text_content_id = t.id))')
+
+def _give_timed_texts_to_songs(connection) -> Tuple[int, int, int]:
+    """
+    Make every text with word timings private to one song (owner_song_id):
+    the first song using it keeps it, other songs move to the shared untimed
+    row of the same text, created when there is none. Timed texts no song
+    uses are deleted.
+    Returns the numbers of texts given to a song, songs moved and texts deleted
+    """
+    timed_ids = connection.execute(text(
+        f'SELECT id FROM text_contents t WHERE owner_song_id IS NULL AND {TIMED_TEXT_SQL} ORDER BY id'
+    )).scalars().all()
+
+    owned = moved = deleted = 0
+    for text_id in timed_ids:
+        ids = {'id': text_id}
+        song_ids = connection.execute(text(
+            'SELECT song_id FROM song_text_association WHERE text_content_id = :id ORDER BY song_id'
+        ), ids).scalars().all()
+        if not song_ids:
+            for table in ('packed_word_timestamps', 'word_timestamps'):
+                connection.execute(text(f'DELETE FROM {table} WHERE text_content_id = :id'), ids)
+            connection.execute(text('DELETE FROM text_contents WHERE id = :id'), ids)
+            deleted += 1
+            continue
+
+        ids['owner'] = song_ids[0]
+        connection.execute(text('UPDATE text_contents SET owner_song_id = :owner WHERE id = :id'), ids)
+        owned += 1
+        if len(song_ids) == 1:
+            continue
+
+        shared_id = connection.execute(text(
+            'SELECT t.id FROM text_contents t JOIN text_contents timed ON timed.id = :id '
+            'WHERE t.content_type = timed.content_type AND t.content_hash = timed.content_hash '
+            f'AND t.owner_song_id IS NULL AND NOT {TIMED_TEXT_SQL} ORDER BY t.id LIMIT 1'
+        ), ids).scalar()
+        if shared_id is None:
+            shared_id = connection.execute(text(
+                f'INSERT INTO text_contents ({TEXT_COPY_COLUMNS}) SELECT {TEXT_COPY_COLUMNS} FROM text_contents WHERE id = :id'
+            ), ids).lastrowid
+        ids['shared'] = shared_id
+        connection.execute(text(
+            'UPDATE OR IGNORE song_text_association SET text_content_id = :shared '
+            'WHERE text_content_id = :id AND song_id != :owner'
+        ), ids)
+        connection.execute(text('DELETE FROM song_text_association WHERE text_content_id = :id AND song_id != :owner'), ids)
+        moved += len(song_ids) - 1
+    return owned, moved, deleted
+
+def merge_duplicate_texts(connection):
+    """
+    Keep one shared row per identical text: duplicates without word timings
+    move their songs to the oldest of them. Timings belong to one recording,
+    so texts with timings are not merged - each stays with its song
+    (owner_song_id) and is never shared.
+    """
+    add_column(connection, 'text_contents', 'owner_song_id', 'INTEGER REFERENCES songs (id)')
+    before = _text_bytes(connection)
+    groups = connection.execute(text(
+        f'SELECT content_type, content_hash FROM text_contents t WHERE NOT {TIMED_TEXT_SQL} '
+        'GROUP BY content_type, content_hash HAVING COUNT(*) > 1'
+    )).all()
+
+    merged = 0
+    for content_type, digest in groups:
+        keep_id, *duplicate_ids = connection.execute(text(
+            'SELECT id FROM text_contents t WHERE content_type = :type AND content_hash = :hash '
+            f'AND NOT {TIMED_TEXT_SQL} ORDER BY id'
+        ), {'type': content_type, 'hash': digest}).scalars().all()
+        for duplicate_id in duplicate_ids:
+            ids = {'keep': keep_id, 'duplicate': duplicate_id}
+            connection.execute(text(
+                'UPDATE OR IGNORE song_text_association SET text_content_id = :keep WHERE text_content_id = :duplicate'
+            ), ids)
+            connection.execute(text('DELETE FROM song_text_association WHERE text_content_id = :duplicate'), ids)
+            connection.execute(text('DELETE FROM text_contents WHERE id = :duplicate'), ids)
+            merged += 1
+    owned, moved, deleted = _give_timed_texts_to_songs(connection)
+    info("Gave %s texts with word timings to their song (%s other songs moved to a shared copy, %s unused deleted)",
+         owned, moved, deleted)
+
+    after = _text_bytes(connection)
+    page_size = connection.execute(text('PRAGMA page_size')).scalar()
+    free_pages = connection.execute(text('PRAGMA freelist_count')).scalar()
+    info("Merged %s duplicate texts, reclaimed %.1f KB of text; %.1f KB of the database file is now free for reuse",
+         merged, (before - after) / 1024, free_pages * page_size / 1024)
+
+def unique_text_hash_index(connection):
+    create_index(connection, 'ix_text_contents_content_type_hash', 'text_contents', ['content_type', 'content_hash'],
+                 unique=True, where='owner_song_id IS NULL')
+
+def _file_size(connection) -> int:
+    return connection.exec_driver_sql('PRAGMA page_count').scalar() * connection.exec_driver_sql('PRAGMA page_size').scalar()
+
+def incremental_auto_vacuum(connection):
+    """
+    Switch the database to auto_vacuum = INCREMENTAL so the orphan GC can shrink
+    the file (flask gc-orphans). Changing the mode needs one full VACUUM, which
+    rewrites the whole file and blocks writers while it runs.
+    """
+    if connection.dialect.name != 'sqlite':
+        return
+    if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() == 2:
+        return
+    size_before = _file_size(connection)
+    connection.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+    connection.exec_driver_sql('VACUUM')
+    info("Rebuilt the database with incremental auto_vacuum (%.1f KB -> %.1f KB)",
+         size_before / 1024, _file_size(connection) / 1024)
+
+def song_text_summary(connection):
+    """
+    Add Song.has_lyrics and Song.languages and fill them from the linked texts
+    """
+    add_column(connection, 'songs', 'has_lyrics', 'BOOLEAN NOT NULL DEFAULT 0')
+    add_column(connection, 'songs', 'languages', "JSON NOT NULL DEFAULT '[]'")
+    connection.execute(text(
+        "UPDATE songs SET "
+        "has_lyrics = EXISTS (SELECT 1 FROM song_text_association a JOIN text_contents t ON t.id = a.text_content_id "
+        "WHERE a.song_id = songs.id AND t.content_type = 'lyrics'), "
+        "languages = (SELECT json_group_array(language) FROM (SELECT DISTINCT t.language FROM song_text_association a "
+        "JOIN text_contents t ON t.id = a.text_content_id WHERE a.song_id = songs.id "
+        "AND t.language IS NOT NULL AND t.language != 'unknown' ORDER BY t.language))"
+    ))
+
+def clips_table(connection):
+    """
+    Clips with their R*Tree interval index (skipped if SQLite lacks the R*Tree
+    module - clip queries then use the song_id/start_time index)
+    """
+    connection.execute(text(
+        'CREATE TABLE IF NOT EXISTS clips ('
+        'id INTEGER NOT NULL PRIMARY KEY, '
+        'song_id INTEGER NOT NULL REFERENCES songs (id), '
+        'start_time FLOAT NOT NULL, '
+        'end_time FLOAT NOT NULL, '
+        'title VARCHAR, '
+        'color VARCHAR, '
+        'tags JSON NOT NULL, '
+        'created_at DATETIME, '
+        'CONSTRAINT ck_clips_time_range CHECK (end_time > start_time AND start_time >= 0))'
+    ))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_clips_song_id_start_time ON clips (song_id, start_time)'))
+    if connection.dialect.name != 'sqlite':
+        return
+    try:
+        for statement in CLIP_INTERVALS_DDL:
+            connection.execute(text(statement))
+    except OperationalError as e:
+        info("Clip interval index not created, SQLite has no R*Tree module: %s", e)
+        return
+    connection.execute(text(
+        'INSERT OR IGNORE INTO clip_intervals SELECT id, start_time, end_time, song_id, song_id FROM clips'
+    ))
+
+def audio_features_table(connection):
+    connection.execute(text(
+        'CREATE TABLE IF NOT EXISTS audio_features ('
+        'audio_source_id INTEGER NOT NULL PRIMARY KEY REFERENCES audio_sources (id), '
+        'file_hash VARCHAR NOT NULL, '
+        'duration FLOAT NOT NULL, '
+        'tempo FLOAT, '
+        'beats BLOB NOT NULL, '
+        'sections JSON NOT NULL, '
+        'analyzed_at DATETIME)'
+    ))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_audio_features_file_hash ON audio_features (file_hash)'))
+
+def private_timed_texts(connection):
+    """
+    Databases merged before private copies existed: add owner_song_id and
+    limit the unique hash index to shared texts
+    """
+    with connection.begin():
+        add_column(connection, 'text_contents', 'owner_song_id', 'INTEGER REFERENCES songs (id)')
+        connection.execute(text('DROP INDEX IF EXISTS ix_text_contents_content_type_hash'))
+    unique_text_hash_index(connection)
+
+def timed_texts_owned_by_song(connection):
+    """
+    Databases merged before timed texts were private: give each text with
+    word timings to one song, so songs with the same lyrics stop sharing them
+    """
+    owned, moved, deleted = _give_timed_texts_to_songs(connection)
+    info("Gave %s texts with word timings to their song (%s other songs moved to a shared copy, %s unused deleted)",
+         owned, moved, deleted)
+
+MIGRATIONS = [
+    Migration(1, 'text_content_source', text_content_source),
+    Migration(2, 'association_primary_keys', association_primary_keys),
+    Migration(3, 'hot_column_indexes', hot_column_indexes, transactional=False),
+    Migration(4, 'audio_source_video_id', audio_source_video_id),
+    Migration(5, 'backfill_video_ids', backfill_video_ids, transactional=False),
+    Migration(6, 'artists_table', artists_table),
+    Migration(7, 'link_songs_to_artists', link_songs_to_artists),
+    Migration(8, 'packed_word_timestamps_table', packed_word_timestamps_table),
+    Migration(9, 'pack_word_timestamps', pack_word_timestamps, transactional=False),
+    Migration(10, 'text_content_hash_columns', text_content_hash_columns),
+    Migration(11, 'hash_and_compress_texts', hash_and_compress_texts, transactional=False),
+    Migration(12, 'merge_duplicate_texts', merge_duplicate_texts),
+    Migration(13, 'unique_text_hash_index', unique_text_hash_index, transactional=False),
+    Migration(14, 'incremental_auto_vacuum', incremental_auto_vacuum, transactional=False),
+    Migration(15, 'song_text_summary', song_text_summary),
+    Migration(16, 'clips_table', clips_table),
+    Migration(17, 'audio_features_table', audio_features_table),
+    Migration(18, 'private_timed_texts', private_timed_texts, transactional=False),
+    Migration(19, 'timed_texts_owned_by_song', timed_texts_owned_by_song)
+]
@@ -1,19 +1,61 @@
+from datetime import datetime
+
+from typing import Optional
+
+import numpy as np
+
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Session, validates
+
 from app import db
+from app.utils.artists import normalize_artist_name
+from app.utils.compression import compress_text, content_hash, decompress_text
+from app.utils.helpers import parse_youtube_video_id
+from app.utils.timestamps import WordTimings
 
 # Association table for many-to-many relationship between Song and TextContent
+# The composite primary key serves song -> texts lookups (and, without a rowid,
+# is the table itself), the index serves text -> songs lookups
 song_text_association = db.Table(
     'song_text_association',
-    db.Column('song_id', db.Integer, db.ForeignKey('songs.id')),
-    db.Column('text_content_id', db.Integer, db.ForeignKey('text_contents.id'))
+    db.Column('song_id', db.Integer, db.ForeignKey('songs.id'), primary_key=True),
+    db.Column('text_content_id', db.Integer, db.ForeignKey('text_contents.id'), primary_key=True),
+    db.Index('ix_song_text_association_text_content_id', 'text_content_id', 'song_id'),
+    sqlite_with_rowid=False
 )
 
 # Association table for many-to-many relationship between Song and AudioSource
 song_audio_association = db.Table(
     'song_audio_association',
-    db.Column('song_id', db.Integer, db.ForeignKey('songs.id')),
-    db.Column('audio_source_id', db.Integer, db.ForeignKey('audio_sources.id'))
+    db.Column('song_id', db.Integer, db.ForeignKey('songs.id'), primary_key=True),
+    db.Column('audio_source_id', db.Integer, db.ForeignKey('audio_sources.id'), primary_key=True),
+    db.Index('ix_song_audio_association_audio_source_id', 'audio_source_id', 'song_id'),
+    sqlite_with_rowid=False
 )
 
+class Artist(db.Model):
+    """
+    Represents an artist - all songs whose artist name normalizes to the same string
+    song_count and last_added_at are kept up to date by maintain_artist_aggregates
+    """
+    __tablename__ = 'artists'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)  # Display name (the first spelling seen)
+    normalized_name = db.Column(db.String, nullable=False, unique=True)  # See normalize_artist_name
+    aliases = db.Column(db.JSON, nullable=False, default=list)  # Other spellings used by songs
+    song_count = db.Column(db.Integer, nullable=False, default=0)
+    last_added_at = db.Column(db.DateTime)  # When the newest song was added
+    
+    # Relationships
+    songs = db.relationship("Song", backref="artist_record", lazy="dynamic")
+    
+    def __repr__(self):
+        return f"<Artist(name='{self.name}', song_count={self.song_count})>"
+
+
 class Song(db.Model):
     """
     Represents a song in the database
@@ -22,12 +64,60 @@ class Song(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String, nullable=False)
-    artist = db.Column(db.String, nullable=False)
+    artist = db.Column(db.String, nullable=False, index=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), index=True)  # Set from `artist` on flush
+    # Summary of the song's texts for list views, kept up to date by maintain_text_summaries
+    has_lyrics = db.Column(db.Boolean, nullable=False, default=False)
+    languages = db.Column(db.JSON, nullable=False, default=list)  # Sorted language codes of the texts
     
     # Relationships
     text_contents = db.relationship("TextContent", secondary=song_text_association, backref=db.backref("songs", lazy="dynamic"))
     audio_sources = db.relationship("AudioSource", secondary=song_audio_association, backref=db.backref("songs", lazy="dynamic"))
     
+    def get_text(self, content_type: str) -> Optional['TextContent']:
+        """
+        The song's first text of a type ("lyrics", ...), or None
+        """
+        for text in self.text_contents:
+            if text.content_type == content_type:
+                return text
+        return None
+    
+    def set_text(self, content_type: str, content: str, language: str = "unknown") -> 'TextContent':
+        """
+        Set the song's text of a type, returning the TextContent now linked to it
+        Identical texts are stored once, so a text shared with other songs is
+        never changed in place - the song is linked to another row instead.
+        """
+        text = self.get_text(content_type)
+        if text is not None and text.content == content:
+            return text
+        
+        if text is None:
+            new_text = TextContent.for_content(content, content_type, language)
+        elif text.id is not None and text.songs.count() > 1:
+            new_text = TextContent.for_content(content, content_type, text.language)
+        else:
+            new_text = TextContent.find_by_content(content, content_type)
+            if new_text is None:
+                # The timings were for the old words (callers drop the cached word index after committing)
+                text.content = content
+                text.clear_word_timings()
+                return text
+        
+        if text is not None:
+            self.text_contents.remove(text)
+        if new_text not in self.text_contents:
+            self.text_contents.append(new_text)
+        return new_text
+    
+    def update_text_summary(self):
+        """
+        Recompute has_lyrics and languages from the song's texts (without loading their content)
+        """
+        self.has_lyrics = any(text.content_type == "lyrics" for text in self.text_contents)
+        self.languages = sorted({text.language for text in self.text_contents if text.language and text.language != "unknown"})
+    
     def __repr__(self):
         return f"<Song(title='{self.title}', artist='{self.artist}')>"
 
@@ -38,12 +128,167 @@ class TextContent(db.Model):
     """
     __tablename__ = 'text_contents'
     
+    __table_args__ = (
+        # Identical texts are stored once (see for_content) - except private copies holding one song's timings
+        db.Index('ix_text_contents_content_type_hash', 'content_type', 'content_hash', unique=True,
+                 sqlite_where=db.text('owner_song_id IS NULL')),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
-    content = db.Column(db.Text, nullable=False)  # The actual text content
-    content_type = db.Column(db.String, nullable=False)  # E.g., "lyrics", "translation", "transcription"
+    # The text itself is only loaded when `content` is read - list views never need it.
+    # Where texts are displayed load it up front with undefer_group('content')
+    _content = db.deferred(db.Column('content', db.Text, nullable=False), group='content')  # Plain text, empty when compressed - use `content`
+    content_compressed = db.deferred(db.Column(db.LargeBinary), group='content')  # Compressed text (see app/utils/compression.py)
+    content_encoding = db.Column(db.String)  # "zlib", "zstd" or None for plain text
+    content_hash = db.Column(db.String)  # SHA-256 of the text
+    content_type = db.Column(db.String, nullable=False, index=True)  # E.g., "lyrics", "translation", "transcription"
     language = db.Column(db.String)  # Language code (e.g., "en", "pl")
+    # Set on texts holding one song's word timings (see timed_for) - they are never shared
+    owner_song_id = db.Column(db.Integer, db.ForeignKey('songs.id'))
+    
+    # Where fetched lyrics came from, used to revalidate them with conditional requests
+    source_url = db.Column(db.String)  # Page the text was scraped from
+    etag = db.Column(db.String)  # ETag header of that page
+    last_modified = db.Column(db.String)  # Last-Modified header of that page
+    fetched_at = db.Column(db.DateTime)  # When the text was last downloaded
+    checked_at = db.Column(db.DateTime)  # When the source was last revalidated
+    
+    # Relationships with WordTimestamp and PackedWordTimestamps defined in those classes
+    
+    @hybrid_property
+    def content(self) -> str:
+        """
+        The actual text content, compressed transparently when it is large
+        """
+        if self.content_encoding:
+            return decompress_text(self.content_compressed, self.content_encoding)
+        return self._content
+    
+    @content.setter
+    def content(self, value: str):
+        data, encoding = compress_text(value)
+        self._content = '' if encoding else value
+        self.content_compressed = data
+        self.content_encoding = encoding
+        self.content_hash = content_hash(value)
     
-    # Relationship with WordTimestamp defined in that class
+    @content.expression
+    def content(cls):
+        # Compressed rows are decompressed by a SQLite function, plain ones are read as they are
+        return db.case(
+            (cls.content_encoding.is_(None), cls._content),
+            else_=db.func.decompress_text(cls.content_compressed, cls.content_encoding)
+        )
+    
+    @classmethod
+    def find_by_content(cls, content: str, content_type: str) -> Optional['TextContent']:
+        """
+        The stored (or pending) shared text with exactly this content and type, or None
+        Texts with word timings belong to one recording and are never shared.
+        """
+        digest = content_hash(content)
+        for obj in db.session.new:
+            if (isinstance(obj, cls) and obj.content_type == content_type and obj.content_hash == digest
+                    and obj.owner_song_id is None and obj.packed_timestamps is None):
+                return obj
+        with db.session.no_autoflush:
+            return cls.query.filter(
+                cls.content_type == content_type,
+                cls.content_hash == digest,
+                cls.owner_song_id.is_(None),
+                ~cls.packed_timestamps.has(),
+                ~cls.timestamps.any()
+            ).first()
+    
+    @classmethod
+    def for_content(cls, content: str, content_type: str, language: str = "unknown") -> 'TextContent':
+        """
+        The existing text with this content and type, or a new one
+        Use it instead of the constructor so identical texts share a row
+        A new text is inserted right away in a savepoint: when another request
+        stored the same text first, the unique index rejects it and that row is used.
+        """
+        text = cls.find_by_content(content, content_type)
+        if text is not None:
+            return text
+        text = cls(content=content, content_type=content_type, language=language)
+        try:
+            with db.session.begin_nested():
+                db.session.add(text)
+        except IntegrityError:
+            text = cls.find_by_content(content, content_type)
+            if text is None:
+                raise
+        return text
+    
+    def replace_with(self, other: 'TextContent'):
+        """
+        Link all songs of this text to `other` instead
+        """
+        for song in self.songs.all():
+            song.text_contents.remove(self)
+            if other not in song.text_contents:
+                song.text_contents.append(other)
+    
+    def timed_for(self, song: Optional['Song'] = None) -> 'TextContent':
+        """
+        The text to store word timings of one song's recording in: this text,
+        made private to the song, when no other song uses it, otherwise a
+        private copy that replaces it in that song - timings never reach
+        songs that share the text, now or later
+        Raises ValueError when other songs share the text and no song is given,
+        or the song doesn't use it
+        """
+        songs = self.songs.all()
+        if not songs:
+            raise ValueError(f"Text {self.id} is not used by any song")
+        if song is None:
+            if len(songs) > 1:
+                raise ValueError(f"Text {self.id} is shared by {len(songs)} songs, choose the song to time")
+            song = songs[0]
+        if song not in songs:
+            raise ValueError(f"Song {song.id} does not use text {self.id}")
+        if len(songs) == 1:
+            self.owner_song_id = song.id
+            return self
+        
+        copy = TextContent(content=self.content, content_type=self.content_type, language=self.language,
+                           source_url=self.source_url, etag=self.etag, last_modified=self.last_modified,
+                           fetched_at=self.fetched_at, checked_at=self.checked_at, owner_song_id=song.id)
+        song.text_contents.remove(self)
+        song.text_contents.append(copy)
+        db.session.flush()
+        return copy
+    
+    def get_word_timings(self) -> WordTimings:
+        """
+        Word timestamps in time order - from the packed blob if there is one,
+        otherwise from WordTimestamp rows
+        """
+        if self.packed_timestamps is not None:
+            return WordTimings.unpack(self.packed_timestamps.data, self.id)
+        return WordTimings.from_rows(self.timestamps.order_by(WordTimestamp.start_time), self.id)
+    
+    def set_word_timings(self, timings: WordTimings):
+        """
+        Store word timestamps as one packed blob, replacing WordTimestamp rows of this text
+        """
+        if self.id is not None:
+            self.timestamps.delete(synchronize_session=False)
+        data = timings.pack()
+        if self.packed_timestamps is None:
+            self.packed_timestamps = PackedWordTimestamps(word_count=len(timings), data=data)
+        else:
+            self.packed_timestamps.word_count = len(timings)
+            self.packed_timestamps.data = data
+    
+    def clear_word_timings(self):
+        """
+        Drop all word timestamps of this text, e.g. when its words changed
+        """
+        if self.id is not None:
+            self.timestamps.delete(synchronize_session=False)
+        self.packed_timestamps = None
     
     def __repr__(self):
         return f"<TextContent(type='{self.content_type}', language='{self.language}')>"
@@ -57,7 +302,13 @@ class AudioSource(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     url = db.Column(db.String, nullable=False)  # URL or path to the audio
-    source_type = db.Column(db.String, nullable=False)  # E.g., "youtube", "mp3"
+    source_type = db.Column(db.String, nullable=False, index=True)  # E.g., "youtube", "mp3"
+    video_id = db.Column(db.String)  # YouTube video ID parsed from the URL, kept in sync by set_url
+    
+    @validates('url')
+    def set_url(self, key, url):
+        self.video_id = parse_youtube_video_id(url)
+        return url
     
     def __repr__(self):
         return f"<AudioSource(type='{self.source_type}', url='{self.url}')>"
@@ -68,6 +319,10 @@ class WordTimestamp(db.Model):
     Maps words to timestamps in the audio
     """
     __tablename__ = 'word_timestamps'
+    __table_args__ = (
+        # Timestamps are always read per text in time order
+        db.Index('ix_word_timestamps_text_content_id_start_time', 'text_content_id', 'start_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     word = db.Column(db.String, nullable=False)
@@ -76,9 +331,238 @@ class WordTimestamp(db.Model):
     text_content_id = db.Column(db.Integer, db.ForeignKey('text_contents.id'))
     
     # Relationships
-    text_content = db.relationship("TextContent", backref=db.backref("timestamps", lazy="dynamic"))
+    text_content = db.relationship("TextContent", backref=db.backref("timestamps", lazy="dynamic", cascade="all, delete"))
     
     def __repr__(self):
         return f"<WordTimestamp(word='{self.word}', start_time={self.start_time}, end_time={self.end_time})>"
 
 
+class PackedWordTimestamps(db.Model):
+    """
+    All word timestamps of one text in a single blob (see WordTimings for the layout)
+    Takes precedence over WordTimestamp rows - read it with TextContent.get_word_timings()
+    """
+    __tablename__ = 'packed_word_timestamps'
+    
+    text_content_id = db.Column(db.Integer, db.ForeignKey('text_contents.id'), primary_key=True)
+    word_count = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    
+    # Relationships
+    text_content = db.relationship("TextContent", backref=db.backref("packed_timestamps", uselist=False, cascade="all, delete-orphan"))
+    
+    def __repr__(self):
+        return f"<PackedWordTimestamps(text_content_id={self.text_content_id}, word_count={self.word_count})>"
+
+
+class AudioFeatures(db.Model):
+    """
+    Tempo, beats and sections of a local audio source (see app/utils/features.py)
+    file_hash is the content hash the analysis was made from - a changed file is analyzed again
+    """
+    __tablename__ = 'audio_features'
+    
+    audio_source_id = db.Column(db.Integer, db.ForeignKey('audio_sources.id'), primary_key=True)
+    file_hash = db.Column(db.String, nullable=False, index=True)
+    duration = db.Column(db.Float, nullable=False)  # Seconds
+    tempo = db.Column(db.Float)  # Beats per minute
+    beats = db.Column(db.LargeBinary, nullable=False)  # Beat times in seconds, little-endian float32
+    sections = db.Column(db.JSON, nullable=False, default=list)  # [{"start", "end", "label"}]
+    analyzed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    audio_source = db.relationship("AudioSource", backref=db.backref("features", uselist=False, cascade="all, delete-orphan"))
+    
+    @property
+    def beat_times(self) -> np.ndarray:
+        return np.frombuffer(self.beats, dtype='<f4')
+    
+    def to_dict(self):
+        return {
+            'audio_source_id': self.audio_source_id,
+            'duration': self.duration,
+            'tempo': self.tempo,
+            'beats': np.round(self.beat_times.astype(float), 3).tolist(),
+            'sections': self.sections,
+            'analyzed_at': self.analyzed_at.isoformat() if self.analyzed_at else None
+        }
+    
+    def __repr__(self):
+        return f"<AudioFeatures(audio_source_id={self.audio_source_id}, tempo={self.tempo})>"
+
+
+class Clip(db.Model):
+    """
+    A named time range of a song, e.g. a chorus or a favourite line
+    Clips are indexed by time in the clip_intervals R*Tree (see CLIP_INTERVALS_DDL)
+    """
+    __tablename__ = 'clips'
+    __table_args__ = (
+        db.CheckConstraint('end_time > start_time AND start_time >= 0', name='ck_clips_time_range'),
+        # Used when the R*Tree is not available and for listing a song's clips in time order
+        db.Index('ix_clips_song_id_start_time', 'song_id', 'start_time'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), nullable=False)
+    start_time = db.Column(db.Float, nullable=False)  # Start time in seconds
+    end_time = db.Column(db.Float, nullable=False)    # End time in seconds
+    title = db.Column(db.String)
+    color = db.Column(db.String)  # "#rrggbb"
+    tags = db.Column(db.JSON, nullable=False, default=list)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships - clips belong to one song and go with it
+    song = db.relationship("Song", backref=db.backref("clips", lazy="dynamic", cascade="all, delete-orphan"))
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'song_id': self.song_id,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'title': self.title,
+            'color': self.color,
+            'tags': self.tags or []
+        }
+    
+    def __repr__(self):
+        return f"<Clip(song_id={self.song_id}, start_time={self.start_time}, end_time={self.end_time})>"
+
+
+# SQLite R*Tree over (start_time, end_time) x song_id, kept in step with the clips
+# table by triggers, so bulk and raw SQL writes are indexed too. The R*Tree stores
+# float32 bounds rounded outwards - queries re-check the exact times on clips.
+CLIP_INTERVALS_DDL = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS clip_intervals USING rtree(id, start_time, end_time, song_min, song_max)',
+    'CREATE TRIGGER IF NOT EXISTS clips_after_insert AFTER INSERT ON clips BEGIN '
+    'INSERT INTO clip_intervals VALUES (new.id, new.start_time, new.end_time, new.song_id, new.song_id); END',
+    'CREATE TRIGGER IF NOT EXISTS clips_after_update AFTER UPDATE OF start_time, end_time, song_id ON clips BEGIN '
+    'UPDATE clip_intervals SET start_time = new.start_time, end_time = new.end_time, '
+    'song_min = new.song_id, song_max = new.song_id WHERE id = new.id; END',
+    'CREATE TRIGGER IF NOT EXISTS clips_after_delete AFTER DELETE ON clips BEGIN '
+    'DELETE FROM clip_intervals WHERE id = old.id; END'
+]
+
+for _statement in CLIP_INTERVALS_DDL:
+    event.listen(Clip.__table__, 'after_create', db.DDL(_statement).execute_if(dialect='sqlite'))
+
+
+def _artist_for_name(session: Session, name: str, pending: dict) -> Artist:
+    """
+    Find the Artist for a name or create it
+    `pending` caches artists looked up or created during the current flush
+    """
+    normalized = normalize_artist_name(name)
+    artist = pending.get(normalized)
+    if artist is None:
+        with session.no_autoflush:
+            artist = session.query(Artist).filter_by(normalized_name=normalized).first()
+        if artist is None:
+            artist = Artist(name=name, normalized_name=normalized, aliases=[], song_count=0)
+            session.add(artist)
+        pending[normalized] = artist
+
+    if name != artist.name and name not in artist.aliases:
+        artist.aliases = artist.aliases + [name]
+    return artist
+
+@event.listens_for(Session, 'before_flush')
+def maintain_artist_aggregates(session, flush_context, instances):
+    """
+    Link added/edited songs to their Artist and keep song_count and
+    last_added_at in step, as part of the same flush (and transaction)
+
+    Counts of existing artists are updated with "song_count = song_count + n"
+    so concurrent requests adding songs by one artist don't lose updates.
+    Bulk query.delete()/update() bypass this - fix counts with a migration.
+    """
+    pending = {}
+    deltas = {}
+    now = datetime.utcnow()
+
+    def move(song, old_artist, new_artist):
+        if old_artist is new_artist:
+            return
+        if old_artist is not None:
+            deltas[old_artist] = deltas.get(old_artist, 0) - 1
+        if new_artist is not None:
+            deltas[new_artist] = deltas.get(new_artist, 0) + 1
+            new_artist.last_added_at = now
+        song.artist_record = new_artist
+
+    for song in [obj for obj in session.new if isinstance(obj, Song)]:
+        if song.artist:
+            move(song, None, _artist_for_name(session, song.artist, pending))
+
+    for song in [obj for obj in session.dirty if isinstance(obj, Song)]:
+        if inspect(song).attrs.artist.history.has_changes():
+            with session.no_autoflush:
+                old_artist = song.artist_record
+            move(song, old_artist, _artist_for_name(session, song.artist, pending))
+
+    for song in [obj for obj in session.deleted if isinstance(obj, Song)]:
+        with session.no_autoflush:
+            old_artist = song.artist_record
+        if old_artist is not None:
+            deltas[old_artist] = deltas.get(old_artist, 0) - 1
+
+    for artist, delta in deltas.items():
+        if not delta:
+            continue
+        if inspect(artist).persistent:
+            artist.song_count = Artist.song_count + delta
+        else:
+            artist.song_count = (artist.song_count or 0) + delta
+
+@event.listens_for(Session, 'before_flush')
+def delete_exclusive_children(session, flush_context, instances):
+    """
+    Delete the texts and audio sources of deleted songs that no other song
+    uses (their word timestamps follow through the ORM cascade)
+
+    Texts are shared between songs with identical lyrics, so the relationships
+    cannot simply cascade. Rows orphaned some other way (bulk deletes, older
+    versions) are removed by app/utils/orphans.py.
+    """
+    deleted_songs = [obj for obj in session.deleted if isinstance(obj, Song)]
+    if not deleted_songs:
+        return
+    deleted_ids = [song.id for song in deleted_songs]
+
+    # Children linked to songs added or edited in this flush are not orphans even if the link isn't stored yet
+    kept = set()
+    with session.no_autoflush:
+        for song in session.new | session.dirty:
+            if isinstance(song, Song) and song not in session.deleted:
+                kept.update(song.text_contents)
+                kept.update(song.audio_sources)
+
+        for song in deleted_songs:
+            for child in list(song.text_contents) + list(song.audio_sources):
+                if child in kept or child in session.deleted or child.id is None:
+                    continue
+                if child.songs.filter(Song.id.notin_(deleted_ids)).count() == 0:
+                    session.delete(child)
+
+@event.listens_for(Session, 'before_flush')
+def maintain_text_summaries(session, flush_context, instances):
+    """
+    Keep Song.has_lyrics and Song.languages in step with the songs' texts:
+    for new songs, songs whose texts were linked or unlinked, and songs of
+    texts whose type or language changed
+    """
+    songs = set()
+    with session.no_autoflush:
+        for obj in session.new | session.dirty:
+            if isinstance(obj, Song):
+                if obj in session.new or inspect(obj).attrs.text_contents.history.has_changes():
+                    songs.add(obj)
+            elif isinstance(obj, TextContent) and obj not in session.new:
+                attrs = inspect(obj).attrs
+                if attrs.content_type.history.has_changes() or attrs.language.history.has_changes():
+                    songs.update(obj.songs.all())
+
+        for song in songs:
+            if song not in session.deleted:
+                song.update_text_summary()
@@ -1,16 +1,42 @@
-from flask import render_template, request, redirect, url_for, abort, flash
+import math
+import os
+
+from flask import render_template, request, redirect, url_for, abort, flash, Response, jsonify, stream_with_context
 from sqlalchemy import or_, desc
+from sqlalchemy.orm import selectinload
 from app import app, db
-from app.models.models import Song, TextContent, AudioSource
-import urllib.parse
+from app.models.models import Artist, Clip, Song, TextContent, AudioSource
 from app.utils.helpers import (
     extract_youtube_info,
     get_youtube_embed_html,
+    parse_youtube_video_id,
     search_for_lyrics,
+    find_lyrics,
     search_tekstowo,
     format_song_title,
     format_youtube_title
 )
+from app.utils.artists import normalize_artist_name
+from app.utils.audio import AudioFormatError, local_audio_path
+from app.utils.clips import check_time_range, clip_fields, clips_at, clips_overlapping
+from app.utils.library import export_library, ndjson_lines
+from app.utils.playback import delta_timings, packed_timings, word_indexes, words_at
+from app.utils.providers import lyrics_providers
+from app.utils.revalidate import record_lyrics_source
+from app.utils.timing_import import parse_word_timings, save_word_timings, timing_format_for
+from app.utils.tracing import start_trace, debug, info, warning, error
+from app.utils.waveform import waveform_for
+from app.utils.analysis import features_for
+from app.utils.alignment import align_text, lyric_lines, parse_taps
+from app.utils.montage import CROSSFADE_SECONDS, Montage
+from app.utils.clip_export import ClipExport
+
+def with_text_content():
+    """
+    Query option loading a song's texts including their (deferred) content in one extra query
+    Use it where lyrics are displayed
+    """
+    return selectinload(Song.text_contents).undefer_group('content')
 
 @app.route('/')
 def home():
@@ -58,16 +84,22 @@ def search_autocomplete():
     # Search for artists
     if len(results) < limit:
         remaining = limit - len(results)
-        artists = db.session.query(Song.artist, db.func.count(Song.id).label('song_count')).filter(
-            Song.artist.ilike(f"%{query}%")
-        ).group_by(Song.artist).order_by(db.desc('song_count')).limit(remaining).all()
+        # Song counts are maintained on the Artist rows, no GROUP BY over songs needed
+        artists = Artist.query.filter(
+            Artist.song_count > 0,
+            or_(
+                Artist.name.ilike(f"%{query}%"),
+                Artist.normalized_name.contains(normalize_artist_name(query))
+            )
+        ).order_by(desc(Artist.song_count)).limit(remaining).all()
         
-        for artist, count in artists:
+        for artist in artists:
+            count = artist.song_count
             results.append({
                 "type": "artist",
-                "title": artist,
+                "title": artist.name,
                 "subtitle": f"{count} song{'s' if count > 1 else ''}",
-                "query": artist
+                "query": artist.name
             })
             
     # Search for lyrics (lowest priority but still useful)
@@ -93,7 +125,7 @@ def search_autocomplete():
 @app.route('/song/<int:song_id>')
 def view_song(song_id):
     """View a specific song with its lyrics and embedded YouTube player"""
-    song = Song.query.get_or_404(song_id)
+    song = Song.query.options(with_text_content()).get_or_404(song_id)
     
     # Get YouTube embed HTML if available
     youtube_embed = None
@@ -143,15 +175,16 @@ def add_song():
         song = Song(title=title, artist=artist)
         
         # Add lyrics - try to fetch from multiple sources if not provided
+        lyrics_result = None
         if not lyrics:
-            lyrics = search_for_lyrics(artist, title)
+            lyrics_result = find_lyrics(artist, title)
+            lyrics = lyrics_result['lyrics'] if lyrics_result else None
         
         if lyrics:
-            lyrics_content = TextContent(
-                content=lyrics,
-                content_type="lyrics",
-                language="unknown"
-            )
+            # Reuses the stored text if the same lyrics were added before
+            lyrics_content = TextContent.for_content(lyrics, "lyrics")
+            if lyrics_result:
+                record_lyrics_source(lyrics_content, lyrics_result)
             song.text_contents.append(lyrics_content)
         
         # Add YouTube link
@@ -173,7 +206,7 @@ def add_song():
 @app.route('/edit/<int:song_id>', methods=['GET', 'POST'])
 def edit_song(song_id):
     """Edit an existing song"""
-    song = Song.query.get_or_404(song_id)
+    song = Song.query.options(with_text_content()).get_or_404(song_id)
     
     if request.method == 'GET':
         # Get lyrics if available
@@ -200,25 +233,19 @@ def edit_song(song_id):
         song.title = request.form.get('title', song.title)
         song.artist = request.form.get('artist', song.artist)
         
+        # Lyrics edited in place lose their word timings, so their cached word index goes too
+        old_lyrics = song.get_text("lyrics")
+        
         # Update lyrics if provided
         new_lyrics = request.form.get('lyrics')
         if new_lyrics:
-            # Check if lyrics already exist
-            lyrics_exists = False
-            for text in song.text_contents:
-                if text.content_type == "lyrics":
-                    text.content = new_lyrics
-                    lyrics_exists = True
-                    break
-            
-            # If no lyrics exist, create new
-            if not lyrics_exists:
-                lyrics_content = TextContent(
-                    content=new_lyrics,
-                    content_type="lyrics",
-                    language="unknown"
-                )
-                song.text_contents.append(lyrics_content)
+            text = song.get_text("lyrics")
+            if text is None or text.content != new_lyrics:
+                text = song.set_text("lyrics", new_lyrics)
+                # Edited by hand - don't let revalidation overwrite it with the source page.
+                # A text other songs share was fetched for them, so its source stays.
+                if text.id is None or text.songs.filter(Song.id != song.id).count() == 0:
+                    text.source_url = None
         
         # Update YouTube URL if provided
         new_youtube_url = request.form.get('youtube_url')
@@ -249,28 +276,17 @@ def edit_song(song_id):
         # Check if this is a fetch lyrics request
         if 'fetch_lyrics' in request.form and request.form.get('fetch_lyrics') == '1':
             # Try to fetch lyrics
-            lyrics = search_for_lyrics(song.artist, song.title)
+            lyrics_result = find_lyrics(song.artist, song.title)
             
-            if lyrics:
-                # Check if lyrics already exist
-                lyrics_exists = False
-                for text in song.text_contents:
-                    if text.content_type == "lyrics":
-                        text.content = lyrics
-                        lyrics_exists = True
-                        break
-                
-                # If no lyrics exist, create new
-                if not lyrics_exists:
-                    lyrics_content = TextContent(
-                        content=lyrics,
-                        content_type="lyrics",
-                        language="unknown"
-                    )
-                    song.text_contents.append(lyrics_content)
+            if lyrics_result:
+                # Replaces existing lyrics or adds new ones
+                text = song.set_text("lyrics", lyrics_result['lyrics'])
+                record_lyrics_source(text, lyrics_result)
                 
                 # Save changes
                 db.session.commit()
+                if old_lyrics is not None:
+                    word_indexes.invalidate(old_lyrics.id)
                 
                 # Return user to edit page with success message
                 return redirect(url_for('edit_song', song_id=song.id) + '?lyrics_fetched=1')
@@ -280,6 +296,8 @@ def edit_song(song_id):
         
         # Save changes
         db.session.commit()
+        if old_lyrics is not None:
+            word_indexes.invalidate(old_lyrics.id)
         return redirect(url_for('view_song', song_id=song.id))
         
     except Exception as e:
@@ -287,58 +305,46 @@ def edit_song(song_id):
         
 @app.route('/api/fetch_lyrics', methods=['POST'])
 def fetch_lyrics_api():
-    """API endpoint to fetch lyrics"""
-    import sys
-    import io
+    """
+    API endpoint to fetch lyrics
+    Pass "debug": true to get the search log and per-stage timings back
+    """
     import traceback
     
     try:
         artist = request.json.get('artist')
         title = request.json.get('title')
+        debug_requested = bool(request.json.get('debug')) or request.args.get('debug') == '1'
         
         if not artist or not title:
             return {"error": "Artist and title are required"}, 400
         
-        # Capture stdout to get all debugging information
-        old_stdout = sys.stdout
-        mystdout = io.StringIO()
-        sys.stdout = mystdout
+        response = {
+            "artist": artist,
+            "title": title
+        }
         
-        try:
-            print(f"API Request: Fetching lyrics for: {artist} - {title}")
+        if debug_requested:
+            # Collect this request's log and timings only - other requests keep their own
+            with start_trace() as trace:
+                info("API Request: Fetching lyrics for: %s - %s", artist, title)
+                lyrics = search_for_lyrics(artist, title)
+            response["debug_log"] = trace.format_log()
+            response["timings"] = trace.stage_summary()
+        else:
             lyrics = search_for_lyrics(artist, title)
-            
-            # Get the captured output
-            debug_output = mystdout.getvalue()
-            
-            # Return to normal stdout
-            sys.stdout = old_stdout
-            
-            if lyrics:
-                return {
-                    "success": True,
-                    "lyrics": lyrics,
-                    "debug_log": debug_output,
-                    "artist": artist,
-                    "title": title
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": "No lyrics found",
-                    "debug_log": debug_output,
-                    "artist": artist,
-                    "title": title
-                }, 404
-                
-        finally:
-            # Make sure we restore stdout even if there's an exception
-            sys.stdout = old_stdout
+        
+        if lyrics:
+            response.update({"success": True, "lyrics": lyrics})
+            return response
+        else:
+            response.update({"success": False, "error": "No lyrics found"})
+            return response, 404
             
     except Exception as e:
         tb = traceback.format_exc()
-        print(f"Error fetching lyrics: {str(e)}")
-        print(tb)
+        error("Error fetching lyrics: %s", e)
+        error(tb)
         return {
             "error": str(e),
             "traceback": tb,
@@ -346,14 +352,338 @@ def fetch_lyrics_api():
             "title": title if 'title' in locals() else None
         }, 400
 
+@app.route('/api/lyrics/providers')
+def lyrics_providers_api():
+    """API endpoint with hit rate and latency statistics of lyrics providers"""
+    return {"providers": lyrics_providers.snapshot()}, 200
+
+@app.route('/api/texts/<int:text_id>/timestamps', methods=['GET'])
+def get_timestamps_api(text_id):
+    """API endpoint with all word timestamps of a text"""
+    text = TextContent.query.get_or_404(text_id)
+    return {"text_content_id": text.id, "words": text.get_word_timings().to_dicts()}, 200
+
+@app.route('/api/texts/<int:text_id>/timestamps/at')
+def timestamps_at_api(text_id):
+    """
+    API endpoint for synced playback: the word sung at ?t= seconds and the
+    next ?count= words (optionally only those starting within ?window= seconds)
+    """
+    try:
+        at = float(request.args['t'])
+        count = int(request.args.get('count', 5))
+        window = float(request.args['window']) if 'window' in request.args else None
+        if not math.isfinite(at) or (window is not None and not math.isfinite(window)):
+            raise ValueError(at)
+    except (KeyError, ValueError):
+        return {"error": "Pass the time in seconds as ?t="}, 400
+    
+    result = words_at(text_id, at, count, window)
+    if result is None:
+        abort(404)
+    return result, 200
+
+def sync_timings_response(text_id):
+    """
+    Compact word timings of a text with an ETag, so an unchanged text costs a 304
+    The binary form also answers Range requests, the JSON form takes ?start=/?end= seconds
+    """
+    if request.args.get('format', 'binary') == 'binary':
+        data = packed_timings(text_id)
+        if data is None:
+            abort(404)
+        response = Response(data, mimetype='application/octet-stream')
+        response.accept_ranges = 'bytes'
+        accept_ranges = True
+    else:
+        try:
+            start = float(request.args['start']) if 'start' in request.args else None
+            end = float(request.args['end']) if 'end' in request.args else None
+        except ValueError:
+            response = jsonify({"error": "start and end must be numbers of seconds"})
+            response.status_code = 400
+            return response
+        result = delta_timings(text_id, start, end)
+        if result is None:
+            abort(404)
+        response = jsonify(result)
+        accept_ranges = False
+
+    # Timings can be replaced at any time - let clients cache them but revalidate by ETag
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request, accept_ranges=accept_ranges, complete_length=response.content_length)
+
+@app.route('/api/texts/<int:text_id>/timestamps/sync')
+def sync_timestamps_api(text_id):
+    """
+    API endpoint with a text's word timings for synced players, much smaller than the JSON word list
+    ?format=binary (default) is the packed layout: header, float32 starts, float32 ends,
+    uint32 word offsets, UTF-8 words - players can fetch the header and start times
+    first, then only the byte ranges of the words near the playhead.
+    ?format=delta is JSON with times in milliseconds as differences from the previous word.
+    """
+    return sync_timings_response(text_id)
+
+@app.route('/api/songs/<int:song_id>/timestamps/sync')
+def song_sync_timestamps_api(song_id):
+    """
+    API endpoint with the word timings of a song's lyrics (see sync_timestamps_api)
+    Serves the first text of the song that has timestamps, or the one given as ?text_id=
+    """
+    song = Song.query.get_or_404(song_id)
+    texts = [text for text in song.text_contents if text.packed_timestamps is not None or text.timestamps.first() is not None]
+    if 'text_id' in request.args:
+        texts = [text for text in texts if str(text.id) == request.args['text_id']]
+    if not texts:
+        abort(404)
+    response = sync_timings_response(texts[0].id)
+    response.headers['X-Text-Content-Id'] = str(texts[0].id)
+    return response
+
+@app.route('/api/texts/<int:text_id>/timestamps', methods=['PUT', 'POST'])
+def import_timestamps_api(text_id):
+    """
+    API endpoint replacing all word timestamps of a text in one write
+    The body is JSON, LRC or CSV - chosen by ?format= or the Content-Type.
+    Pass ?storage=rows to store WordTimestamp rows instead of a packed blob.
+    A text shared by several songs needs ?song_id= - that song gets its own copy.
+    """
+    text = TextContent.query.get_or_404(text_id)
+    song = Song.query.get_or_404(request.args['song_id']) if 'song_id' in request.args else None
+    timing_format = request.args.get('format') or timing_format_for(request.content_type)
+    if not timing_format:
+        return {"error": "Unknown format, pass ?format=json, lrc or csv"}, 400
+    
+    try:
+        words = parse_word_timings(request.get_data(as_text=True), timing_format)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    
+    try:
+        text = text.timed_for(song)
+    except ValueError as e:
+        return {"error": str(e)}, 409
+    return save_word_timings(text, words, packed=request.args.get('storage') != 'rows'), 200
+
+@app.route('/api/texts/<int:text_id>/align', methods=['POST'])
+def align_timestamps_api(text_id):
+    """
+    API endpoint timing every word of a text from a few tapped line starts
+    The body is {"taps": [{"line": 0, "time": 12.3}, ...], "audio_source_id": optional}.
+    Lines are counted without empty lines and section markers. The loudness
+    of the audio source (by default the first local file of the text's songs)
+    refines the timing. The result replaces the text's word timestamps.
+    A text shared by several songs needs ?song_id= - that song gets its own copy.
+    """
+    text = TextContent.query.get_or_404(text_id)
+    song = Song.query.get_or_404(request.args['song_id']) if 'song_id' in request.args else None
+    data = request.get_json(silent=True) or {}
+    audio_path = local_audio_file(data['audio_source_id']) if data.get('audio_source_id') is not None else None
+    
+    try:
+        # Check the taps before timed_for can give the song its own copy of a shared text
+        parse_taps(data.get('taps'), len(lyric_lines(text.content)))
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    try:
+        text = text.timed_for(song)
+    except ValueError as e:
+        return {"error": str(e)}, 409
+    try:
+        summary = align_text(text, data.get('taps'), audio_path, packed=request.args.get('storage') != 'rows')
+    except AudioFormatError as e:
+        return {"error": str(e)}, 415
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    return summary, 200
+
+@app.route('/api/songs/<int:song_id>/clips', methods=['GET'])
+def list_clips_api(song_id):
+    """
+    API endpoint with the clips of a song for the track view, in start order
+    With ?start= and ?end= (seconds) only clips overlapping that range are returned
+    """
+    Song.query.get_or_404(song_id)
+    try:
+        start = float(request.args.get('start', 0))
+        end = float(request.args['end']) if 'end' in request.args else float('inf')
+        if not math.isfinite(start) or ('end' in request.args and not math.isfinite(end)):
+            raise ValueError(start)
+    except ValueError:
+        return {"error": "start and end must be numbers of seconds"}, 400
+    
+    clips = clips_overlapping(song_id, start, end)
+    return {"song_id": song_id, "clips": [clip.to_dict() for clip in clips]}, 200
+
+@app.route('/api/songs/<int:song_id>/clips/at')
+def clips_at_api(song_id):
+    """API endpoint with the clips of a song containing ?t= seconds"""
+    Song.query.get_or_404(song_id)
+    try:
+        at = float(request.args['t'])
+        if not math.isfinite(at):
+            raise ValueError(at)
+    except (KeyError, ValueError):
+        return {"error": "Pass the time in seconds as ?t="}, 400
+    
+    return {"song_id": song_id, "t": at, "clips": [clip.to_dict() for clip in clips_at(song_id, at)]}, 200
+
+@app.route('/api/songs/<int:song_id>/clips', methods=['POST'])
+def create_clip_api(song_id):
+    """API endpoint creating a clip from JSON {start_time, end_time, title, color, tags}"""
+    song = Song.query.get_or_404(song_id)
+    try:
+        clip = Clip(song_id=song.id, **clip_fields(request.get_json(force=True, silent=True) or {}))
+        check_time_range(clip)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    
+    db.session.add(clip)
+    db.session.commit()
+    return clip.to_dict(), 201
+
+@app.route('/api/clips/<int:clip_id>', methods=['PUT', 'PATCH'])
+def update_clip_api(clip_id):
+    """API endpoint changing some fields of a clip"""
+    clip = Clip.query.get_or_404(clip_id)
+    try:
+        for name, value in clip_fields(request.get_json(force=True, silent=True) or {}, partial=True).items():
+            setattr(clip, name, value)
+        check_time_range(clip)
+    except ValueError as e:
+        db.session.rollback()
+        return {"error": str(e)}, 400
+    
+    db.session.commit()
+    return clip.to_dict(), 200
+
+@app.route('/api/clips/<int:clip_id>', methods=['DELETE'])
+def delete_clip_api(clip_id):
+    """API endpoint deleting a clip"""
+    clip = Clip.query.get_or_404(clip_id)
+    db.session.delete(clip)
+    db.session.commit()
+    return {"deleted": clip_id}, 200
+
+@app.route('/api/clips/<int:clip_id>/export')
+def export_clip_api(clip_id):
+    """
+    API endpoint downloading a clip as a WAV file cut from its song's local audio
+    WAV sources are sliced without decoding, other formats are decoded block by block
+    """
+    clip = Clip.query.get_or_404(clip_id)
+    try:
+        export = ClipExport(clip)
+    except AudioFormatError as e:
+        return {"error": str(e)}, 415
+    except ValueError as e:
+        return {"error": str(e)}, 404
+    
+    return Response(export.chunks(), mimetype='audio/wav', headers={
+        'Content-Length': str(export.size),
+        'Content-Disposition': export.content_disposition
+    })
+
+def local_audio_file(source_id):
+    """Path of a local audio source's file, aborting with 404 for remote sources and missing files"""
+    source = AudioSource.query.get_or_404(source_id)
+    path = local_audio_path(source.url)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    return path
+
+@app.route('/api/audio/<int:source_id>/waveform')
+def waveform_api(source_id):
+    """
+    API endpoint with the loudness envelope (RMS and peak) of a local audio source
+    Returns about ?width= points between ?start= and ?end= seconds (or the
+    points of ?level=), read from the cached envelope pyramid
+    """
+    path = local_audio_file(source_id)
+    try:
+        start = float(request.args.get('start', 0))
+        end = float(request.args['end']) if 'end' in request.args else None
+        width = min(max(int(request.args.get('width', 1000)), 1), 10000)
+        level = int(request.args['level']) if 'level' in request.args else None
+        if not math.isfinite(start) or (end is not None and not math.isfinite(end)):
+            raise ValueError(start)
+    except ValueError:
+        return {"error": "start, end, width and level must be numbers"}, 400
+    
+    try:
+        waveform = waveform_for(path)
+    except AudioFormatError as e:
+        return {"error": str(e)}, 415
+    
+    result = waveform.slice(start, end, width, level)
+    result.update(audio_source_id=source_id, duration=waveform.duration, levels=waveform.levels)
+    return result, 200
+
+@app.route('/api/audio/<int:source_id>/features')
+def audio_features_api(source_id):
+    """
+    API endpoint with the tempo, beat times and sections of a local audio source
+    Sources not analyzed yet (see flask analyze-audio) are analyzed on first request
+    """
+    local_audio_file(source_id)
+    try:
+        features = features_for(AudioSource.query.get(source_id))
+    except AudioFormatError as e:
+        return {"error": str(e)}, 415
+    return features.to_dict(), 200
+
+@app.route('/api/montage')
+def montage_api():
+    """
+    API endpoint playing clips one after another as a single WAV stream (montage mode)
+    ?clips= lists clip ids in playing order (any songs), ?crossfade= is in seconds.
+    The audio is rendered while it is sent, so it starts playing right away.
+    """
+    try:
+        clip_ids = [int(clip_id) for clip_id in request.args.get('clips', '').split(',') if clip_id.strip()]
+        crossfade_seconds = float(request.args.get('crossfade', CROSSFADE_SECONDS))
+    except ValueError:
+        return {"error": "Pass clip ids as ?clips=1,2,3 and the crossfade in seconds"}, 400
+    
+    clips = {clip.id: clip for clip in Clip.query.filter(Clip.id.in_(clip_ids))}
+    missing = [clip_id for clip_id in clip_ids if clip_id not in clips]
+    if missing:
+        return {"error": f"No clips with ids {', '.join(map(str, missing))}"}, 404
+    
+    try:
+        montage = Montage([clips[clip_id] for clip_id in clip_ids], crossfade_seconds)
+    except AudioFormatError as e:
+        return {"error": str(e)}, 415
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    
+    return Response(montage.chunks(), mimetype='audio/wav', headers={'Content-Length': str(montage.size)})
+
+@app.route('/api/library/export')
+def export_library_api():
+    """
+    API endpoint streaming the whole library as NDJSON (same format as flask export-library)
+    Songs are read in pages while the response is sent, so memory use stays flat
+    """
+    return Response(
+        stream_with_context(ndjson_lines(export_library())),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename=lyraclipmap-library.ndjson'}
+    )
+
 @app.route('/delete/<int:song_id>', methods=['POST'])
 def delete_song(song_id):
     """Delete a song"""
     song = Song.query.get_or_404(song_id)
     
     try:
+        # Texts only this song used are deleted with it - drop their cached word indexes too
+        text_ids = [text.id for text in song.text_contents]
         db.session.delete(song)
         db.session.commit()
+        for text_id in text_ids:
+            word_indexes.invalidate(text_id)
         return redirect(url_for('home'))
     except Exception as e:
         return str(e), 400
@@ -373,7 +703,9 @@ def material_home():
                 'title': song.title,
                 'artist': song.artist,
                 'thumbnail': None,
-                'video_id': None
+                'video_id': None,
+                'has_lyrics': song.has_lyrics,
+                'languages': song.languages
             }
             
             # Look for YouTube sources
@@ -382,29 +714,14 @@ def material_home():
                     # Generate a default thumbnail URL without calling the API
                     # This ensures we always have something to display
                     try:
-                        # Parse video ID without calling the full info extraction
-                        parsed_url = urllib.parse.urlparse(source.url)
-                        video_id = None
-                        
-                        if parsed_url.hostname in ('www.youtube.com', 'youtube.com'):
-                            if parsed_url.path == '/watch':
-                                query = urllib.parse.parse_qs(parsed_url.query)
-                                if 'v' in query:
-                                    video_id = query['v'][0]
-                            elif parsed_url.path.startswith(('/embed/', '/v/')):
-                                video_id = parsed_url.path.split('/')[2]
-                                if '?' in video_id:
-                                    video_id = video_id.split('?')[0]
-                        elif parsed_url.hostname == 'youtu.be':
-                            video_id = parsed_url.path[1:]
-                            if '?' in video_id:
-                                video_id = video_id.split('?')[0]
+                        # Video ID is stored with the source, parse it only for rows not backfilled yet
+                        video_id = source.video_id or parse_youtube_video_id(source.url)
                         
                         if video_id:
                             song_info['thumbnail'] = f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg"
                             song_info['video_id'] = video_id
                     except Exception as e:
-                        print(f"Error parsing video ID: {e}")
+                        warning("Error parsing video ID: %s", e)
                     break
             
             songs_with_info.append(song_info)
@@ -414,15 +731,15 @@ def material_home():
         import traceback
         error_msg = f"Error loading material home page: {str(e)}"
         traceback_str = traceback.format_exc()
-        print(error_msg)
-        print(traceback_str)
+        error(error_msg)
+        error(traceback_str)
         return render_template('error.html', error=error_msg, traceback=traceback_str)
     
 @app.route('/material/song/<int:song_id>')
 def material_view_song(song_id):
     """View a specific song with Material Design UI"""
     try:
-        song = Song.query.get_or_404(song_id)
+        song = Song.query.options(with_text_content()).get_or_404(song_id)
         
         # Get YouTube embed HTML if available
         youtube_embed = None
@@ -431,30 +748,15 @@ def material_view_song(song_id):
         for source in song.audio_sources:
             if source.source_type == "youtube":
                 try:
-                    # Parse video ID directly without calling the full extraction
-                    parsed_url = urllib.parse.urlparse(source.url)
-                    video_id = None
-                    
-                    if parsed_url.hostname in ('www.youtube.com', 'youtube.com'):
-                        if parsed_url.path == '/watch':
-                            query = urllib.parse.parse_qs(parsed_url.query)
-                            if 'v' in query:
-                                video_id = query['v'][0]
-                        elif parsed_url.path.startswith(('/embed/', '/v/')):
-                            video_id = parsed_url.path.split('/')[2]
-                            if '?' in video_id:
-                                video_id = video_id.split('?')[0]
-                    elif parsed_url.hostname == 'youtu.be':
-                        video_id = parsed_url.path[1:]
-                        if '?' in video_id:
-                            video_id = video_id.split('?')[0]
+                    # Video ID is stored with the source, parse it only for rows not backfilled yet
+                    video_id = source.video_id or parse_youtube_video_id(source.url)
                     
                     if video_id:
                         youtube_video_id = video_id
                         youtube_embed = get_youtube_embed_html(video_id)
                     break
                 except Exception as e:
-                    print(f"Error parsing YouTube URL: {e}")
+                    warning("Error parsing YouTube URL: %s", e)
                     continue
         
         return render_template('material_song_detail.html', song=song, youtube_embed=youtube_embed, 
@@ -463,8 +765,8 @@ def material_view_song(song_id):
         import traceback
         error_msg = f"Error loading song detail page: {str(e)}"
         traceback_str = traceback.format_exc()
-        print(error_msg)
-        print(traceback_str)
+        error(error_msg)
+        error(traceback_str)
         return render_template('error.html', error=error_msg, traceback=traceback_str)
 
 @app.route('/material/add', methods=['GET', 'POST'])
@@ -477,16 +779,16 @@ def material_add_song():
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             try:
                 youtube_url = request.json.get('youtube_url')
-                print(f"Received AJAX request for YouTube URL: {youtube_url}")
+                debug("Received AJAX request for YouTube URL: %s", youtube_url)
                 
                 if not youtube_url:
-                    print("Error: No URL provided in request")
+                    warning("Error: No URL provided in request")
                     return {"error": "No URL provided"}, 400
                 
                 # Extract info from YouTube
-                print(f"Extracting info from URL: {youtube_url}")
+                debug("Extracting info from URL: %s", youtube_url)
                 video_info = extract_youtube_info(youtube_url)
-                print(f"Extracted video info: {video_info}")
+                debug("Extracted video info: %s", video_info)
                 
                 # Return the info as JSON
                 response_data = {
@@ -500,13 +802,13 @@ def material_add_song():
                     "description": video_info.get('description', '')[:100] + '...' if video_info.get('description') else ''
                 }
                 
-                print(f"Returning response: {response_data}")
+                debug("Returning response: %s", response_data)
                 return response_data
                 
             except Exception as e:
                 import traceback
-                print(f"Error processing YouTube URL: {str(e)}")
-                print(traceback.format_exc())
+                error("Error processing YouTube URL: %s", e)
+                error(traceback.format_exc())
                 return {
                     "error": str(e),
                     "traceback": traceback.format_exc()
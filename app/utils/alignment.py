@@ -0,0 +1,275 @@
+import os
+import re
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.models.models import TextContent
+from app.utils.audio import local_audio_path
+from app.utils.timing_import import TimedWords, save_word_timings
+from app.utils.waveform import Waveform, waveform_for
+
+# (line number, start time in seconds) of a line the user tapped
+Tap = Tuple[int, float]
+
+# Syllables are counted as vowel groups - close enough for English and Polish lyrics
+VOWEL_GROUP = re.compile(r'[aeiouyąęóàáâäãåæèéêëìíîïòôöõøœùúûü]+', re.IGNORECASE)
+
+# Section markers like "[Chorus]" are not sung
+SECTION_MARKER = re.compile(r'^\s*[\[(].*[\])]\s*$')
+
+# Pause after each line, counted in syllables, when lines are spread over time
+LINE_PAUSE_SYLLABLES = 1.5
+
+# Singing pace used when fewer than two taps tell it (seconds per syllable)
+DEFAULT_SYLLABLE_SECONDS = 0.3
+
+# The energy envelope is compared at this resolution, with at most MAX_SEGMENT_FRAMES
+# frames between two taps (longer segments use longer frames)
+FRAME_SECONDS = 0.02
+MAX_SEGMENT_FRAMES = 1000
+
+# DTW: cost of a step that stretches one side, and how far (seconds) words may move from the even spread
+STEP_PENALTY = 0.05
+MAX_SHIFT_SECONDS = 3.0
+
+
+def lyric_lines(content: str) -> List[List[str]]:
+    """
+    The words of each sung line of a text (empty lines and section markers skipped)
+    """
+    return [line.split() for line in (content or '').split('\n')
+            if line.strip() and not SECTION_MARKER.match(line)]
+
+def syllables(word: str) -> int:
+    return max(1, len(VOWEL_GROUP.findall(word)))
+
+def parse_taps(items: Iterable, line_count: int) -> List[Tap]:
+    """
+    Parse taps given as [{"line", "time"}, ...] or [[line, time], ...]
+    Lines are 0-based indexes into lyric_lines(). Later lines must start later.
+    Raises ValueError naming the first bad tap
+    """
+    if items is None:
+        items = []
+    if not isinstance(items, (list, tuple)):
+        raise ValueError("Taps must be a list")
+    taps = []
+    for number, item in enumerate(items, 1):
+        try:
+            line, time = (item['line'], item['time']) if isinstance(item, dict) else item
+            line, time = int(line), float(time)
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Tap {number}: expected a line number and a time in seconds")
+        if not 0 <= line < line_count:
+            raise ValueError(f"Tap {number}: the text has no line {line} (it has {line_count})")
+        if not np.isfinite(time) or time < 0:
+            raise ValueError(f"Tap {number}: invalid time")
+        taps.append((line, time))
+    if not taps:
+        raise ValueError("Tap the start of at least one line")
+
+    taps.sort()
+    for (line, time), (next_line, next_time) in zip(taps, taps[1:]):
+        if next_line == line:
+            raise ValueError(f"Line {line} was tapped twice")
+        if next_time <= time:
+            raise ValueError(f"Line {next_line} is tapped at {next_time}, not after line {line} ({time})")
+    return taps
+
+def _line_weights(lines: List[List[str]]) -> np.ndarray:
+    return np.array([sum(syllables(word) for word in line) + LINE_PAUSE_SYLLABLES for line in lines])
+
+def spread_words(lines: List[List[str]], start: float, end: float) -> np.ndarray:
+    """
+    Spread the words of consecutive lines evenly by syllables over [start, end],
+    leaving a pause of LINE_PAUSE_SYLLABLES after every line
+    Returns an array of (start, end) per word
+    """
+    weights = [syllables(word) for line in lines for word in line]
+    # Every line's last word is followed by a pause that is not part of the word
+    ends_line = np.zeros(len(weights), dtype=bool)
+    ends_line[np.cumsum([len(line) for line in lines]) - 1] = True
+    slots = np.array(weights, dtype=float) + np.where(ends_line, LINE_PAUSE_SYLLABLES, 0.0)
+
+    scale = (end - start) / slots.sum()
+    starts = start + np.concatenate([[0.0], np.cumsum(slots)[:-1]]) * scale
+    return np.stack([starts, starts + np.array(weights) * scale], axis=1)
+
+def dtw_mapping(reference: np.ndarray, observed: np.ndarray, penalty: float = STEP_PENALTY,
+                radius: Optional[int] = None) -> np.ndarray:
+    """
+    Align two equally long 1-D sequences by dynamic time warping
+    Cells are filled one anti-diagonal at a time: a cell only depends on the
+    two previous diagonals, so each diagonal is a single vectorized step.
+    Only the step directions are kept, not the whole cost matrix.
+    Returns, for every reference index, the (fractional) observed index it maps to
+    """
+    size = len(reference)
+    cost = np.abs(reference[:, None] - observed[None, :]).astype(np.float32)
+    if radius is not None:
+        index = np.arange(size, dtype=np.int32)
+        cost[np.abs(index[:, None] - index[None, :]) > radius] = np.inf
+
+    # 0: diagonal step, 1: from the row above, 2: from the column to the left
+    steps = np.zeros((size, size), dtype=np.int8)
+    # The costs of the last two diagonals, indexed by row + 1 so row -1 is an infinite border
+    before_last = np.full(size + 1, np.inf, dtype=np.float32)
+    last = np.full(size + 1, np.inf, dtype=np.float32)
+    last[1] = cost[0, 0]
+    for diagonal in range(1, 2 * size - 1):
+        rows = np.arange(max(0, diagonal - size + 1), min(size - 1, diagonal) + 1)
+        columns = diagonal - rows
+        across = before_last[rows]
+        down = last[rows] + penalty
+        right = last[rows + 1] + penalty
+        best = np.minimum(across, np.minimum(down, right))
+        steps[rows, columns] = np.where(across <= best, 0, np.where(down <= right, 1, 2))
+        current = np.full(size + 1, np.inf, dtype=np.float32)
+        current[rows + 1] = cost[rows, columns] + best
+        before_last, last = last, current
+
+    row, column = size - 1, size - 1
+    path_rows, path_columns = [row], [column]
+    while row or column:
+        step = steps[row, column]
+        if step != 2:
+            row -= 1
+        if step != 1:
+            column -= 1
+        path_rows.append(row)
+        path_columns.append(column)
+    return np.bincount(path_rows, weights=path_columns, minlength=size) / np.bincount(path_rows, minlength=size)
+
+def _voicing(waveform: Waveform, level: int, floor: float, ceiling: float, times: np.ndarray) -> np.ndarray:
+    """
+    Loudness at the given times, from the envelope on a log scale mapped to [0, 1]
+    """
+    window = waveform.window_seconds(level)
+    first = max(0, int(times[0] / window) - 1)
+    last = int(times[-1] / window) + 2
+    rms = np.asarray(waveform.level(level)[first:last, 0], dtype=float)
+    if not len(rms):
+        return np.zeros(len(times))
+    centers = (first + np.arange(len(rms)) + 0.5) * window
+    loudness = np.log10(np.maximum(np.interp(times, centers, rms), 1e-6))
+    return np.clip((loudness - floor) / max(ceiling - floor, 1e-6), 0.0, 1.0)
+
+class EnergyAligner:
+    """
+    Moves evenly spread words onto the loudness of the recording: words are
+    expected where it's loud and the pauses after lines where it's quiet
+    """
+
+    def __init__(self, waveform: Waveform):
+        self.waveform = waveform
+        self.level = max([level for level in range(waveform.levels) if waveform.window_seconds(level) <= FRAME_SECONDS] or [0])
+        # Quiet and loud reference points of the whole track, from its coarsest level
+        overview = np.log10(np.maximum(np.asarray(waveform.level(waveform.levels - 1)[:, 0], dtype=float), 1e-6))
+        self.floor, self.ceiling = np.percentile(overview, [10, 95]) if len(overview) else (-6.0, 0.0)
+
+    def last_loud_time(self) -> float:
+        """
+        End of the last frame louder than the middle of the track's range
+        """
+        times = np.arange(0, self.waveform.duration, FRAME_SECONDS)
+        if not len(times):
+            return 0.0
+        loud = np.nonzero(_voicing(self.waveform, self.level, self.floor, self.ceiling, times) >= 0.5)[0]
+        return float(times[loud[-1]] + FRAME_SECONDS) if len(loud) else self.waveform.duration
+
+    def align(self, words: np.ndarray, start: float, end: float) -> np.ndarray:
+        """
+        Warp the (start, end) times of words spread over [start, end] so they
+        follow the loudness; start and end themselves stay where they are
+        """
+        frames = int(min(MAX_SEGMENT_FRAMES, max(2, round((end - start) / FRAME_SECONDS))))
+        frame = (end - start) / frames
+        centers = start + (np.arange(frames) + 0.5) * frame
+
+        # Expected loudness: 1 inside words, 0 in the pauses between lines
+        inside = np.searchsorted(words[:, 0], centers, side='right') - 1
+        reference = ((inside >= 0) & (centers < words[np.maximum(inside, 0), 1])).astype(np.float32)
+        observed = _voicing(self.waveform, self.level, self.floor, self.ceiling, centers).astype(np.float32)
+
+        mapping = dtw_mapping(reference, observed, radius=max(1, int(MAX_SHIFT_SECONDS / frame)))
+        # Frame edges map like the frames' centers; the segment's ends are fixed
+        edges = np.concatenate([[0.0], mapping + 0.5, [frames]])
+        edge_positions = np.concatenate([[0.0], np.arange(frames) + 0.5, [frames]])
+        warped = np.interp((words - start) / frame, edge_positions, edges)
+        return start + np.maximum.accumulate(warped.ravel()).reshape(words.shape) * frame
+
+def _segments(lines: List[List[str]], taps: List[Tap], end_time: Optional[float]) -> List[Tuple[int, int, float, float]]:
+    """
+    Split the lines at the taps into (first line, end line, start, end) time ranges
+    Lines before the first tap and after the last one get the pace of the tapped ones
+    """
+    weights = _line_weights(lines)
+    tapped = [(next_tap[1] - tap[1]) / weights[tap[0]:next_tap[0]].sum() for tap, next_tap in zip(taps, taps[1:])]
+    pace = float(np.median(tapped)) if tapped else DEFAULT_SYLLABLE_SECONDS
+
+    segments = []
+    first_line, first_time = taps[0]
+    if first_line > 0:
+        segments.append((0, first_line, max(0.0, first_time - weights[:first_line].sum() * pace), first_time))
+    for (line, time), (next_line, next_time) in zip(taps, taps[1:]):
+        segments.append((line, next_line, time, next_time))
+
+    last_line, last_time = taps[-1]
+    expected = weights[last_line:].sum() * pace
+    end = last_time + expected
+    if end_time is not None:
+        # Trust the recording about where singing stops, within reason
+        end = min(max(end_time, last_time + expected / 2), last_time + expected * 2)
+    segments.append((last_line, len(lines), last_time, end))
+    return segments
+
+def align_lines(lines: List[List[str]], taps: List[Tap], waveform: Optional[Waveform] = None) -> TimedWords:
+    """
+    Time every word of the lines from a few tapped line starts
+
+    Words are spread by syllables between the taps (at the tapped pace
+    before the first and after the last one). With the recording's
+    loudness envelope, each stretch between taps is then aligned to it by DTW.
+    """
+    aligner = EnergyAligner(waveform) if waveform is not None and waveform.levels else None
+    end_time = aligner.last_loud_time() if aligner else None
+
+    timed = []
+    for first, end_line, start, end in _segments(lines, taps, end_time):
+        segment_lines = lines[first:end_line]
+        words = spread_words(segment_lines, start, end)
+        if aligner is not None and end - start > FRAME_SECONDS:
+            words = aligner.align(words, start, end)
+        timed += [(word, round(float(word_start), 3), round(float(max(word_start, word_end)), 3))
+                  for word, (word_start, word_end) in zip((word for line in segment_lines for word in line), words)]
+    return timed
+
+def alignment_audio_path(text: TextContent) -> Optional[str]:
+    """
+    The first existing local audio file of the songs using a text
+    """
+    for song in text.songs:
+        for source in song.audio_sources:
+            path = local_audio_path(source.url)
+            if path is not None and os.path.isfile(path):
+                return path
+    return None
+
+def align_text(text: TextContent, taps: Iterable, audio_path: Optional[str] = None, packed: bool = True):
+    """
+    Align all words of a text from tapped line starts and store them with save_word_timings
+    The loudness of audio_path (by default the text's first local audio file) refines the timing
+    Raises ValueError for invalid taps
+    Returns the save_word_timings summary with the line and tap counts
+    """
+    lines = lyric_lines(text.content)
+    if not lines:
+        raise ValueError("The text has no lines to align")
+    taps = parse_taps(taps, len(lines))
+
+    audio_path = audio_path or alignment_audio_path(text)
+    words = align_lines(lines, taps, waveform_for(audio_path) if audio_path else None)
+    summary = save_word_timings(text, words, packed)
+    summary.update(line_count=len(lines), tap_count=len(taps), audio=audio_path is not None)
+    return summary
@@ -0,0 +1,110 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from app import db
+from app.models.models import AudioFeatures, AudioSource
+from app.utils.audio import file_hash, local_audio_path
+from app.utils.features import analyze_file
+from app.utils.tracing import warning
+
+
+def local_sources(after_id: int, limit: int) -> List[AudioSource]:
+    """
+    Get the next page of audio sources that may be local files, ordered by id
+    """
+    return AudioSource.query.filter(
+        AudioSource.id > after_id,
+        AudioSource.source_type != 'youtube'
+    ).order_by(AudioSource.id).limit(limit).all()
+
+def store_features(source: AudioSource, digest: str, result: Dict) -> AudioFeatures:
+    """
+    Save analyze_file() results (or another source's features of the same file) for a source
+    """
+    features = source.features or AudioFeatures(audio_source=source)
+    features.file_hash = digest
+    features.duration = result['duration']
+    features.tempo = result['tempo']
+    features.beats = result['beats'] if isinstance(result['beats'], bytes) else result['beats'].astype('<f4').tobytes()
+    features.sections = result['sections']
+    features.analyzed_at = datetime.utcnow()
+    return features
+
+def features_for(source: AudioSource) -> Optional[AudioFeatures]:
+    """
+    Features of a local source, analyzing it in this process if they are missing or stale
+    Returns None for remote sources and missing files
+    """
+    path = local_audio_path(source.url)
+    if path is None or not os.path.isfile(path):
+        return None
+    digest = file_hash(path)
+    if source.features is not None and source.features.file_hash == digest:
+        return source.features
+    features = store_features(source, digest, analyze_file(path))
+    db.session.commit()
+    return features
+
+def analyze_audio(workers: int = 2, batch_size: int = 8, force: bool = False, limit: Optional[int] = None,
+                  progress: Optional[Callable[[Dict], None]] = None) -> Dict[str, int]:
+    """
+    Compute tempo, beats and sections of all local audio sources
+
+    Analysis is CPU-bound NumPy work, so files are analyzed in a pool of
+    `workers` processes; the database is only touched from the calling
+    process, with one commit per batch. Results are keyed by the file's
+    content hash: unchanged files are skipped and a file shared by several
+    sources is analyzed once. Use force=True to analyze everything again.
+    Returns counters: "analyzed", "cached", "reused", "missing", "failed"
+    """
+    counts = {'analyzed': 0, 'cached': 0, 'reused': 0, 'missing': 0, 'failed': 0}
+    last_id = 0
+    processed = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while limit is None or processed < limit:
+            page_size = batch_size if limit is None else min(batch_size, limit - processed)
+            sources = local_sources(last_id, page_size)
+            if not sources:
+                break
+
+            jobs = {}  # digest -> (future, [sources])
+            for source in sources:
+                path = local_audio_path(source.url)
+                if path is None or not os.path.isfile(path):
+                    counts['missing'] += 1
+                    continue
+                digest = file_hash(path)
+                if not force and source.features is not None and source.features.file_hash == digest:
+                    counts['cached'] += 1
+                    continue
+                known = None if force else AudioFeatures.query.filter_by(file_hash=digest).first()
+                if known is not None:
+                    store_features(source, digest, {'duration': known.duration, 'tempo': known.tempo,
+                                                    'beats': known.beats, 'sections': known.sections})
+                    counts['reused'] += 1
+                    continue
+                if digest not in jobs:
+                    jobs[digest] = (executor.submit(analyze_file, path), [])
+                jobs[digest][1].append(source)
+
+            for digest, (future, waiting) in jobs.items():
+                try:
+                    result = future.result()
+                except Exception as e:
+                    warning("Could not analyze audio source %s: %s", waiting[0].id, e)
+                    counts['failed'] += len(waiting)
+                    continue
+                for source in waiting:
+                    store_features(source, digest, result)
+                counts['analyzed'] += len(waiting)
+            db.session.commit()
+
+            processed += len(sources)
+            last_id = sources[-1].id
+            if progress:
+                progress(counts)
+
+    return counts
@@ -0,0 +1,14 @@
+import re
+import unicodedata
+
+def normalize_artist_name(name: str) -> str:
+    """
+    Normalize an artist name for matching different spellings of the same artist
+    Case, accents, punctuation and extra whitespace are ignored:
+    "AC/DC", "ac-dc" and "Ac Dc" all become "ac dc"
+    """
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    without_accents = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    # Polish "ł" has no decomposition
+    without_accents = without_accents.replace('ł', 'l').replace('Ł', 'L')
+    return re.sub(r'[\W_]+', ' ', without_accents.casefold()).strip()
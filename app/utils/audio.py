@@ -0,0 +1,282 @@
+import hashlib
+import os
+import shutil
+import struct
+import subprocess
+from threading import Lock
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+import numpy as np
+
+# soundfile is optional - it decodes FLAC/OGG (and MP3 with libsndfile >= 1.1) without ffmpeg
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+# Relative paths of local audio sources are resolved against this directory
+AUDIO_DIR = os.environ.get('AUDIO_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'db', 'audio')
+
+# Where analysis results (waveforms, features) are cached, one directory per file hash
+AUDIO_CACHE_DIR = os.environ.get('AUDIO_CACHE_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'db', 'audio_cache')
+
+# Frames per block when streaming audio
+BLOCK_FRAMES = 65536
+
+# Format used when ffmpeg decodes a file soundfile can't read
+FFMPEG_SAMPLE_RATE = 44100
+FFMPEG_CHANNELS = 2
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class AudioFormatError(ValueError):
+    """The file is not audio we can read"""
+
+
+def local_audio_path(url: str) -> Optional[str]:
+    """
+    The local file path of an audio source URL ("file:///...", an absolute
+    path or a path relative to AUDIO_DIR), or None for remote sources
+    """
+    parsed = urlparse(url or '')
+    if parsed.scheme == 'file':
+        return unquote(parsed.path)
+    if parsed.scheme and len(parsed.scheme) > 1:
+        return None  # http(s), YouTube, ... (a one-letter scheme is a Windows drive)
+    return url if os.path.isabs(url) else os.path.join(AUDIO_DIR, url)
+
+
+_hash_cache: Dict[Tuple[str, int, int], str] = {}
+_hash_lock = Lock()
+
+def file_hash(path: str) -> str:
+    """
+    BLAKE2b of a file's content, read in 1 MB chunks
+    Remembered per (path, size, mtime), so an unchanged file is read once per process
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        if key in _hash_cache:
+            return _hash_cache[key]
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    with _hash_lock:
+        _hash_cache[key] = digest.hexdigest()
+    return _hash_cache[key]
+
+def cache_dir_for(digest: str) -> str:
+    return os.path.join(AUDIO_CACHE_DIR, digest[:2], digest)
+
+
+class WavFile:
+    """
+    The header of a RIFF/WAVE file and memory-mapped access to its samples
+
+    Only the header is read when opening - samples are mapped from the file
+    on demand, so any range can be read without touching the rest.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file_size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            self._parse(f)
+
+    def _parse(self, f):
+        riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise AudioFormatError(f"{self.path} is not a RIFF/WAVE file")
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise AudioFormatError(f"{self.path} has no data chunk")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = f.read(size)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise AudioFormatError(f"{self.path} has no fmt chunk before its data")
+                self.data_offset = f.tell()
+                # Streamed files may leave the size unset - the data runs to the end of the file
+                self.data_size = min(size, self.file_size - self.data_offset)
+                break
+            else:
+                f.seek(size, os.SEEK_CUR)
+            if size % 2:
+                f.seek(1, os.SEEK_CUR)  # Chunks are padded to an even length
+
+        (self.format_tag, self.channels, self.sample_rate, _, self.block_align,
+         self.bits_per_sample) = struct.unpack('<HHIIHH', fmt[:16])
+        if self.format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            self.format_tag = struct.unpack('<H', fmt[24:26])[0]  # First bytes of the SubFormat GUID
+
+        sample_bytes = self.bits_per_sample // 8
+        if self.format_tag == WAVE_FORMAT_PCM and sample_bytes in (1, 2, 3, 4):
+            self.dtype = {1: 'u1', 2: '<i2', 3: 'u1', 4: '<i4'}[sample_bytes]
+        elif self.format_tag == WAVE_FORMAT_IEEE_FLOAT and sample_bytes in (4, 8):
+            self.dtype = {4: '<f4', 8: '<f8'}[sample_bytes]
+        else:
+            raise AudioFormatError(f"{self.path}: unsupported WAV format {self.format_tag} with {self.bits_per_sample} bits")
+        if self.block_align != sample_bytes * self.channels:
+            raise AudioFormatError(f"{self.path}: unexpected block alignment {self.block_align}")
+        self.frames = self.data_size // self.block_align
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    def frame_offset(self, frame: int) -> int:
+        """
+        Byte offset of a frame in the file
+        """
+        return self.data_offset + frame * self.block_align
+
+    def raw(self, start: int = 0, end: Optional[int] = None) -> np.memmap:
+        """
+        Frames [start, end) as stored, memory-mapped: shape (frames, channels), or (frames, channels, 3) for 24-bit
+        """
+        end = self.frames if end is None else min(end, self.frames)
+        start = max(0, min(start, end))
+        shape = (end - start, self.channels) + ((3,) if self.bits_per_sample == 24 else ())
+        if end == start:
+            return np.zeros(shape, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode='r', offset=self.frame_offset(start), shape=shape)
+
+    def read(self, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        """
+        Frames [start, end) as float32 in [-1, 1], shape (frames, channels)
+        """
+        return to_float32(self.raw(start, end), self.bits_per_sample)
+
+    def blocks(self, block_frames: int = BLOCK_FRAMES, start: int = 0, end: Optional[int] = None) -> Iterator[np.ndarray]:
+        end = self.frames if end is None else min(end, self.frames)
+        for position in range(start, end, block_frames):
+            yield self.read(position, min(position + block_frames, end))
+
+
+def wav_header(frames: int, sample_rate: int, channels: int, bits_per_sample: int = 16,
+               format_tag: int = WAVE_FORMAT_PCM) -> bytes:
+    """
+    A 44-byte RIFF/WAVE header for `frames` frames of PCM (or IEEE float) samples
+    The length is part of the header, so it can be sent before the samples
+    """
+    block_align = channels * bits_per_sample // 8
+    data_size = frames * block_align
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + data_size, b'WAVE', b'fmt ', 16, format_tag, channels,
+                       sample_rate, sample_rate * block_align, block_align, bits_per_sample, b'data', data_size)
+
+def to_int16(samples: np.ndarray) -> bytes:
+    """
+    Float samples in [-1, 1] as little-endian 16-bit PCM bytes (clipped)
+    """
+    return np.rint(np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+def to_float32(samples: np.ndarray, bits_per_sample: int) -> np.ndarray:
+    """
+    Convert WAV samples to float32 in [-1, 1]
+    """
+    if samples.dtype.kind == 'f':
+        return samples.astype(np.float32)
+    if bits_per_sample == 8:
+        return (samples.astype(np.float32) - 128) / 128
+    if bits_per_sample == 24:
+        # Little-endian 3-byte ints: place them in the top of an int32 so the sign carries over
+        wide = (samples[..., 0].astype(np.int32) << 8) | (samples[..., 1].astype(np.int32) << 16) | (samples[..., 2].astype(np.int32) << 24)
+        return (wide >> 8).astype(np.float32) / 8388608
+    return samples.astype(np.float32) / float(2 ** (bits_per_sample - 1))
+
+
+class DecodedAudio:
+    """
+    A compressed file streamed as float32 blocks by soundfile or, failing that, ffmpeg
+    frames is None when ffmpeg decodes (the length is only known at the end)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.frames = None
+        if soundfile is not None:
+            try:
+                info = soundfile.info(path)
+                self.sample_rate, self.channels, self.frames = info.samplerate, info.channels, info.frames
+                self.decoder = 'soundfile'
+                return
+            except RuntimeError:
+                pass  # Not a format libsndfile knows - try ffmpeg
+        if shutil.which('ffmpeg') is None:
+            raise AudioFormatError(f"Cannot decode {path}: install the soundfile package or ffmpeg")
+        self.sample_rate, self.channels = FFMPEG_SAMPLE_RATE, FFMPEG_CHANNELS
+        self.decoder = 'ffmpeg'
+
+    @property
+    def duration(self) -> Optional[float]:
+        return self.frames / self.sample_rate if self.frames is not None else None
+
+    def blocks(self, block_frames: int = BLOCK_FRAMES, start: int = 0, end: Optional[int] = None) -> Iterator[np.ndarray]:
+        if self.decoder == 'soundfile':
+            stop = end if end is not None else self.frames
+            yield from soundfile.blocks(self.path, blocksize=block_frames, start=start, stop=stop,
+                                        dtype='float32', always_2d=True)
+            return
+
+        command = ['ffmpeg', '-v', 'error', '-nostdin']
+        if start:
+            command += ['-ss', f'{start / self.sample_rate:.6f}']
+        command += ['-i', self.path]
+        if end is not None:
+            command += ['-t', f'{(end - start) / self.sample_rate:.6f}']
+        command += ['-f', 'f32le', '-ac', str(self.channels), '-ar', str(self.sample_rate), '-']
+
+        block_bytes = block_frames * self.channels * 4
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        finished = False
+        try:
+            while True:
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                usable = len(data) - len(data) % (self.channels * 4)
+                yield np.frombuffer(data[:usable], dtype='<f4').reshape(-1, self.channels)
+            finished = True
+        finally:
+            if not finished:
+                process.kill()  # The caller stopped early
+            process.stdout.close()
+            stderr = process.stderr.read().decode('utf-8', 'replace')
+            process.stderr.close()
+            process.wait()
+        if process.returncode != 0:
+            raise AudioFormatError(f"ffmpeg could not decode {self.path}: {stderr.strip()}")
+
+
+def open_audio(path: str):
+    """
+    Open a local audio file for streaming: WAV files are memory-mapped,
+    anything else is decoded (see DecodedAudio)
+    Both have sample_rate, channels, frames and blocks(block_frames, start, end)
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(path)
+    with open(path, 'rb') as f:
+        header = f.read(12)
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return WavFile(path)
+    return DecodedAudio(path)
+
+def mono(block: np.ndarray) -> np.ndarray:
+    """
+    Average the channels of a (frames, channels) block
+    """
+    return block.mean(axis=1, dtype=np.float32) if block.shape[1] > 1 else block[:, 0]
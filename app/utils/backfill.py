@@ -0,0 +1,125 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app import db
+from app.models.models import Song, TextContent
+from app.utils.helpers import find_lyrics
+from app.utils.revalidate import record_lyrics_source
+from app.utils.tracing import warning
+
+# Where progress is stored between runs
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'db', 'backfill_lyrics.checkpoint.json')
+
+def load_checkpoint(path: str) -> Dict:
+    """
+    Load backfill progress
+    Returns dict with the last processed song id and counters
+    """
+    checkpoint = {'last_song_id': 0, 'processed': 0, 'found': 0, 'skipped': 0, 'failed': []}
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            checkpoint.update(json.load(f))
+    return checkpoint
+
+def save_checkpoint(path: str, checkpoint: Dict):
+    """
+    Save backfill progress atomically so a crash never leaves a half-written file
+    """
+    if not path:
+        return
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(checkpoint, failed=sorted(checkpoint['failed'])), f, indent=2)
+    os.replace(tmp_path, path)
+
+def songs_missing_lyrics(after_id: int, limit: int) -> List[Tuple[int, str, str]]:
+    """
+    Get the next page of songs without a "lyrics" text, ordered by id
+    Returns a list of (id, artist, title) tuples
+    """
+    return db.session.query(Song.id, Song.artist, Song.title).filter(
+        Song.id > after_id,
+        Song.has_lyrics.is_(False)
+    ).order_by(Song.id).limit(limit).all()
+
+def save_lyrics(song_id: int, result: Dict[str, Optional[str]]) -> bool:
+    """
+    Attach fetched lyrics (a find_lyrics result) to a song unless it got lyrics in the meantime
+    The caller is responsible for committing
+    """
+    song = Song.query.get(song_id)
+    if not song or any(text.content_type == "lyrics" for text in song.text_contents):
+        return False
+    lyrics_content = TextContent.for_content(result['lyrics'], "lyrics")
+    record_lyrics_source(lyrics_content, result)
+    song.text_contents.append(lyrics_content)
+    return True
+
+def _fetch_song(fetch: Callable[[str, str], Optional[Dict]], song: Tuple[int, str, str]) -> Optional[Dict]:
+    """
+    Fetch lyrics for one song, so an error fails only that song and not the whole batch
+    """
+    song_id, artist, title = song
+    try:
+        return fetch(artist, title)
+    except Exception as e:
+        warning("Fetching lyrics for song %s ('%s' - '%s') failed: %s", song_id, artist, title, e)
+        return None
+
+def backfill_lyrics(workers: int = 4, batch_size: int = 20, checkpoint_path: Optional[str] = DEFAULT_CHECKPOINT,
+                    limit: Optional[int] = None, restart: bool = False,
+                    fetch: Callable[[str, str], Optional[Dict]] = find_lyrics,
+                    progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Fetch lyrics for all songs that don't have any
+
+    Songs are processed in id order, one batch at a time: the batch is fetched
+    through a pool of `workers` threads (network only - the database is only
+    touched from the calling thread), written in a single commit, and then the
+    checkpoint is advanced. Interrupting the job loses at most one batch, and
+    the next run continues after the last committed song. Use restart=True to
+    scan from the beginning again, e.g. to retry songs that failed before.
+    Songs that got lyrics from elsewhere while the batch was fetched count as skipped.
+    Returns the final checkpoint dict.
+    """
+    checkpoint = load_checkpoint(None if restart else checkpoint_path)
+    # A set while the job runs - the failed list of a long backfill gets large
+    checkpoint['failed'] = set(checkpoint['failed'])
+    remaining = limit
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill') as executor:
+        while remaining is None or remaining > 0:
+            page_size = batch_size if remaining is None else min(batch_size, remaining)
+            batch = songs_missing_lyrics(checkpoint['last_song_id'], page_size)
+            if not batch:
+                break
+
+            results = list(executor.map(lambda song: _fetch_song(fetch, song), batch))
+
+            found = skipped = 0
+            for (song_id, artist, title), result in zip(batch, results):
+                if not result:
+                    checkpoint['failed'].add(song_id)
+                elif save_lyrics(song_id, result):
+                    found += 1
+                    checkpoint['failed'].discard(song_id)
+                else:
+                    skipped += 1
+                    checkpoint['failed'].discard(song_id)
+            db.session.commit()
+
+            checkpoint['last_song_id'] = batch[-1][0]
+            checkpoint['processed'] += len(batch)
+            checkpoint['found'] += found
+            checkpoint['skipped'] += skipped
+            save_checkpoint(checkpoint_path, checkpoint)
+
+            if progress:
+                progress(checkpoint)
+            if remaining is not None:
+                remaining -= len(batch)
+
+    checkpoint['failed'] = sorted(checkpoint['failed'])
+    return checkpoint
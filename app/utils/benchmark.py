@@ -0,0 +1,161 @@
+import gc
+import json
+import logging
+import os
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+from app.utils import helpers, parsers, tracing
+from app.utils.replay import replay_fixtures, load_manifest
+
+# Fixtures shipped with the repository
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'benchmarks', 'fixtures')
+
+# Name of the file listing the scraper calls to benchmark
+CASES_NAME = 'cases.json'
+
+def load_cases(directory: str) -> List[Dict]:
+    """
+    Load benchmark cases - a list of {"name", "provider", "artist", "title"} or {"name", "provider": "youtube", "url"}
+    """
+    with open(os.path.join(directory, CASES_NAME), encoding='utf-8') as f:
+        return json.load(f)
+
+def get_case_function(case: Dict) -> Callable[[], object]:
+    """
+    Return a no-argument callable running the scraper described by a case
+    """
+    provider = case['provider']
+    if provider == 'youtube':
+        return lambda: helpers.extract_youtube_info(case['url'])
+
+    functions = {
+        'tekstowo': helpers.search_tekstowo,
+        'genius': helpers.search_genius,
+        'musixmatch': helpers.search_musixmatch,
+        'all': helpers.search_for_lyrics,
+    }
+    search = functions[provider]
+    return lambda: search(case['artist'], case['title'])
+
+def measure(func: Callable[[], object], repeat: int = 10) -> Dict:
+    """
+    Measure a callable: wall time over `repeat` runs and memory of one traced run
+    Returns dict with mean/min time in milliseconds, peak traced memory in KB
+    and the number of memory blocks still allocated after the run
+    """
+    # Warm-up run so imports and caches don't distort the numbers
+    result = func()
+
+    timings = []
+    gc.collect()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    # Memory is measured separately because tracing slows everything down
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        func()
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    allocations = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+
+    return {
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'peak_kb': round(peak / 1024, 1),
+        'allocations': allocations,
+        'found': bool(result)
+    }
+
+def benchmark_scrapers(directory: str = DEFAULT_FIXTURES_DIR, repeat: int = 10, only: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Run every scraper case against replayed fixtures
+    Returns dict of case name -> measurements
+    """
+    results = {}
+    # Measure with scraper logging off, the way requests without a trace run
+    previous_level = tracing.logger.level
+    tracing.logger.setLevel(logging.WARNING)
+    try:
+        with replay_fixtures(directory) as adapter:
+            for case in load_cases(directory):
+                if only and case['provider'] != only:
+                    continue
+                del adapter.misses[:]
+                results[case['name']] = measure(get_case_function(case), repeat)
+                # Report which URLs had no fixture - useful when recording new cases
+                results[case['name']]['unrecorded_urls'] = sorted(set(adapter.misses))
+    finally:
+        tracing.logger.setLevel(previous_level)
+    return results
+
+def page_parser_for_url(url: str) -> Optional[Callable[[str], object]]:
+    """
+    Return the provider parser used for pages at this URL, or None if there isn't one
+    """
+    if 'google.com' in url:
+        return lambda markup: parsers.find_links(markup, lambda href: True)
+    if 'tekstowo.pl/szukaj' in url:
+        return parsers.parse_tekstowo_search
+    if 'musixmatch.com/search' in url:
+        return parsers.parse_musixmatch_search
+    if any(site in url for site in ('tekstowo.pl', 'genius.com', 'musixmatch.com')):
+        return lambda markup: parsers.parse_lyrics_page(url, markup)
+    return None
+
+def benchmark_parsing(directory: str = DEFAULT_FIXTURES_DIR, repeat: int = 10, partial: bool = False) -> Dict[str, Dict]:
+    """
+    Measure parsing of every HTML fixture page
+    By default pages are parsed in full with html.parser (what the scrapers used
+    to do); with partial=True the provider parsers from app/utils/parsers.py are
+    measured instead, including the extraction of lyrics, artist and title.
+    Returns dict of fixture file -> measurements
+    """
+    results = {}
+    for url, entry in load_manifest(directory).items():
+        filename = entry['file']
+        if not filename.endswith('.html') or entry.get('status', 200) != 200:
+            continue
+        with open(os.path.join(directory, filename), encoding='utf-8') as f:
+            html = f.read()
+
+        if partial:
+            parser = page_parser_for_url(url)
+            if parser is None:
+                continue
+            results[filename] = measure(lambda: parser(html), repeat)
+        else:
+            results[filename] = measure(lambda: BeautifulSoup(html, 'html.parser'), repeat)
+        results[filename]['size_kb'] = round(len(html.encode('utf-8')) / 1024, 1)
+    return results
+
+def find_regressions(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float = 0.25,
+                     check_time: bool = False) -> List[str]:
+    """
+    Compare results with a saved baseline
+    Allocations and peak memory don't depend on machine load, so they are always
+    compared; timings only when check_time is set. Returns a list of messages.
+    """
+    keys = ('allocations', 'peak_kb', 'min_ms') if check_time else ('allocations', 'peak_kb')
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if previous.get('found') and not current.get('found'):
+            regressions.append(f"{name}: no longer finds a result")
+        for key in keys:
+            if key in previous and previous[key] and current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {previous[key]} -> {current[key]}")
+    return regressions
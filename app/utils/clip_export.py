@@ -0,0 +1,98 @@
+import mmap
+import re
+import unicodedata
+from typing import Iterator
+from urllib.parse import quote
+
+from app.models.models import Clip
+from app.utils.audio import BLOCK_FRAMES, WAVE_FORMAT_PCM, WavFile, open_audio, to_int16, wav_header
+from app.utils.clips import clip_audio_path
+from app.utils.montage import resample_blocks
+
+# Bytes handed to the server per chunk when a WAV slice is sent
+EXPORT_CHUNK_BYTES = 1024 * 1024
+
+# Characters replaced in download file names
+UNSAFE_FILENAME_CHARACTERS = re.compile(r'[^\w\- .()]+')
+
+
+class ClipExport:
+    """
+    A clip cut out of its song's local audio file as a WAV file of its own
+
+    From a WAV source nothing is decoded: the clip's samples are one byte
+    range of the file (found from the header), sent through a memory map
+    behind a freshly written header with the clip's length. Other formats
+    are decoded block by block from the clip's start and written as 16-bit
+    PCM. Either way the size is known before the first byte is sent.
+    """
+
+    def __init__(self, clip: Clip):
+        path = clip_audio_path(clip)
+        if path is None:
+            raise ValueError(f"Clip {clip.id} has no local audio file")
+        self.clip = clip
+        self.path = path
+        self.audio = open_audio(path)
+        rate = self.audio.sample_rate
+        self.start_frame = int(round(clip.start_time * rate))
+        end_frame = int(round(clip.end_time * rate))
+        if self.audio.frames is not None:
+            end_frame = min(end_frame, self.audio.frames)
+        self.frames = max(0, end_frame - self.start_frame)
+
+        if isinstance(self.audio, WavFile):
+            self.header = wav_header(self.frames, rate, self.audio.channels, self.audio.bits_per_sample, self.audio.format_tag)
+            self.data_size = self.frames * self.audio.block_align
+        else:
+            self.header = wav_header(self.frames, rate, self.audio.channels, 16, WAVE_FORMAT_PCM)
+            self.data_size = self.frames * self.audio.channels * 2
+
+    @property
+    def size(self) -> int:
+        return len(self.header) + self.data_size
+
+    @property
+    def filename(self) -> str:
+        song = self.clip.song
+        name = f"{song.artist} - {song.title} ({self.clip.start_time:.1f}-{self.clip.end_time:.1f}s)"
+        return UNSAFE_FILENAME_CHARACTERS.sub('_', name).strip() + '.wav'
+
+    @property
+    def content_disposition(self) -> str:
+        """
+        Content-Disposition header of the download: headers are latin-1, so a
+        non-ASCII name is sent as an ASCII fallback plus the UTF-8 name (RFC 5987), as flask.send_file does
+        """
+        filename = self.filename
+        fallback = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        if fallback == filename:
+            return f'attachment; filename="{filename}"'
+        return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+    def _wav_slice(self) -> Iterator[bytes]:
+        if not self.data_size:
+            return
+        first = self.audio.frame_offset(self.start_frame)
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for position in range(first, first + self.data_size, EXPORT_CHUNK_BYTES):
+                yield mapped[position:min(position + EXPORT_CHUNK_BYTES, first + self.data_size)]
+
+    def _decoded(self) -> Iterator[bytes]:
+        # The decoder may stop short of the expected length - resample_blocks pads it to exactly self.frames
+        rate = self.audio.sample_rate
+        blocks = self.audio.blocks(BLOCK_FRAMES, self.start_frame, self.start_frame + self.frames)
+        for block in resample_blocks(blocks, rate, rate, self.frames, self.audio.channels):
+            yield to_int16(block)
+
+    def chunks(self) -> Iterator[bytes]:
+        """
+        The clip as WAV file bytes: the header, then the samples
+        """
+        yield self.header
+        yield from self._wav_slice() if isinstance(self.audio, WavFile) else self._decoded()
+
+    def write(self, path: str):
+        with open(path, 'wb') as f:
+            for chunk in self.chunks():
+                f.write(chunk)
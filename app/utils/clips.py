@@ -0,0 +1,102 @@
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from sqlalchemy import inspect, text
+
+from app import db
+from app.models.models import Clip
+from app.utils.audio import local_audio_path
+
+# Clip colors are plain hex colors, as used by the track view
+CLIP_COLOR = re.compile(r'^#[0-9a-fA-F]{6}$')
+
+
+@lru_cache(maxsize=None)
+def _has_interval_index(url: str) -> bool:
+    # Created by migration 16 / create_all unless SQLite was built without the R*Tree module
+    return inspect(db.engine).has_table('clip_intervals')
+
+def _interval_ids(song_id: int, start: float, end: float):
+    """
+    Clip ids whose R*Tree box may overlap [start, end] - a superset, the bounds are float32
+    """
+    return text(
+        'SELECT id FROM clip_intervals WHERE song_min <= :song_id AND song_max >= :song_id '
+        'AND start_time <= :end AND end_time >= :start'
+    ).bindparams(song_id=song_id, start=start, end=end).columns(id=db.Integer)
+
+def _clips_in_range(song_id: int, start: float, end: float):
+    query = Clip.query.filter(Clip.song_id == song_id)
+    if _has_interval_index(str(db.engine.url)):
+        query = query.filter(Clip.id.in_(_interval_ids(song_id, start, end)))
+    return query
+
+def clips_overlapping(song_id: int, start: float, end: float) -> List[Clip]:
+    """
+    Clips of a song that overlap the time range [start, end), in start order
+    The R*Tree narrows them down in O(log n), the exact times are checked on the rows found
+    """
+    return _clips_in_range(song_id, start, end).filter(
+        Clip.start_time < end,
+        Clip.end_time > start
+    ).order_by(Clip.start_time, Clip.id).all()
+
+def clips_at(song_id: int, time: float) -> List[Clip]:
+    """
+    Clips of a song containing `time` (start <= time < end), in start order
+    """
+    return _clips_in_range(song_id, time, time).filter(
+        Clip.start_time <= time,
+        Clip.end_time > time
+    ).order_by(Clip.start_time, Clip.id).all()
+
+def clip_fields(data: Dict, partial: bool = False) -> Dict:
+    """
+    Validate clip fields from a request body
+    With partial=True (updates) only the given fields are checked
+    Raises ValueError describing the first invalid field
+    """
+    fields = {}
+    for name in ('start_time', 'end_time'):
+        if name in data:
+            try:
+                fields[name] = float(data[name])
+            except (TypeError, ValueError):
+                raise ValueError(f"{name} must be a number of seconds")
+            if not math.isfinite(fields[name]):
+                raise ValueError(f"{name} must be a finite number of seconds")
+        elif not partial:
+            raise ValueError(f"{name} is required")
+
+    if 'title' in data:
+        fields['title'] = str(data['title']) if data['title'] is not None else None
+    if 'color' in data:
+        if data['color'] is not None and not CLIP_COLOR.match(str(data['color'])):
+            raise ValueError("color must look like #rrggbb")
+        fields['color'] = data['color']
+    if 'tags' in data:
+        tags = data['tags'] or []
+        if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+            raise ValueError("tags must be a list of strings")
+        fields['tags'] = [tag.strip() for tag in tags if tag.strip()]
+    return fields
+
+def check_time_range(clip: Clip):
+    """
+    Raises ValueError unless 0 <= start_time < end_time
+    """
+    if clip.start_time < 0 or clip.end_time <= clip.start_time:
+        raise ValueError("A clip must start at 0 or later and end after it starts")
+
+def clip_audio_path(clip: Clip) -> Optional[str]:
+    """
+    The first existing local audio file of a clip's song, or None
+    """
+    for source in clip.song.audio_sources:
+        path = local_audio_path(source.url)
+        if path is not None and os.path.isfile(path):
+            return path
+    return None
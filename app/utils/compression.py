@@ -0,0 +1,66 @@
+import hashlib
+import os
+import sqlite3
+import zlib
+from typing import Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# zstandard is optional - it compresses lyrics a bit better and much faster than zlib
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Encoding used for new texts ("zstd" or "zlib"); existing rows keep the one they were written with
+TEXT_COMPRESSION = os.environ.get('TEXT_COMPRESSION') or ('zstd' if zstandard else 'zlib')
+if TEXT_COMPRESSION not in ('zstd', 'zlib'):
+    raise RuntimeError(f"TEXT_COMPRESSION must be 'zstd' or 'zlib', not '{TEXT_COMPRESSION}'")
+
+# Texts shorter than this (in UTF-8 bytes) are stored as plain text
+COMPRESS_MIN_BYTES = int(os.environ.get('TEXT_COMPRESS_MIN_BYTES') or 1024)
+
+def content_hash(content: str) -> str:
+    """
+    SHA-256 of a text, used to find identical texts
+    """
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def compress_text(content: str) -> Tuple[Optional[bytes], Optional[str]]:
+    """
+    Compress a text with TEXT_COMPRESSION
+    Returns (data, encoding), or (None, None) when the text is short or doesn't get smaller
+    """
+    raw = content.encode('utf-8')
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return None, None
+
+    if TEXT_COMPRESSION == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("TEXT_COMPRESSION=zstd requires the zstandard package")
+        data = zstandard.ZstdCompressor(level=10).compress(raw)
+    else:
+        data = zlib.compress(raw, 9)
+
+    if len(data) >= len(raw):
+        return None, None
+    return data, TEXT_COMPRESSION
+
+def decompress_text(data: bytes, encoding: str) -> str:
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("This text is zstd-compressed, install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    if encoding == 'zlib':
+        return zlib.decompress(data).decode('utf-8')
+    raise ValueError(f"Unknown text encoding '{encoding}'")
+
+@event.listens_for(Engine, 'connect')
+def register_sqlite_functions(dbapi_connection, connection_record):
+    """
+    Make decompress_text() available in SQL, so queries like
+    TextContent.content.ilike(...) also match compressed texts
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('decompress_text', 2, decompress_text, deterministic=True)
@@ -0,0 +1,60 @@
+import os
+import sqlite3
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+# Busy timeout in milliseconds - how long a writer waits for a lock before "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)
+
+# PRAGMAs applied to every new SQLite connection
+# WAL lets readers work while a request writes, NORMAL sync is safe in WAL mode
+# (a power loss can only lose the last commits, never corrupt the file)
+# auto_vacuum only takes effect on a new database (existing ones are converted by
+# a migration) and has to come first, before anything is written to the file
+SQLITE_PRAGMAS = {
+    'auto_vacuum': os.environ.get('SQLITE_AUTO_VACUUM', 'INCREMENTAL'),
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+    'cache_size': _env_int('SQLITE_CACHE_SIZE', -16000),  # negative = KiB, i.e. 16 MB per connection
+    'mmap_size': _env_int('SQLITE_MMAP_SIZE', 128 * 1024 * 1024)
+}
+
+def sqlite_engine_options() -> Dict:
+    """
+    Engine options for a file-based SQLite database (SQLALCHEMY_ENGINE_OPTIONS)
+
+    Connections are pooled instead of opened per session (Flask-SQLAlchemy's
+    default for SQLite), so the PRAGMAs and the page cache survive between
+    requests. Pooled connections move between request threads, which is safe
+    because a connection is only used by one session at a time.
+    """
+    return {
+        'poolclass': QueuePool,
+        'pool_size': _env_int('SQLITE_POOL_SIZE', 5),
+        'max_overflow': _env_int('SQLITE_MAX_OVERFLOW', 10),
+        'pool_timeout': _env_int('SQLITE_POOL_TIMEOUT', 30),
+        'connect_args': {
+            'check_same_thread': False,
+            'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000
+        }
+    }
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Configure every new SQLite connection with SQLITE_PRAGMAS
+    """
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
@@ -0,0 +1,225 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.utils.audio import BLOCK_FRAMES, mono, open_audio
+
+# Analysis frame: FFT size and hop in frames (at 44.1 kHz about 46 ms and 11.6 ms)
+FFT_SIZE = 2048
+HOP = 512
+
+# Log-spaced frequency bands the spectrum is summarized in
+BANDS = 24
+BAND_RANGE = (40.0, 11000.0)
+
+# Tempo search range and the tempo preferred when several fit (beats per minute)
+TEMPO_RANGE = (60.0, 200.0)
+PREFERRED_TEMPO = 120.0
+
+# How strongly beat tracking sticks to the estimated tempo
+BEAT_TIGHTNESS = 100.0
+
+# Sections: features are pooled to this resolution, the novelty kernel spans
+# KERNEL_SECONDS on each side and boundaries are at least MIN_SECTION_SECONDS apart
+POOL_SECONDS = 0.5
+KERNEL_SECONDS = 8.0
+MIN_SECTION_SECONDS = 8.0
+
+# Sections whose average features are at least this similar get the same label
+SAME_SECTION_SIMILARITY = 0.95
+
+
+def _band_matrix(sample_rate: int) -> np.ndarray:
+    """
+    (FFT bins, BANDS) matrix summing the power spectrum into log-spaced bands
+    """
+    frequencies = np.fft.rfftfreq(FFT_SIZE, 1.0 / sample_rate)
+    edges = np.geomspace(BAND_RANGE[0], min(BAND_RANGE[1], sample_rate / 2), BANDS + 1)
+    band = np.searchsorted(edges, frequencies, side='right') - 1
+    matrix = np.zeros((len(frequencies), BANDS), dtype=np.float32)
+    inside = (band >= 0) & (band < BANDS)
+    matrix[np.nonzero(inside)[0], band[inside]] = 1.0
+    return matrix
+
+def band_energies(path: str) -> Tuple[np.ndarray, int]:
+    """
+    Log band energies of a file, one row per HOP frames, computed block by
+    block with the FFT of all frames of a block at once
+    Returns (frames x BANDS array, sample rate)
+    """
+    audio = open_audio(path)
+    window = np.hanning(FFT_SIZE).astype(np.float32)
+    bands = _band_matrix(audio.sample_rate)
+
+    rows = []
+    carry = np.zeros(0, dtype=np.float32)
+    for block in audio.blocks(BLOCK_FRAMES):
+        samples = np.concatenate([carry, mono(block)])
+        count = (len(samples) - FFT_SIZE) // HOP + 1
+        if count <= 0:
+            carry = samples
+            continue
+        frames = np.lib.stride_tricks.sliding_window_view(samples, FFT_SIZE)[::HOP][:count]
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2
+        rows.append(np.log1p(power.astype(np.float32) @ bands))
+        carry = samples[count * HOP:]
+
+    if not rows:
+        return np.zeros((0, BANDS), dtype=np.float32), audio.sample_rate
+    return np.concatenate(rows), audio.sample_rate
+
+def onset_strength(energies: np.ndarray) -> np.ndarray:
+    """
+    Spectral flux: the summed increase of band energies from frame to frame,
+    with the local average removed and scaled to unit peak
+    """
+    if len(energies) < 2:
+        return np.zeros(len(energies), dtype=np.float32)
+    flux = np.maximum(np.diff(energies, axis=0), 0).sum(axis=1)
+    flux = np.concatenate([[0.0], flux])
+    smooth = np.convolve(flux, np.ones(16) / 16, mode='same')
+    onset = np.maximum(flux - smooth, 0)
+    peak = onset.max()
+    return (onset / peak if peak > 0 else onset).astype(np.float32)
+
+def estimate_tempo(onset: np.ndarray, frame_rate: float) -> float:
+    """
+    Tempo in BPM from the autocorrelation of the onset envelope (via FFT),
+    weighted towards PREFERRED_TEMPO so half/double tempos lose ties
+    """
+    if len(onset) < 4:
+        return 0.0
+    size = 1 << int(np.ceil(np.log2(2 * len(onset))))
+    spectrum = np.fft.rfft(onset - onset.mean(), size)
+    autocorrelation = np.fft.irfft(spectrum * np.conj(spectrum))[:len(onset)]
+
+    lags = np.arange(1, len(onset))
+    tempos = 60.0 * frame_rate / lags
+    candidates = (tempos >= TEMPO_RANGE[0]) & (tempos <= TEMPO_RANGE[1])
+    if not candidates.any():
+        return 0.0
+    weight = np.exp(-0.5 * (np.log2(tempos / PREFERRED_TEMPO) / 0.9) ** 2)
+    scores = np.where(candidates, autocorrelation[1:] * weight, -np.inf)
+    best = int(np.argmax(scores))
+
+    # Refine the lag between frames with a parabola through the peak and its neighbours
+    lag = float(lags[best])
+    if 0 < best < len(scores) - 1 and np.isfinite(scores[best - 1]) and np.isfinite(scores[best + 1]):
+        before, peak, after = scores[best - 1], scores[best], scores[best + 1]
+        curvature = before - 2 * peak + after
+        if curvature < 0:
+            lag += 0.5 * (before - after) / curvature
+    return 60.0 * frame_rate / lag
+
+def track_beats(onset: np.ndarray, frame_rate: float, tempo: float) -> np.ndarray:
+    """
+    Beat frames by dynamic programming (Ellis 2007): every frame's best
+    chain of beats ending there, rewarding onset strength and penalizing
+    intervals far from the tempo's period. The predecessors of a frame are
+    scored as one vectorized window, so only the pass over frames is a loop.
+    """
+    if tempo <= 0 or not len(onset):
+        return np.zeros(0, dtype=np.int64)
+    period = 60.0 * frame_rate / tempo
+    low, high = max(1, int(round(period / 2))), int(round(period * 2))
+    intervals = np.arange(high, low - 1, -1)  # Distances to the predecessors, oldest first
+    penalty = -BEAT_TIGHTNESS * np.log(intervals / period) ** 2
+
+    score = onset.astype(np.float64).copy()
+    backlink = np.full(len(onset), -1, dtype=np.int64)
+    for frame in range(low, len(onset)):
+        first = frame - high
+        candidates = score[max(first, 0):frame - low + 1] + penalty[max(-first, 0):]
+        best = int(np.argmax(candidates))
+        if candidates[best] > 0:
+            score[frame] += candidates[best]
+            backlink[frame] = max(first, 0) + best
+
+    # Follow the links back from the best frame within the last period
+    tail = max(0, len(onset) - int(round(period)))
+    beat = tail + int(np.argmax(score[tail:]))
+    beats = []
+    while beat >= 0:
+        beats.append(beat)
+        beat = backlink[beat]
+    return np.array(beats[::-1], dtype=np.int64)
+
+def _pool(energies: np.ndarray, size: int) -> np.ndarray:
+    count = len(energies) // size
+    if count == 0:
+        return energies.mean(axis=0, keepdims=True) if len(energies) else energies
+    return energies[:count * size].reshape(count, size, -1).mean(axis=1)
+
+def segment_sections(energies: np.ndarray, frame_rate: float) -> List[Dict]:
+    """
+    Sections from the self-similarity matrix of pooled band energies: a
+    checkerboard kernel slid along the diagonal gives a novelty curve whose
+    peaks are boundaries (Foote). Sections that sound alike share a label.
+    """
+    pool = max(1, int(round(POOL_SECONDS * frame_rate)))
+    features = _pool(energies, pool)
+    seconds_per_row = pool / frame_rate
+    duration = len(energies) / frame_rate
+    if len(features) < 4:
+        return [{'start': 0.0, 'end': round(duration, 3), 'label': 'A'}] if duration else []
+
+    features = features - features.mean(axis=0)
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    features = features / np.where(norms > 0, norms, 1)
+    similarity = features @ features.T
+
+    half = max(2, min(int(KERNEL_SECONDS / seconds_per_row), len(features) // 2))
+    signs = np.sign(np.arange(-half, half) + 0.5)
+    kernel = np.outer(signs, signs) * np.outer(np.hanning(2 * half), np.hanning(2 * half))
+    padded = np.pad(similarity, half, mode='edge')
+    offsets = np.arange(2 * half)
+    rows = np.arange(len(features))[:, None, None] + offsets[None, :, None]
+    columns = np.arange(len(features))[:, None, None] + offsets[None, None, :]
+    novelty = (padded[rows, columns] * kernel).sum(axis=(1, 2))
+    novelty = np.maximum(novelty, 0)
+
+    # Peaks: local maxima above the mean, at least MIN_SECTION_SECONDS apart, strongest first
+    distance = max(1, int(MIN_SECTION_SECONDS / seconds_per_row))
+    local_max = np.lib.stride_tricks.sliding_window_view(np.pad(novelty, distance, mode='constant'), 2 * distance + 1).max(axis=1)
+    candidates = np.nonzero((novelty == local_max) & (novelty > novelty.mean()))[0]
+    boundaries = []
+    for index in candidates[np.argsort(-novelty[candidates])]:
+        if distance <= index <= len(features) - distance and all(abs(index - other) >= distance for other in boundaries):
+            boundaries.append(int(index))
+    edges = [0] + sorted(boundaries) + [len(features)]
+
+    sections = []
+    labels = []  # (label, mean feature)
+    for start, end in zip(edges, edges[1:]):
+        mean = features[start:end].mean(axis=0)
+        mean /= np.linalg.norm(mean) or 1
+        label = next((name for name, other in labels if float(mean @ other) >= SAME_SECTION_SIMILARITY), None)
+        if label is None:
+            label = chr(ord('A') + len(labels)) if len(labels) < 26 else f'S{len(labels)}'
+            labels.append((label, mean))
+        sections.append({
+            'start': round(start * seconds_per_row, 3),
+            'end': round(end * seconds_per_row, 3),
+            'label': label
+        })
+    sections[-1]['end'] = round(duration, 3)
+    return sections
+
+def analyze_file(path: str) -> Dict:
+    """
+    Tempo, beat times and sections of a local audio file
+    A plain function of the file, so it can run in a worker process
+    """
+    energies, sample_rate = band_energies(path)
+    frame_rate = sample_rate / HOP
+    onset = onset_strength(energies)
+    tempo = estimate_tempo(onset, frame_rate)
+    beats = track_beats(onset, frame_rate, tempo)
+    # An onset shows up in a frame once it reaches the middle of the FFT window
+    offset = FFT_SIZE / 2 / sample_rate
+    return {
+        'duration': len(energies) * HOP / sample_rate,
+        'tempo': round(tempo, 2),
+        'beats': (beats * HOP / sample_rate + offset).astype(np.float32),
+        'sections': segment_sections(energies, frame_rate)
+    }
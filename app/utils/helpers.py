@@ -1,8 +1,20 @@
 import re
-import requests
+import time
 import urllib.parse
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, Tuple
+from app.utils.http import http_get
+from app.utils.providers import lyrics_providers, detect_language
+from app.utils.parsers import (
+    parse_html,
+    find_links,
+    parse_tekstowo_page,
+    parse_tekstowo_search,
+    parse_genius_page,
+    parse_musixmatch_search,
+    parse_musixmatch_page
+)
+from app.utils.tracing import debug, info, warning, error, stage, run_in_context, tracing_enabled
 
 def clean_youtube_url(url: str) -> str:
     """
@@ -34,21 +46,16 @@ def clean_youtube_url(url: str) -> str:
                 return f"https://youtu.be/{video_id}"
     
     except Exception as e:
-        print(f"Error cleaning YouTube URL: {e}")
+        warning("Error cleaning YouTube URL: %s", e)
     
     # If anything goes wrong, return the original URL
     return url
 
-def extract_youtube_info(url: str) -> Dict[str, str]:
+def parse_youtube_video_id(url: str) -> Optional[str]:
     """
-    Extract video ID and other info from YouTube URL
-    Returns dict with video details
+    Get the video ID from a YouTube URL (watch, embed, /v/ or youtu.be)
+    Returns None for other URLs
     """
-    # Clean up the URL by removing parameters like playlist and start_radio
-    url = clean_youtube_url(url)
-    print(f"Cleaned YouTube URL: {url}")
-    
-    # Extract video ID from different YouTube URL formats
     parsed_url = urllib.parse.urlparse(url)
     video_id = None
     
@@ -66,8 +73,22 @@ def extract_youtube_info(url: str) -> Dict[str, str]:
         if '?' in video_id:
             video_id = video_id.split('?')[0]
     
+    return video_id or None
+
+def extract_youtube_info(url: str) -> Dict[str, str]:
+    """
+    Extract video ID and other info from YouTube URL
+    Returns dict with video details
+    """
+    # Clean up the URL by removing parameters like playlist and start_radio
+    url = clean_youtube_url(url)
+    debug("Cleaned YouTube URL: %s", url)
+    
+    # Extract video ID from different YouTube URL formats
+    video_id = parse_youtube_video_id(url)
+    
     # Debug output
-    print(f"URL: {url}, Parsed video_id: {video_id}")
+    debug("URL: %s, Parsed video_id: %s", url, video_id)
     
     if not video_id:
         raise ValueError("Invalid YouTube URL")
@@ -80,7 +101,7 @@ def extract_youtube_info(url: str) -> Dict[str, str]:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        oembed_response = requests.get(oembed_url, headers=headers)
+        oembed_response = http_get(oembed_url, headers=headers)
         if oembed_response.status_code == 200:
             oembed_data = oembed_response.json()
             title = oembed_data.get('title')
@@ -93,8 +114,8 @@ def extract_youtube_info(url: str) -> Dict[str, str]:
             # Get description using video info endpoint
             try:
                 info_url = f"https://www.youtube.com/get_video_info?video_id={video_id}"
-                info_response = requests.get(info_url, headers=headers)
-                print(f"Video info response status: {info_response.status_code}")
+                info_response = http_get(info_url, headers=headers)
+                debug("Video info response status: %s", info_response.status_code)
                 
                 if info_response.status_code == 200:
                     info_data = urllib.parse.parse_qs(info_response.text)
@@ -104,34 +125,34 @@ def extract_youtube_info(url: str) -> Dict[str, str]:
                         player_response = json.loads(info_data['player_response'][0])
                         video_details = player_response.get('videoDetails', {})
                         description = video_details.get('shortDescription', '')
-                        print(f"Found description in video_info ({len(description)} chars)")
+                        debug("Found description in video_info (%s chars)", len(description))
                     else:
-                        print("No player_response found in video_info")
+                        debug("No player_response found in video_info")
                         description = ""
                 else:
                     description = ""
             except Exception as e:
-                print(f"Error fetching video description: {e}")
+                warning("Error fetching video description: %s", e)
                 description = ""
             
             # Try to extract artist and title from description if present
             if description:
-                print(f"Analyzing YouTube description: {description[:200]}...")
+                debug("Analyzing YouTube description: %s...", description[:200])
                 desc_artist, desc_title = extract_info_from_description(description)
                 
                 # Use description-extracted info if available and current info is weak
                 if desc_artist and (artist == "Unknown Artist" or desc_artist in channel_name):
-                    print(f"Found artist in description: {desc_artist}")
+                    debug("Found artist in description: %s", desc_artist)
                     artist = desc_artist
                 
                 if desc_title and (song_title == "Unknown Title" or song_title == title):
-                    print(f"Found title in description: {desc_title}")
+                    debug("Found title in description: %s", desc_title)
                     song_title = desc_title
                 
                 # Special case for "Topic" channels, which are official artist channels
                 if channel_name and "- Topic" in channel_name and artist == "Unknown Artist":
                     topic_artist = channel_name.replace(" - Topic", "").strip()
-                    print(f"Using artist name from Topic channel: {topic_artist}")
+                    debug("Using artist name from Topic channel: %s", topic_artist)
                     artist = topic_artist
             
             return {
@@ -145,15 +166,15 @@ def extract_youtube_info(url: str) -> Dict[str, str]:
             }
     
     except Exception as e:
-        print(f"Error fetching from oembed: {e}")
+        warning("Error fetching from oembed: %s", e)
     
     # Fallback: Try to scrape the info from the page if oembed fails
     try:
         # Get YouTube page content
-        response = requests.get(f"https://www.youtube.com/watch?v={video_id}", headers={
+        response = http_get(f"https://www.youtube.com/watch?v={video_id}", headers={
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = parse_html(response.text)
         
         # Extract title (usually in the title tag)
         title = soup.find('title').text.replace(' - YouTube', '').strip() if soup.find('title') else None
@@ -167,7 +188,7 @@ def extract_youtube_info(url: str) -> Dict[str, str]:
         for tag in meta_tags:
             if tag.get('property') == 'og:description' or tag.get('name') == 'description':
                 description = tag.get('content')
-                print(f"Found description in meta tag: '{description[:100]}...'")
+                debug("Found description in meta tag: '%s...'", description[:100])
             elif tag.get('property') == 'og:image':
                 thumbnail = tag.get('content')
             elif tag.get('name') == 'author':
@@ -175,7 +196,7 @@ def extract_youtube_info(url: str) -> Dict[str, str]:
             elif tag.get('property') == 'og:site_name':
                 if not channel_name and '- Topic' in tag.get('content', ''):
                     channel_name = tag.get('content')
-                    print(f"Found channel from og:site_name: '{channel_name}'")
+                    debug("Found channel from og:site_name: '%s'", channel_name)
         
         # Try to find more channel info
         for link in soup.find_all('link', {'rel': 'canonical'}):
@@ -183,14 +204,14 @@ def extract_youtube_info(url: str) -> Dict[str, str]:
                 channel_title = link.get('title')
                 if channel_title and (not channel_name or len(channel_title) > len(channel_name)):
                     channel_name = channel_title
-                    print(f"Found channel from canonical link: '{channel_name}'")
+                    debug("Found channel from canonical link: '%s'", channel_name)
         
         # Look for channel info in span elements with specific attributes
         for span in soup.find_all('span', attrs={'itemprop': 'author'}):
             author_link = span.find('link', attrs={'itemprop': 'name'})
             if author_link and author_link.get('content'):
                 channel_name = author_link.get('content')
-                print(f"Found channel from itemprop author: '{channel_name}'")
+                debug("Found channel from itemprop author: '%s'", channel_name)
                 break
         
         # Extract artist and song title using the format_youtube_title function
@@ -203,7 +224,7 @@ def extract_youtube_info(url: str) -> Dict[str, str]:
             description_container = soup.select_one('meta[name="description"]')
             if description_container:
                 full_description = description_container.get('content', '')
-                print(f"Found full description in meta tag ({len(full_description)} chars)")
+                debug("Found full description in meta tag (%s chars)", len(full_description))
             
             # Try to find description in script tag
             if not full_description:
@@ -219,12 +240,12 @@ def extract_youtube_info(url: str) -> Dict[str, str]:
                                 data = json.loads(json_str)
                                 if isinstance(data, dict) and 'description' in data:
                                     full_description = data['description']
-                                    print(f"Found full description in script ({len(full_description)} chars)")
+                                    debug("Found full description in script (%s chars)", len(full_description))
                                     break
                         except Exception as script_error:
-                            print(f"Error extracting description from script: {script_error}")
+                            warning("Error extracting description from script: %s", script_error)
         except Exception as desc_error:
-            print(f"Error finding full description: {desc_error}")
+            warning("Error finding full description: %s", desc_error)
             
         # Use the more detailed description if available
         if full_description and len(full_description) > len(description or ""):
@@ -232,22 +253,22 @@ def extract_youtube_info(url: str) -> Dict[str, str]:
         
         # Try to extract artist and title from description if present
         if description:
-            print(f"Analyzing YouTube description: {description[:200]}...")
+            debug("Analyzing YouTube description: %s...", description[:200])
             desc_artist, desc_title = extract_info_from_description(description)
             
             # Use description-extracted info if available and current info is weak
             if desc_artist and (artist == "Unknown Artist" or desc_artist in channel_name):
-                print(f"Found artist in description: {desc_artist}")
+                debug("Found artist in description: %s", desc_artist)
                 artist = desc_artist
             
             if desc_title and (song_title == "Unknown Title" or song_title == title):
-                print(f"Found title in description: {desc_title}")
+                debug("Found title in description: %s", desc_title)
                 song_title = desc_title
                 
             # Special case for "Topic" channels, which are official artist channels
             if channel_name and "- Topic" in channel_name and artist == "Unknown Artist":
                 topic_artist = channel_name.replace(" - Topic", "").strip()
-                print(f"Using artist name from Topic channel: {topic_artist}")
+                debug("Using artist name from Topic channel: %s", topic_artist)
                 artist = topic_artist
         
         # Try to extract channel name from JSON-LD data
@@ -273,7 +294,7 @@ def extract_youtube_info(url: str) -> Dict[str, str]:
             'song_title': song_title
         }
     except Exception as e:
-        print(f"Error fetching YouTube info: {e}")
+        warning("Error fetching YouTube info: %s", e)
         # Return just the video ID if we couldn't fetch additional info
         return {
             'video_id': video_id,
@@ -332,7 +353,7 @@ def extract_info_from_description(description: str) -> Tuple[Optional[str], Opti
         
         # If we changed the text, update our lines
         if processed_text != description:
-            print(f"Pre-processed concatenated description")
+            debug("Pre-processed concatenated description")
             lines = processed_text.split('\n')
     
     # First pass: look for the most reliable artist indicators - standalone lines in the first 5 lines
@@ -346,7 +367,7 @@ def extract_info_from_description(description: str) -> Tuple[Optional[str], Opti
             if 1 <= len(words) <= 3 and all(len(word) > 1 for word in words):
                 if not any(ch in line for ch in [':', '-', '/', 'http']):  # Avoid lines with separators or URLs
                     potential_artist_names.append(line)
-                    print(f"Found potential artist name: '{line}'")
+                    debug("Found potential artist name: '%s'", line)
     
     # If we found any potential artist names, use the first one
     if potential_artist_names:
@@ -372,7 +393,7 @@ def extract_info_from_description(description: str) -> Tuple[Optional[str], Opti
                             title = raw_title
                     else:
                         title = raw_title
-                    print(f"Found title from description pattern: '{title}'")
+                    debug("Found title from description pattern: '%s'", title)
                     break
                     
         # Look for artist info if we didn't find one in the first pass
@@ -386,12 +407,12 @@ def extract_info_from_description(description: str) -> Tuple[Optional[str], Opti
                         artist_match = re.match(r'([a-zA-Z]+)(\d+.*)', raw_artist)
                         if artist_match:
                             artist = artist_match.group(1)
-                            print(f"Cleaned up artist name from '{raw_artist}' to '{artist}'")
+                            debug("Cleaned up artist name from '%s' to '%s'", raw_artist, artist)
                         else:
                             artist = raw_artist
                     else:
                         artist = raw_artist
-                    print(f"Found artist from description pattern: '{artist}'")
+                    debug("Found artist from description pattern: '%s'", artist)
                     break
         
         # If we have both, we can stop
@@ -408,7 +429,7 @@ def extract_info_from_description(description: str) -> Tuple[Optional[str], Opti
                     artist = parts[0].strip()
                 if not title:
                     title = parts[1].strip()
-                print(f"Found artist-title pair from description: '{artist} - {title}'")
+                debug("Found artist-title pair from description: '%s - %s'", artist, title)
                 break
     
     return artist, title
@@ -428,182 +449,138 @@ def get_youtube_embed_html(video_id: str) -> str:
     </div>
     '''
 
+def _lyrics_result(lyrics: str, response) -> Dict[str, Optional[str]]:
+    """
+    Bundle found lyrics with the page they came from
+    The validators are kept so the lyrics can later be revalidated with a conditional GET
+    """
+    return {
+        'lyrics': lyrics,
+        'source_url': response.url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified')
+    }
+
+def find_lyrics(artist: str, title: str) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Search for lyrics using multiple sources
+    Providers are tried in the order suggested by their past hit rate and latency
+    Returns dict with lyrics, provider, source_url, etag and last_modified if found, None otherwise
+    """
+    debug("=========== LYRICS SEARCH ===========")
+    debug("Starting lyrics search for: '%s' - '%s'", artist, title)
+    debug("======================================")
+    
+    language = detect_language(f"{artist} {title}")
+    providers = lyrics_providers.ordered(language)
+    if tracing_enabled():
+        debug("Detected language: %s, provider order: %s", language, ', '.join(name for name, _, _ in providers))
+    
+    for i, (name, label, search) in enumerate(providers, start=1):
+        debug("[%s/%s] Trying %s...", i, len(providers), label)
+        started = time.perf_counter()
+        with stage('provider', name):
+            result = search(artist, title)
+        lyrics_providers.record(name, bool(result), time.perf_counter() - started, language)
+        
+        if result:
+            lyrics = result['lyrics']
+            info("SUCCESS! Found lyrics on %s (%s chars)", label, len(lyrics))
+            debug("Sample: '%s...'", lyrics[:100])
+            return dict(result, provider=name)
+        else:
+            debug("Failed to find lyrics on %s", label)
+    
+    debug("❌ All sources failed. No lyrics found for '%s' - '%s'", artist, title)
+    return None
+
 def search_for_lyrics(artist: str, title: str) -> Optional[str]:
     """
     Search for lyrics using multiple sources
     Returns lyrics text if found, None otherwise
     """
-    print(f"\n=========== LYRICS SEARCH ===========")
-    print(f"Starting lyrics search for: '{artist}' - '{title}'")
-    print(f"======================================\n")
-    
-    # Try different sources in order of reliability
-    print(f"[1/3] Trying tekstowo.pl...")
-    lyrics = search_tekstowo(artist, title)
-    if lyrics:
-        print(f"SUCCESS! Found lyrics on tekstowo.pl ({len(lyrics)} chars)")
-        print(f"Sample: '{lyrics[:100]}...'")
-        return lyrics
-    else:
-        print(f"Failed to find lyrics on tekstowo.pl")
+    result = find_lyrics(artist, title)
+    return result['lyrics'] if result else None
     
-    print(f"\n[2/3] Trying Genius...")
-    lyrics = search_genius(artist, title)
-    if lyrics:
-        print(f"SUCCESS! Found lyrics on Genius ({len(lyrics)} chars)")
-        print(f"Sample: '{lyrics[:100]}...'")
-        return lyrics
-    else:
-        print(f"Failed to find lyrics on Genius")
+def _tekstowo_metadata_matches(actual_artist: Optional[str], actual_title: Optional[str], artist: str, title: str) -> bool:
+    """
+    Check if the artist or title found on a lyrics page resembles the one we searched for
+    """
+    artist_match = actual_artist and (
+        actual_artist.lower() == artist.lower() or 
+        artist.lower() in actual_artist.lower() or 
+        actual_artist.lower() in artist.lower()
+    )
+    
+    title_match = actual_title and (
+        actual_title.lower() == title.lower() or
+        title.lower() in actual_title.lower() or
+        actual_title.lower() in title.lower()
+    )
+    
+    return bool(artist_match or title_match)
+
+def _tekstowo_direct_url(artist: str, title: str, headers: Dict[str, str]) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Try the guessed tekstowo.pl song URL (piosenka,artist,title.html)
+    Returns a lyrics result dict if the page exists, None otherwise
+    """
+    direct_url_pattern = f"https://www.tekstowo.pl/piosenka,{artist.lower().replace(' ', '_')},{title.lower().replace(' ', '_')}.html"
+    debug("   Attempting direct URL match: %s", direct_url_pattern)
     
-    print(f"\n[3/3] Trying Musixmatch...")
-    lyrics = search_musixmatch(artist, title)
-    if lyrics:
-        print(f"SUCCESS! Found lyrics on Musixmatch ({len(lyrics)} chars)")
-        print(f"Sample: '{lyrics[:100]}...'")
-        return lyrics
-    else:
-        print(f"Failed to find lyrics on Musixmatch")
+    try:
+        direct_response = http_get(direct_url_pattern, headers=headers)
+        debug("   Direct URL response status: %s", direct_response.status_code)
+        
+        if direct_response.status_code == 200:
+            # Check if we got a lyrics page or a search results page
+            lyrics, actual_artist, actual_title = parse_tekstowo_page(direct_response.text)
+            if lyrics:
+                debug("   Direct URL match - Artist: '%s', Title: '%s'", actual_artist, actual_title)
+                info("   ✅ SUCCESS via direct URL match! Found lyrics: %s characters", len(lyrics))
+                return _lyrics_result(lyrics, direct_response)
+    except Exception as direct_url_error:
+        warning("   ⚠️ Error trying direct URL: %s", direct_url_error)
     
-    print(f"\n❌ All sources failed. No lyrics found for '{artist}' - '{title}'")
     return None
-    
-def search_tekstowo(artist: str, title: str) -> Optional[str]:
+
+def _tekstowo_site_search(artist: str, title: str, headers: Dict[str, str]) -> Optional[str]:
     """
-    Search for lyrics on tekstowo.pl
-    Returns lyrics text if found, None otherwise
+    Search tekstowo.pl's own search page for the best matching result
+    Returns the URL of its lyrics page (open it with _tekstowo_search_result), None if nothing was found
     """
-    print(f"🔍 Detailed search on tekstowo.pl:")
-    print(f"   Artist: '{artist}'")
-    print(f"   Title: '{title}'")
-    
-    # Format search query
-    search_query = f"{artist} {title}".replace(" ", "+")
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
     try:
-        # Try exact match first (direct URL pattern)
-        direct_url_pattern = f"https://www.tekstowo.pl/piosenka,{artist.lower().replace(' ', '_')},{title.lower().replace(' ', '_')}.html"
-        print(f"   Attempting direct URL match: {direct_url_pattern}")
-        
-        try:
-            direct_response = requests.get(direct_url_pattern, headers=headers)
-            print(f"   Direct URL response status: {direct_response.status_code}")
-            
-            if direct_response.status_code == 200:
-                direct_soup = BeautifulSoup(direct_response.text, 'html.parser')
-                
-                # Check if we got a lyrics page or a search results page
-                lyrics_div = direct_soup.find('div', {'class': 'inner-text'})
-                if lyrics_div:
-                    # Get the actual artist and title from the page
-                    # The structure of the site has changed, so we need to try multiple methods
-                    actual_artist = None
-                    actual_title = None
-                    
-                    # First method: Try the traditional song-info structure
-                    song_info_div = direct_soup.find('div', {'id': 'song-info'})
-                    if song_info_div:
-                        artist_elem = song_info_div.find('a', {'class': 'artist'})
-                        if artist_elem:
-                            actual_artist = artist_elem.text.strip()
-                        
-                        title_elem = song_info_div.find('h1')
-                        if title_elem:
-                            actual_title = title_elem.text.strip()
-                    
-                    # Alternative method: Extract from the page title
-                    if not actual_artist or not actual_title:
-                        page_title = direct_soup.find('title')
-                        if page_title:
-                            title_text = page_title.text.strip()
-                            # Remove common suffixes
-                            for suffix in [' - tekst i tłumaczenie piosenki na Tekstowo.pl', ' - tekst piosenki na Tekstowo.pl']:
-                                if suffix in title_text:
-                                    title_text = title_text.replace(suffix, '')
-                            
-                            # Try to split by dash
-                            if ' - ' in title_text:
-                                parts = title_text.split(' - ', 1)
-                                actual_artist = parts[0].strip()
-                                actual_title = parts[1].strip()
-                    
-                    # Third method: Try to extract from H1
-                    if not actual_artist or not actual_title:
-                        h1_elem = direct_soup.find('h1')
-                        if h1_elem and ' - ' in h1_elem.text:
-                            parts = h1_elem.text.strip().split(' - ', 1)
-                            actual_artist = parts[0].strip()
-                            actual_title = parts[1].strip()
-                    
-                    print(f"   Direct URL match - Artist: '{actual_artist}', Title: '{actual_title}'")
-                    
-                    # If we have a match, return the lyrics
-                    lyrics = lyrics_div.get_text(strip=True)
-                    print(f"   ✅ SUCCESS via direct URL match! Found lyrics: {len(lyrics)} characters")
-                    return lyrics
-        except Exception as direct_url_error:
-            print(f"   ⚠️ Error trying direct URL: {direct_url_error}")
-        
-        # Try direct search on tekstowo.pl
         tekstowo_search_url = f"https://www.tekstowo.pl/szukaj,wykonawca,{artist.replace(' ', '+')},tytul,{title.replace(' ', '+')}.html"
-        print(f"   Direct search URL: {tekstowo_search_url}")
-        
-        search_response = requests.get(tekstowo_search_url, headers=headers)
-        print(f"   Search response status: {search_response.status_code}")
+        debug("   Direct search URL: %s", tekstowo_search_url)
         
-        search_soup = BeautifulSoup(search_response.text, 'html.parser')
+        search_response = http_get(tekstowo_search_url, headers=headers)
+        debug("   Search response status: %s", search_response.status_code)
         
         # Look for search results - specifically looking for results that match our search terms
-        all_result_links = search_soup.select('.content a.title')
-        print(f"   Found {len(all_result_links)} total direct search results")
+        all_results = parse_tekstowo_search(search_response.text)
+        debug("   Found %s total direct search results", len(all_results))
         
         # Filter results to find more accurate matches
         filtered_results = []
-        for link in all_result_links:
-            result_title = link.text.strip()
-            result_href = link.get('href')
-            result_artist = None
-            
-            # Try to get artist from parent elements
-            parent_box = link.find_parent('div', class_='box-przeboje')
-            if parent_box:
-                artist_link = parent_box.select_one('a.artyst')
-                if artist_link:
-                    result_artist = artist_link.text.strip()
+        for result in all_results:
+            result_title = result['title']
+            result_artist = result['artist']
             
             # Print all results for debugging
-            print(f"   Result: '{result_title}' - Artist: '{result_artist}'")
+            debug("   Result: '%s' - Artist: '%s'", result_title, result_artist)
             
             # If we found an artist match, prioritize it
             if result_artist and result_artist.lower() == artist.lower():
                 # This is a direct match for our artist, add it with high priority
-                filtered_results.insert(0, {
-                    'title': result_title,
-                    'href': result_href,
-                    'artist': result_artist,
-                    'score': 100  # Highest priority
-                })
+                filtered_results.insert(0, dict(result, score=100))
             # If title contains our search title, add it
             elif title.lower() in result_title.lower():
-                filtered_results.append({
-                    'title': result_title,
-                    'href': result_href,
-                    'artist': result_artist,
-                    'score': 50
-                })
+                filtered_results.append(dict(result, score=50))
             # Otherwise, add it with low priority
             else:
-                filtered_results.append({
-                    'title': result_title,
-                    'href': result_href,
-                    'artist': result_artist,
-                    'score': 10
-                })
+                filtered_results.append(dict(result, score=10))
         
-        print(f"   Found {len(filtered_results)} filtered results")
+        debug("   Found %s filtered results", len(filtered_results))
         
         if filtered_results:
             # Sort by score (highest first)
@@ -613,178 +590,146 @@ def search_tekstowo(artist: str, title: str) -> Optional[str]:
             best_result = filtered_results[0]
             result_title = best_result['title']
             result_url = "https://www.tekstowo.pl" + best_result['href']
-            print(f"   Best match: '{result_title}' (score: {best_result['score']}) at {result_url}")
-            
-            # Get lyrics page
-            lyrics_response = requests.get(result_url, headers=headers)
-            print(f"   Lyrics page response status: {lyrics_response.status_code}")
-            
-            lyrics_soup = BeautifulSoup(lyrics_response.text, 'html.parser')
-            
-            # Find lyrics text
-            lyrics_div = lyrics_soup.find('div', {'class': 'inner-text'})
-            if lyrics_div:
-                lyrics = lyrics_div.get_text(strip=True)
-                
-                # Verify if it's a reasonable match by checking the page metadata
-                # The structure of the site has changed, so we need to try multiple methods
-                actual_artist = None
-                actual_title = None
-                
-                # First method: Try the traditional song-info structure
-                song_info_div = lyrics_soup.find('div', {'id': 'song-info'})
-                if song_info_div:
-                    artist_elem = song_info_div.find('a', {'class': 'artist'})
-                    if artist_elem:
-                        actual_artist = artist_elem.text.strip()
-                    
-                    title_elem = song_info_div.find('h1')
-                    if title_elem:
-                        actual_title = title_elem.text.strip()
-                
-                # Alternative method: Extract from the page title
-                if not actual_artist or not actual_title:
-                    page_title = lyrics_soup.find('title')
-                    if page_title:
-                        title_text = page_title.text.strip()
-                        # Remove common suffixes
-                        for suffix in [' - tekst i tłumaczenie piosenki na Tekstowo.pl', ' - tekst piosenki na Tekstowo.pl']:
-                            if suffix in title_text:
-                                title_text = title_text.replace(suffix, '')
-                        
-                        # Try to split by dash
-                        if ' - ' in title_text:
-                            parts = title_text.split(' - ', 1)
-                            actual_artist = parts[0].strip()
-                            actual_title = parts[1].strip()
-                
-                # Third method: Try to extract from H1
-                if not actual_artist or not actual_title:
-                    h1_elem = lyrics_soup.find('h1')
-                    if h1_elem and ' - ' in h1_elem.text:
-                        parts = h1_elem.text.strip().split(' - ', 1)
-                        actual_artist = parts[0].strip()
-                        actual_title = parts[1].strip()
-                
-                print(f"   Page metadata - Artist: '{actual_artist}', Title: '{actual_title}'")
-                
-                # Validate the match
-                artist_match = actual_artist and (
-                    actual_artist.lower() == artist.lower() or 
-                    artist.lower() in actual_artist.lower() or 
-                    actual_artist.lower() in artist.lower()
-                )
-                
-                title_match = actual_title and (
-                    actual_title.lower() == title.lower() or
-                    title.lower() in actual_title.lower() or
-                    actual_title.lower() in title.lower()
-                )
-                
-                if artist_match or title_match:
-                    print(f"   ✅ SUCCESS via direct search! Found lyrics: {len(lyrics)} characters")
-                    if actual_artist and actual_artist != artist:
-                        print(f"   ℹ️ Note: Found lyrics for artist '{actual_artist}' instead of '{artist}'")
-                    if actual_title and actual_title != title:
-                        print(f"   ℹ️ Note: Found lyrics for title '{actual_title}' instead of '{title}'")
-                    return lyrics
-                else:
-                    print(f"   ⚠️ Found lyrics but metadata doesn't match our search. Continuing search...")
+            debug("   Best match: '%s' (score: %s) at %s", result_title, best_result['score'], result_url)
+            return result_url
+        else:
+            debug("   ❌ No direct search results found")
+    except Exception as search_error:
+        warning("   ⚠️ Error in tekstowo.pl site search: %s", search_error)
+    
+    return None
+
+def _tekstowo_search_result(artist: str, title: str, result_url: str, headers: Dict[str, str]) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Open the lyrics page of a site search result (see _tekstowo_site_search)
+    Returns a lyrics result dict if it is the song we searched for, None otherwise
+    """
+    try:
+        lyrics_response = http_get(result_url, headers=headers)
+        debug("   Lyrics page response status: %s", lyrics_response.status_code)
+        
+        lyrics, actual_artist, actual_title = parse_tekstowo_page(lyrics_response.text)
+        if lyrics:
+            # Verify if it's a reasonable match by checking the page metadata
+            debug("   Page metadata - Artist: '%s', Title: '%s'", actual_artist, actual_title)
+            
+            if _tekstowo_metadata_matches(actual_artist, actual_title, artist, title):
+                info("   ✅ SUCCESS via direct search! Found lyrics: %s characters", len(lyrics))
+                if actual_artist and actual_artist != artist:
+                    debug("   ℹ️ Note: Found lyrics for artist '%s' instead of '%s'", actual_artist, artist)
+                if actual_title and actual_title != title:
+                    debug("   ℹ️ Note: Found lyrics for title '%s' instead of '%s'", actual_title, title)
+                return _lyrics_result(lyrics, lyrics_response)
             else:
-                print(f"   ❌ Found result page but no lyrics div found")
+                warning("   ⚠️ Found lyrics but metadata doesn't match our search. Continuing search...")
         else:
-            print(f"   ❌ No direct search results found")
+            debug("   ❌ Found result page but no lyrics div found")
+    except Exception as search_error:
+        warning("   ⚠️ Error in tekstowo.pl site search: %s", search_error)
     
-        # Fallback: Search on Google
-        search_url = f"https://www.google.com/search?q=site:tekstowo.pl+{search_query}"
-        print(f"   Fallback: Google search URL: {search_url}")
-        
-        response = requests.get(search_url, headers=headers)
-        print(f"   Google search response status: {response.status_code}")
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Find first tekstowo.pl result
-        google_results = []
-        for link in soup.find_all('a'):
-            href = link.get('href')
-            if href and 'tekstowo.pl' in href and 'text' in href:
-                google_results.append(href)
-        
-        print(f"   Found {len(google_results)} Google search results for tekstowo.pl")
-        
-        if google_results:
-            # Extract actual URL from Google redirect
-            tekstowo_url = google_results[0].split('&')[0].replace('/url?q=', '')
-            print(f"   First Google result URL: {tekstowo_url}")
-            
-            # Get lyrics page
-            lyrics_response = requests.get(tekstowo_url, headers=headers)
-            print(f"   Lyrics page response status (via Google): {lyrics_response.status_code}")
-            
-            lyrics_soup = BeautifulSoup(lyrics_response.text, 'html.parser')
-            
-            # Find lyrics text
-            lyrics_div = lyrics_soup.find('div', {'class': 'inner-text'})
-            if lyrics_div:
-                lyrics = lyrics_div.get_text(strip=True)
-                
-                # Verify if it's a reasonable match by checking the page metadata
-                song_info_div = lyrics_soup.find('div', {'id': 'song-info'})
-                actual_artist = None
-                actual_title = None
-                
-                if song_info_div:
-                    artist_elem = song_info_div.find('a', {'class': 'artist'})
-                    if artist_elem:
-                        actual_artist = artist_elem.text.strip()
-                    
-                    title_elem = song_info_div.find('h1')
-                    if title_elem:
-                        actual_title = title_elem.text.strip()
-                
-                print(f"   Page metadata (Google search) - Artist: '{actual_artist}', Title: '{actual_title}'")
-                
-                # Validate the match
-                artist_match = actual_artist and (
-                    actual_artist.lower() == artist.lower() or 
-                    artist.lower() in actual_artist.lower() or 
-                    actual_artist.lower() in artist.lower()
-                )
-                
-                title_match = actual_title and (
-                    actual_title.lower() == title.lower() or
-                    title.lower() in actual_title.lower() or
-                    actual_title.lower() in title.lower()
-                )
-                
-                if artist_match or title_match:
-                    print(f"   ✅ SUCCESS via Google! Found lyrics: {len(lyrics)} characters")
-                    if actual_artist and actual_artist != artist:
-                        print(f"   ℹ️ Note: Found lyrics for artist '{actual_artist}' instead of '{artist}'")
-                    if actual_title and actual_title != title:
-                        print(f"   ℹ️ Note: Found lyrics for title '{actual_title}' instead of '{title}'")
-                    return lyrics
-                else:
-                    print(f"   ⚠️ Found lyrics via Google but metadata doesn't match our search.")
+    return None
+
+def _tekstowo_google(artist: str, title: str, headers: Dict[str, str]) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Find a tekstowo.pl lyrics page through Google
+    Returns a lyrics result dict if a matching song was found, None otherwise
+    """
+    search_query = f"{artist} {title}".replace(" ", "+")
+    search_url = f"https://www.google.com/search?q=site:tekstowo.pl+{search_query}"
+    debug("   Fallback: Google search URL: %s", search_url)
+    
+    response = http_get(search_url, headers=headers)
+    debug("   Google search response status: %s", response.status_code)
+    
+    # Find first tekstowo.pl result
+    google_results = find_links(response.text, lambda href: 'tekstowo.pl' in href and 'text' in href)
+    debug("   Found %s Google search results for tekstowo.pl", len(google_results))
+    
+    if google_results:
+        # Extract actual URL from Google redirect
+        tekstowo_url = google_results[0].split('&')[0].replace('/url?q=', '')
+        debug("   First Google result URL: %s", tekstowo_url)
+        
+        # Get lyrics page
+        lyrics_response = http_get(tekstowo_url, headers=headers)
+        debug("   Lyrics page response status (via Google): %s", lyrics_response.status_code)
+        
+        lyrics, actual_artist, actual_title = parse_tekstowo_page(lyrics_response.text)
+        if lyrics:
+            # Verify if it's a reasonable match by checking the page metadata
+            debug("   Page metadata (Google search) - Artist: '%s', Title: '%s'", actual_artist, actual_title)
+            
+            if _tekstowo_metadata_matches(actual_artist, actual_title, artist, title):
+                info("   ✅ SUCCESS via Google! Found lyrics: %s characters", len(lyrics))
+                if actual_artist and actual_artist != artist:
+                    debug("   ℹ️ Note: Found lyrics for artist '%s' instead of '%s'", actual_artist, artist)
+                if actual_title and actual_title != title:
+                    debug("   ℹ️ Note: Found lyrics for title '%s' instead of '%s'", actual_title, title)
+                return _lyrics_result(lyrics, lyrics_response)
             else:
-                print(f"   ❌ Found result page via Google but no lyrics div found")
+                warning("   ⚠️ Found lyrics via Google but metadata doesn't match our search.")
+        else:
+            debug("   ❌ Found result page via Google but no lyrics div found")
+    
+    return None
+
+def fetch_tekstowo(artist: str, title: str) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Search for lyrics on tekstowo.pl
+    The guessed direct URL and the site search page are requested at the same
+    time; the exact direct URL wins whenever it has lyrics, and only when it has
+    none is the site search's best result opened. Google is only asked if both fail
+    Returns a lyrics result dict if found, None otherwise
+    """
+    debug("🔍 Detailed search on tekstowo.pl:")
+    debug("   Artist: '%s'", artist)
+    debug("   Title: '%s'", title)
+    
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    
+    try:
+        # Run the direct URL guess and the site search speculatively in parallel -
+        # the direct URL often 404s, and waiting for that before searching costs a full round trip
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='tekstowo')
+        try:
+            direct = executor.submit(run_in_context(_tekstowo_direct_url, artist, title, headers))
+            search = executor.submit(run_in_context(_tekstowo_site_search, artist, title, headers))
+            # The direct URL takes precedence whatever finishes first, so the result doesn't depend on timing
+            result = direct.result()
+            if result:
+                return result
+            result_url = search.result()
+        finally:
+            # Don't wait for the site search page once the direct URL has lyrics
+            executor.shutdown(wait=False)
+        # Its result page is only opened when the direct URL missed
+        if result_url:
+            result = _tekstowo_search_result(artist, title, result_url, headers)
+            if result:
+                return result
+        
+        # Fallback: Search on Google
+        result = _tekstowo_google(artist, title, headers)
+        if result:
+            return result
     except Exception as e:
         import traceback
-        print(f"   ❌ ERROR searching tekstowo.pl: {e}")
-        print(traceback.format_exc())
+        error("   ❌ ERROR searching tekstowo.pl: %s", e)
+        error(traceback.format_exc())
     
-    print("   ❌ No lyrics found on tekstowo.pl after all attempts")
+    debug("   ❌ No lyrics found on tekstowo.pl after all attempts")
     return None
     
-def search_genius(artist: str, title: str) -> Optional[str]:
+def fetch_genius(artist: str, title: str) -> Optional[Dict[str, Optional[str]]]:
     """
     Search for lyrics on Genius
-    Returns lyrics text if found, None otherwise
+    Returns a lyrics result dict if found, None otherwise
     """
-    print(f"🔍 Detailed search on Genius:")
-    print(f"   Artist: '{artist}'")
-    print(f"   Title: '{title}'")
+    debug("🔍 Detailed search on Genius:")
+    debug("   Artist: '%s'", artist)
+    debug("   Title: '%s'", title)
     
     # Format search query
     search_query = f"{artist} {title} lyrics".replace(" ", "+")
@@ -795,99 +740,54 @@ def search_genius(artist: str, title: str) -> Optional[str]:
     try:
         # Search on Google
         search_url = f"https://www.google.com/search?q=site:genius.com+{search_query}"
-        print(f"   Google search URL: {search_url}")
-        
-        response = requests.get(search_url, headers=headers)
-        print(f"   Google search response status: {response.status_code}")
+        debug("   Google search URL: %s", search_url)
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        response = http_get(search_url, headers=headers)
+        debug("   Google search response status: %s", response.status_code)
         
         # Find first genius.com result
-        genius_results = []
-        for link in soup.find_all('a'):
-            href = link.get('href')
-            if href and 'genius.com' in href and ('/lyrics/' in href or '-lyrics' in href):
-                genius_results.append(href)
-                
-        print(f"   Found {len(genius_results)} Google search results for Genius")
+        genius_results = find_links(response.text, lambda href: 'genius.com' in href and ('/lyrics/' in href or '-lyrics' in href))
+        debug("   Found %s Google search results for Genius", len(genius_results))
         
         if genius_results:
             # Extract actual URL from Google redirect
             genius_url = genius_results[0].split('&')[0].replace('/url?q=', '')
-            print(f"   First Genius result URL: {genius_url}")
+            debug("   First Genius result URL: %s", genius_url)
             
             # Get lyrics page
-            lyrics_response = requests.get(genius_url, headers=headers)
-            print(f"   Lyrics page response status: {lyrics_response.status_code}")
-            
-            lyrics_soup = BeautifulSoup(lyrics_response.text, 'html.parser')
-            
-            # Try to get the song title from Genius page
-            song_title_element = lyrics_soup.select_one('h1')
-            if song_title_element:
-                song_title = song_title_element.text.strip()
-                print(f"   Song title on Genius: '{song_title}'")
+            lyrics_response = http_get(genius_url, headers=headers)
+            debug("   Lyrics page response status: %s", lyrics_response.status_code)
             
-            # Try to get the artist from Genius page
-            artist_element = lyrics_soup.select_one('a[href*="/artists/"]')
-            if artist_element:
-                artist_name = artist_element.text.strip()
-                print(f"   Artist on Genius: '{artist_name}'")
-                
-            # Find lyrics text - Genius stores lyrics in multiple divs with class 'Lyrics__Container'
-            print(f"   Trying to find lyrics with class 'Lyrics__Container'...")
-            lyrics_divs = lyrics_soup.find_all('div', {'class': 'Lyrics__Container'})
-            if lyrics_divs:
-                lyrics = ''
-                for div in lyrics_divs:
-                    lyrics += div.get_text() + '\n'
-                print(f"   ✅ SUCCESS! Found lyrics with class selector: {len(lyrics)} characters")
-                return lyrics
-            
-            # Try alternative selectors if the standard one fails
-            print(f"   Trying alternative selector '[data-lyrics-container=\"true\"]'...")
-            lyrics_div = lyrics_soup.select_one('[data-lyrics-container="true"]')
-            if lyrics_div:
-                lyrics = lyrics_div.get_text()
-                print(f"   ✅ SUCCESS! Found lyrics with data attribute selector: {len(lyrics)} characters")
-                return lyrics
-            
-            # Try more generic selectors if all else fails
-            print(f"   Trying more generic selectors...")
-            potential_lyrics_containers = [
-                lyrics_soup.select('.lyrics'),
-                lyrics_soup.select('.song_body-lyrics'),
-                lyrics_soup.select('.song-lyrics'),
-            ]
+            lyrics, artist_name, song_title = parse_genius_page(lyrics_response.text)
+            if song_title:
+                debug("   Song title on Genius: '%s'", song_title)
+            if artist_name:
+                debug("   Artist on Genius: '%s'", artist_name)
             
-            for container_list in potential_lyrics_containers:
-                if container_list:
-                    lyrics = ''
-                    for container in container_list:
-                        lyrics += container.get_text() + '\n'
-                    print(f"   ✅ SUCCESS! Found lyrics with generic selector: {len(lyrics)} characters")
-                    return lyrics
+            if lyrics:
+                info("   ✅ SUCCESS! Found lyrics on Genius page: %s characters", len(lyrics))
+                return _lyrics_result(lyrics, lyrics_response)
             
-            print(f"   ❌ Found Genius page but could not locate lyrics with any selector")
+            debug("   ❌ Found Genius page but could not locate lyrics with any selector")
         else:
-            print(f"   ❌ No Genius results found on Google")
+            debug("   ❌ No Genius results found on Google")
                     
     except Exception as e:
         import traceback
-        print(f"   ❌ ERROR searching Genius: {e}")
-        print(traceback.format_exc())
+        error("   ❌ ERROR searching Genius: %s", e)
+        error(traceback.format_exc())
     
-    print("   ❌ No lyrics found on Genius after all attempts")
+    debug("   ❌ No lyrics found on Genius after all attempts")
     return None
     
-def search_musixmatch(artist: str, title: str) -> Optional[str]:
+def fetch_musixmatch(artist: str, title: str) -> Optional[Dict[str, Optional[str]]]:
     """
     Search for lyrics on Musixmatch
-    Returns lyrics text if found, None otherwise
+    Returns a lyrics result dict if found, None otherwise
     """
-    print(f"🔍 Detailed search on Musixmatch:")
-    print(f"   Artist: '{artist}'")
-    print(f"   Title: '{title}'")
+    debug("🔍 Detailed search on Musixmatch:")
+    debug("   Artist: '%s'", artist)
+    debug("   Title: '%s'", title)
     
     # Format search query
     search_query = f"{artist} {title} lyrics".replace(" ", "+")
@@ -898,141 +798,100 @@ def search_musixmatch(artist: str, title: str) -> Optional[str]:
     try:
         # Try direct search first
         direct_url = f"https://www.musixmatch.com/search/{search_query.replace('+', '%20')}"
-        print(f"   Direct search URL: {direct_url}")
+        debug("   Direct search URL: %s", direct_url)
         
         try:
-            direct_response = requests.get(direct_url, headers=headers)
-            print(f"   Direct search response status: {direct_response.status_code}")
-            
-            direct_soup = BeautifulSoup(direct_response.text, 'html.parser')
+            direct_response = http_get(direct_url, headers=headers)
+            debug("   Direct search response status: %s", direct_response.status_code)
             
-            # Try to find the first search result
-            search_results = direct_soup.select('.title')
-            print(f"   Found {len(search_results)} direct search results")
+            # Get the first search result
+            result_link = parse_musixmatch_search(direct_response.text)
             
-            if search_results and len(search_results) > 0:
-                # Get the first result href
-                result_link = None
-                for result in search_results:
-                    parent = result.parent
-                    if parent and parent.name == 'a' and 'href' in parent.attrs:
-                        result_link = parent['href']
-                        break
+            if result_link:
+                result_url = f"https://www.musixmatch.com{result_link}"
+                debug("   First result URL: %s", result_url)
                 
-                if result_link:
-                    result_url = f"https://www.musixmatch.com{result_link}"
-                    print(f"   First result URL: {result_url}")
-                    
-                    # Get lyrics page
-                    lyrics_response = requests.get(result_url, headers=headers)
-                    print(f"   Lyrics page response status: {lyrics_response.status_code}")
-                    
-                    lyrics_soup = BeautifulSoup(lyrics_response.text, 'html.parser')
-                    
-                    # Try to get actual song title and artist
-                    song_header = lyrics_soup.select_one('.mxm-track-title h1')
-                    if song_header:
-                        print(f"   Song title on page: '{song_header.text.strip()}'")
-                    
-                    artist_header = lyrics_soup.select_one('.mxm-track-title h2 a')
-                    if artist_header:
-                        print(f"   Artist on page: '{artist_header.text.strip()}'")
-                    
-                    # Search for lyrics using various selectors
-                    print(f"   Searching for lyrics content in page...")
-                    
-                    # Try primary selector
-                    lyrics_divs = lyrics_soup.find_all('span', {'class': 'lyrics__content__ok'})
-                    if lyrics_divs:
-                        lyrics = ''
-                        for div in lyrics_divs:
-                            lyrics += div.get_text() + '\n'
-                        print(f"   ✅ SUCCESS! Found lyrics with primary selector: {len(lyrics)} characters")
-                        return lyrics
-                        
-                    # Try alternative selectors
-                    lyrics_divs = lyrics_soup.select('.mxm-lyrics__content span')
-                    if lyrics_divs:
-                        lyrics = ''
-                        for div in lyrics_divs:
-                            lyrics += div.get_text() + '\n'
-                        print(f"   ✅ SUCCESS! Found lyrics with secondary selector: {len(lyrics)} characters")
-                        return lyrics
-                    
-                    # Try more generic content
-                    lyrics_content = lyrics_soup.select_one('.mxm-lyrics__content')
-                    if lyrics_content:
-                        lyrics = lyrics_content.get_text()
-                        print(f"   ✅ SUCCESS! Found lyrics with generic content selector: {len(lyrics)} characters")
-                        return lyrics
-                    
-                    print(f"   ❌ Found lyrics page but could not extract lyrics content")
-                else:
-                    print(f"   ❌ Found search results but could not extract result link")
+                # Get lyrics page
+                lyrics_response = http_get(result_url, headers=headers)
+                debug("   Lyrics page response status: %s", lyrics_response.status_code)
+                
+                lyrics, artist_name, song_title = parse_musixmatch_page(lyrics_response.text)
+                if song_title:
+                    debug("   Song title on page: '%s'", song_title)
+                if artist_name:
+                    debug("   Artist on page: '%s'", artist_name)
+                
+                if lyrics:
+                    info("   ✅ SUCCESS! Found lyrics on Musixmatch page: %s characters", len(lyrics))
+                    return _lyrics_result(lyrics, lyrics_response)
+                
+                debug("   ❌ Found lyrics page but could not extract lyrics content")
             else:
-                print(f"   ❌ No direct search results found")
+                debug("   ❌ No direct search results found")
         except Exception as direct_error:
-            print(f"   ⚠️ Error in direct search: {direct_error}")
+            warning("   ⚠️ Error in direct search: %s", direct_error)
                 
         # Fallback: Search on Google
         search_url = f"https://www.google.com/search?q=site:musixmatch.com+{search_query}"
-        print(f"   Google search URL: {search_url}")
+        debug("   Google search URL: %s", search_url)
         
-        response = requests.get(search_url, headers=headers)
-        print(f"   Google search response status: {response.status_code}")
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
+        response = http_get(search_url, headers=headers)
+        debug("   Google search response status: %s", response.status_code)
         
         # Find first musixmatch.com result
-        musixmatch_results = []
-        for link in soup.find_all('a'):
-            href = link.get('href')
-            if href and 'musixmatch.com' in href and '/lyrics/' in href:
-                musixmatch_results.append(href)
-        
-        print(f"   Found {len(musixmatch_results)} Google search results for Musixmatch")
+        musixmatch_results = find_links(response.text, lambda href: 'musixmatch.com' in href and '/lyrics/' in href)
+        debug("   Found %s Google search results for Musixmatch", len(musixmatch_results))
         
         if musixmatch_results:
             # Extract actual URL from Google redirect
             musixmatch_url = musixmatch_results[0].split('&')[0].replace('/url?q=', '')
-            print(f"   First Google result URL: {musixmatch_url}")
+            debug("   First Google result URL: %s", musixmatch_url)
             
             # Get lyrics page
-            lyrics_response = requests.get(musixmatch_url, headers=headers)
-            print(f"   Lyrics page response status (via Google): {lyrics_response.status_code}")
+            lyrics_response = http_get(musixmatch_url, headers=headers)
+            debug("   Lyrics page response status (via Google): %s", lyrics_response.status_code)
             
-            lyrics_soup = BeautifulSoup(lyrics_response.text, 'html.parser')
+            lyrics, _, _ = parse_musixmatch_page(lyrics_response.text, generic_fallback=False)
+            if lyrics:
+                info("   ✅ SUCCESS via Google! Found lyrics: %s characters", len(lyrics))
+                return _lyrics_result(lyrics, lyrics_response)
             
-            # Find lyrics text
-            lyrics_divs = lyrics_soup.find_all('span', {'class': 'lyrics__content__ok'})
-            if lyrics_divs:
-                lyrics = ''
-                for div in lyrics_divs:
-                    lyrics += div.get_text() + '\n'
-                print(f"   ✅ SUCCESS via Google! Found lyrics: {len(lyrics)} characters")
-                return lyrics
-                
-            # Try alternative selectors
-            lyrics_divs = lyrics_soup.select('.mxm-lyrics__content span')
-            if lyrics_divs:
-                lyrics = ''
-                for div in lyrics_divs:
-                    lyrics += div.get_text() + '\n'
-                print(f"   ✅ SUCCESS via Google (alt method)! Found lyrics: {len(lyrics)} characters")
-                return lyrics
-            
-            print(f"   ❌ Found result page via Google but no lyrics content found")
+            debug("   ❌ Found result page via Google but no lyrics content found")
         else:
-            print(f"   ❌ No Musixmatch results found on Google")
+            debug("   ❌ No Musixmatch results found on Google")
             
     except Exception as e:
         import traceback
-        print(f"   ❌ ERROR searching Musixmatch: {e}")
-        print(traceback.format_exc())
+        error("   ❌ ERROR searching Musixmatch: %s", e)
+        error(traceback.format_exc())
     
-    print("   ❌ No lyrics found on Musixmatch after all attempts")
+    debug("   ❌ No lyrics found on Musixmatch after all attempts")
     return None
 
+def search_tekstowo(artist: str, title: str) -> Optional[str]:
+    """
+    Search for lyrics on tekstowo.pl
+    Returns lyrics text if found, None otherwise
+    """
+    result = fetch_tekstowo(artist, title)
+    return result['lyrics'] if result else None
+
+def search_genius(artist: str, title: str) -> Optional[str]:
+    """
+    Search for lyrics on Genius
+    Returns lyrics text if found, None otherwise
+    """
+    result = fetch_genius(artist, title)
+    return result['lyrics'] if result else None
+
+def search_musixmatch(artist: str, title: str) -> Optional[str]:
+    """
+    Search for lyrics on Musixmatch
+    Returns lyrics text if found, None otherwise
+    """
+    result = fetch_musixmatch(artist, title)
+    return result['lyrics'] if result else None
+
 def format_song_title(artist: str, title: str) -> str:
     """Format song title for display"""
     return f"{artist} - {title}"
@@ -1042,14 +901,14 @@ def format_youtube_title(youtube_title: str) -> Tuple[str, str]:
     Try to extract artist and title from YouTube video title
     Returns tuple of (artist, title)
     """
-    print(f"\n🔍 Analyzing YouTube title: '{youtube_title}'")
+    debug("🔍 Analyzing YouTube title: '%s'", youtube_title)
     
     # If the title ends with "- Topic", it's likely from YouTube Music
     # and the format is likely "Song Name - Artist Name - Topic"
     if youtube_title.endswith(" - Topic"):
         # This is a "- Topic" format which is an artist channel
         artist_name = youtube_title.replace(" - Topic", "").strip()
-        print(f"  ✅ Detected 'Topic' channel format! Artist: '{artist_name}'")
+        info("  ✅ Detected 'Topic' channel format! Artist: '%s'", artist_name)
         return artist_name, youtube_title  # We'll try to get the song title elsewhere
     
     # Common patterns for YouTube music titles
@@ -1066,21 +925,21 @@ def format_youtube_title(youtube_title: str) -> Tuple[str, str]:
     ]
     
     for i, pattern in enumerate(patterns):
-        print(f"  Trying pattern: {pattern_names[i]}")
+        debug("  Trying pattern: %s", pattern_names[i])
         match = re.match(pattern, youtube_title)
         if match:
             artist = match.group(1).strip()
             title = match.group(2).strip()
-            print(f"  ✅ Pattern matched! Artist: '{artist}', Title: '{title}'")
+            info("  ✅ Pattern matched! Artist: '%s', Title: '%s'", artist, title)
             return artist, title
         else:
-            print(f"  ❌ Pattern did not match")
+            debug("  ❌ Pattern did not match")
     
     # Special case for "Topic" channels which are official artist channels
     if " - Topic" in youtube_title:
-        print(f"  Trying special case for Topic channel in title")
+        debug("  Trying special case for Topic channel in title")
         parts = youtube_title.split(" - ")
-        print(f"  Split parts: {parts}")
+        debug("  Split parts: %s", parts)
         
         if len(parts) >= 2:
             # Last part before "- Topic" is usually the artist
@@ -1095,9 +954,15 @@ def format_youtube_title(youtube_title: str) -> Tuple[str, str]:
                 artist = " ".join(artist_parts)
                 # The first part is usually the title
                 title = parts[0]
-                print(f"  ✅ Topic special case matched! Artist: '{artist}', Title: '{title}'")
+                info("  ✅ Topic special case matched! Artist: '%s', Title: '%s'", artist, title)
                 return artist, title
     
     # If no pattern matches, return original as title with unknown artist
-    print(f"  ❌ No patterns matched. Using fallback: Artist='Unknown Artist', Title='{youtube_title.strip()}'")
-    return "Unknown Artist", youtube_title.strip()
\ No newline at end of file
+    debug("  ❌ No patterns matched. Using fallback: Artist='Unknown Artist', Title='%s'", youtube_title.strip())
+    return "Unknown Artist", youtube_title.strip()
+
+# Register lyrics providers - the priority is only used until there are enough
+# statistics to order them by hit rate and latency
+lyrics_providers.register('tekstowo', 'tekstowo.pl', fetch_tekstowo, priority=10, language_priority={'en': 20})
+lyrics_providers.register('genius', 'Genius', fetch_genius, priority=20, language_priority={'en': 10})
+lyrics_providers.register('musixmatch', 'Musixmatch', fetch_musixmatch, priority=30)
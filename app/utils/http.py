@@ -0,0 +1,20 @@
+import requests
+
+from app.utils.tracing import stage
+
+# Default timeout (connect, read) in seconds for outgoing requests
+DEFAULT_TIMEOUT = (5, 15)
+
+# One session for all scrapers - keeps connections to the lyrics sites alive
+# between requests and gives a single place to mount transport adapters
+# (see app/utils/replay.py for offline fixture replay)
+http_session = requests.Session()
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    """
+    GET a URL through the shared session
+    Accepts the same keyword arguments as requests.get
+    """
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    with stage('http', url):
+        return http_session.get(url, **kwargs)
@@ -0,0 +1,458 @@
+import gzip
+import json
+import math
+import sys
+from datetime import datetime
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import bindparam, exists, func, select
+from sqlalchemy.engine import Connection
+
+from app import db
+from app.models.models import (
+    Artist,
+    AudioSource,
+    Clip,
+    PackedWordTimestamps,
+    Song,
+    TextContent,
+    WordTimestamp,
+    song_audio_association,
+    song_text_association
+)
+from app.utils.artists import normalize_artist_name
+from app.utils.clips import clip_fields
+from app.utils.compression import compress_text, content_hash, decompress_text
+from app.utils.helpers import parse_youtube_video_id
+from app.utils.timestamps import WordTimings
+from app.utils.timing_import import validate_word_timings
+
+# First line of an export, so imports can tell the file apart from other NDJSON
+LIBRARY_FORMAT = 'lyraclipmap-library'
+LIBRARY_VERSION = 1
+
+# TextContent columns copied as they are (content and timestamps are handled separately)
+TEXT_FIELDS = ['content_type', 'language', 'source_url', 'etag', 'last_modified', 'fetched_at', 'checked_at']
+DATETIME_FIELDS = {'fetched_at', 'checked_at'}
+
+# Clip columns in an export
+CLIP_FIELDS = ['start_time', 'end_time', 'title', 'color', 'tags']
+
+
+def open_library_file(path: str, mode: str = 'r') -> IO[str]:
+    """
+    Open an export file for reading or writing text ("-" is stdin/stdout), gzip-compressed if it ends with .gz
+    """
+    if path == '-':
+        return sys.stdin if mode == 'r' else sys.stdout
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+def _words_by_text(text_ids: List[int]) -> Dict[int, WordTimings]:
+    """
+    Word timings of a page of texts - packed blobs first, WordTimestamp rows for the rest
+    """
+    if not text_ids:
+        return {}
+    timings = {}
+    packed = db.session.execute(
+        select(PackedWordTimestamps.text_content_id, PackedWordTimestamps.data)
+        .where(PackedWordTimestamps.text_content_id.in_(text_ids))
+    )
+    for text_id, data in packed:
+        timings[text_id] = WordTimings.unpack(data, text_id)
+
+    unpacked = [text_id for text_id in text_ids if text_id not in timings]
+    if unpacked:
+        rows = {}
+        for row in db.session.execute(
+            select(WordTimestamp.text_content_id, WordTimestamp.word, WordTimestamp.start_time, WordTimestamp.end_time)
+            .where(WordTimestamp.text_content_id.in_(unpacked))
+            .order_by(WordTimestamp.text_content_id, WordTimestamp.start_time)
+        ):
+            rows.setdefault(row.text_content_id, []).append(row)
+        for text_id, words in rows.items():
+            timings[text_id] = WordTimings.from_rows(words, text_id)
+    return timings
+
+def export_library(batch_size: int = 500) -> Iterator[Dict]:
+    """
+    Yield the whole library as JSON-ready dicts: a header, then one record per
+    song with its texts (including word timestamps), audio sources and clips
+
+    Songs are read by id in pages of batch_size with plain column queries, so
+    memory use doesn't grow with the library. Texts shared by several songs
+    are repeated in each - the import stores them once again. A song's private
+    copy of a text (with its own timings) is marked "private".
+    """
+    yield {
+        'format': LIBRARY_FORMAT,
+        'version': LIBRARY_VERSION,
+        'exported_at': datetime.utcnow().isoformat(),
+        'songs': db.session.execute(select(func.count(Song.id))).scalar()
+    }
+
+    last_id = 0
+    while True:
+        songs = db.session.execute(
+            select(Song.id, Song.title, Song.artist).where(Song.id > last_id).order_by(Song.id).limit(batch_size)
+        ).all()
+        if not songs:
+            break
+        song_ids = [song.id for song in songs]
+
+        texts = {}
+        for row in db.session.execute(
+            select(song_text_association.c.song_id, TextContent.__table__)
+            .join(TextContent.__table__, TextContent.id == song_text_association.c.text_content_id)
+            .where(song_text_association.c.song_id.in_(song_ids))
+            .order_by(song_text_association.c.song_id, TextContent.id)
+        ).mappings():
+            texts.setdefault(row['song_id'], []).append(row)
+        timings = _words_by_text(list({row['id'] for rows in texts.values() for row in rows}))
+
+        sources = {}
+        for row in db.session.execute(
+            select(song_audio_association.c.song_id, AudioSource.url, AudioSource.source_type)
+            .join(AudioSource, AudioSource.id == song_audio_association.c.audio_source_id)
+            .where(song_audio_association.c.song_id.in_(song_ids))
+            .order_by(song_audio_association.c.song_id, AudioSource.id)
+        ):
+            sources.setdefault(row.song_id, []).append({'url': row.url, 'source_type': row.source_type})
+
+        clips = {}
+        for row in db.session.execute(
+            select(*[Clip.__table__.c[field] for field in ['song_id'] + CLIP_FIELDS])
+            .where(Clip.song_id.in_(song_ids))
+            .order_by(Clip.song_id, Clip.start_time)
+        ).mappings():
+            clips.setdefault(row['song_id'], []).append({field: row[field] for field in CLIP_FIELDS})
+
+        for song in songs:
+            song_texts = []
+            for row in texts.get(song.id, []):
+                content = row['content']
+                if row['content_encoding']:
+                    content = decompress_text(row['content_compressed'], row['content_encoding'])
+                record = {field: row[field] for field in TEXT_FIELDS}
+                for field in DATETIME_FIELDS:
+                    record[field] = _iso(record[field])
+                record['content'] = content
+                if row['owner_song_id'] is not None:
+                    record['private'] = True
+                if row['id'] in timings:
+                    record['words'] = [[word.word, word.start_time, word.end_time] for word in timings[row['id']]]
+                song_texts.append(record)
+
+            yield {
+                'id': song.id,
+                'title': song.title,
+                'artist': song.artist,
+                'texts': song_texts,
+                'audio_sources': sources.get(song.id, []),
+                'clips': clips.get(song.id, [])
+            }
+
+        last_id = songs[-1].id
+
+def ndjson_lines(records: Iterable[Dict]) -> Iterator[str]:
+    """
+    Records as NDJSON lines (one JSON document per line)
+    """
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+def write_ndjson(records: Iterable[Dict], stream: IO[str]) -> int:
+    """
+    Write records as NDJSON
+    Returns the number of lines written
+    """
+    count = 0
+    for line in ndjson_lines(records):
+        stream.write(line)
+        count += 1
+    return count
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+def validate_song_record(record: Dict):
+    """
+    Check the fields of one song record before it is imported
+    Raises ValueError describing the first problem
+    """
+    if not isinstance(record.get('title'), str) or not isinstance(record.get('artist'), str) \
+            or not record['title'] or not record['artist']:
+        raise ValueError("a song needs a title and an artist")
+    for field in ('texts', 'audio_sources', 'clips'):
+        if not isinstance(record.get(field, []), list) or not all(isinstance(item, dict) for item in record.get(field, [])):
+            raise ValueError(f"'{field}' must be a list of objects")
+
+    for number, text in enumerate(record.get('texts', []), 1):
+        if not isinstance(text.get('content'), str):
+            raise ValueError(f"text {number}: 'content' must be a string")
+        if not isinstance(text.get('content_type'), str) or not text['content_type']:
+            raise ValueError(f"text {number}: 'content_type' must be a non-empty string")
+        if not isinstance(text.get('language') or '', str):
+            raise ValueError(f"text {number}: 'language' must be a string")
+        for field in DATETIME_FIELDS:
+            if text.get(field):
+                try:
+                    datetime.fromisoformat(text[field])
+                except (TypeError, ValueError):
+                    raise ValueError(f"text {number}: '{field}' is not an ISO date")
+        words = text.get('words') or []
+        if not isinstance(words, list) or not all(
+            isinstance(word, list) and len(word) == 3 and isinstance(word[0], str)
+            and _is_number(word[1]) and _is_number(word[2]) for word in words
+        ):
+            raise ValueError(f"text {number}: 'words' must be a list of [word, start, end]")
+        try:
+            validate_word_timings(words)
+        except ValueError as e:
+            raise ValueError(f"text {number}: {e}")
+
+    for number, source in enumerate(record.get('audio_sources', []), 1):
+        if not isinstance(source.get('url'), str) or not isinstance(source.get('source_type'), str):
+            raise ValueError(f"audio source {number}: 'url' and 'source_type' must be strings")
+
+    for number, clip in enumerate(record.get('clips', []), 1):
+        if not _is_number(clip.get('start_time')) or not _is_number(clip.get('end_time')) \
+                or clip['end_time'] <= clip['start_time']:
+            raise ValueError(f"clip {number}: needs numeric 'start_time' and a later 'end_time'")
+        try:
+            clip_fields(clip)
+        except ValueError as e:
+            raise ValueError(f"clip {number}: {e}")
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[Dict]:
+    """
+    Parse NDJSON lines lazily, skipping blank ones
+    Raises ValueError with the line number for invalid JSON, a wrong header or
+    an invalid song record (see validate_song_record)
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {number}: {e}")
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {number}: expected a JSON object")
+        if 'format' in record:
+            if record['format'] != LIBRARY_FORMAT or record.get('version') != LIBRARY_VERSION:
+                raise ValueError(f"Line {number}: unsupported export format {record['format']} version {record.get('version')}")
+            continue
+        try:
+            validate_song_record(record)
+        except ValueError as e:
+            raise ValueError(f"Line {number}: {e}")
+        yield record
+
+
+def _begin_write(connection: Connection):
+    # Hold the write lock for the whole batch - new ids are assigned from MAX(id)
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+def _next_id(connection: Connection, table) -> int:
+    return (connection.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+def _in(column, values):
+    return column.in_(bindparam(f'{column.name}_values', list(values), expanding=True))
+
+def _resolve_artists(connection: Connection, songs: List[Dict], now: datetime) -> Dict[str, int]:
+    """
+    Find or create the Artist of every song in a batch and add the songs to its counts
+    Returns artist ids by normalized name
+    """
+    artists = Artist.__table__
+    names = {}
+    counts = {}
+    for song in songs:
+        normalized = normalize_artist_name(song['artist'])
+        names.setdefault(normalized, set()).add(song['artist'])
+        counts[normalized] = counts.get(normalized, 0) + 1
+
+    existing = {row.normalized_name: row for row in connection.execute(
+        select(artists.c.id, artists.c.name, artists.c.normalized_name, artists.c.aliases)
+        .where(_in(artists.c.normalized_name, names))
+    )}
+
+    ids = {}
+    new_artists = []
+    next_id = _next_id(connection, artists)
+    for normalized, spellings in names.items():
+        row = existing.get(normalized)
+        if row is None:
+            spellings = sorted(spellings)
+            new_artists.append({'id': next_id, 'name': spellings[0], 'normalized_name': normalized,
+                                'aliases': spellings[1:], 'song_count': counts[normalized], 'last_added_at': now})
+            ids[normalized] = next_id
+            next_id += 1
+            continue
+
+        ids[normalized] = row.id
+        aliases = list(row.aliases or [])
+        aliases += sorted(spelling for spelling in spellings if spelling != row.name and spelling not in aliases)
+        connection.execute(
+            artists.update().where(artists.c.id == row.id).values(
+                song_count=artists.c.song_count + counts[normalized], last_added_at=now, aliases=aliases
+            )
+        )
+
+    if new_artists:
+        connection.execute(artists.insert(), new_artists)
+    return ids
+
+def _text_key(record: Dict, song_id: int) -> tuple:
+    # Private and timed texts belong to their song, shared ones are found by content
+    private = record.get('private') or record.get('words')
+    return record['content_type'], record['content_hash'], song_id if private else None
+
+def _resolve_texts(connection: Connection, songs: List[Dict], first_song_id: int) -> Dict[tuple, int]:
+    """
+    Find or insert every distinct text of a batch (songs get ids from
+    first_song_id on), with the word timestamps of new ones
+    Private texts and texts with word timings are always inserted, owned by their song
+    Returns text ids by _text_key
+    """
+    texts = TextContent.__table__
+    wanted = {}
+    for song_id, song in enumerate(songs, first_song_id):
+        for record in song.get('texts', []):
+            record['content_hash'] = content_hash(record['content'])
+            wanted.setdefault(_text_key(record, song_id), record)
+    if not wanted:
+        return {}
+
+    ids = {(row.content_type, row.content_hash, None): row.id for row in connection.execute(
+        select(texts.c.id, texts.c.content_type, texts.c.content_hash)
+        .where(_in(texts.c.content_hash, {digest for _, digest, _ in wanted}), texts.c.owner_song_id.is_(None),
+               ~exists().where(PackedWordTimestamps.text_content_id == texts.c.id),
+               ~exists().where(WordTimestamp.text_content_id == texts.c.id))
+    )}
+
+    new_texts = []
+    packed = []
+    next_id = _next_id(connection, texts)
+    for key, record in wanted.items():
+        if key in ids:
+            continue
+        data, encoding = compress_text(record['content'])
+        row = {field: record.get(field) for field in TEXT_FIELDS}
+        for field in DATETIME_FIELDS:
+            row[field] = datetime.fromisoformat(row[field]) if row[field] else None
+        row.update(id=next_id, content='' if encoding else record['content'], content_compressed=data,
+                   content_encoding=encoding, content_hash=record['content_hash'], owner_song_id=key[2])
+        new_texts.append(row)
+        if record.get('words'):
+            timings = WordTimings.from_words(record['words'], next_id)
+            packed.append({'text_content_id': next_id, 'word_count': len(timings), 'data': timings.pack()})
+        ids[key] = next_id
+        next_id += 1
+
+    if new_texts:
+        connection.execute(texts.insert(), new_texts)
+    if packed:
+        connection.execute(PackedWordTimestamps.__table__.insert(), packed)
+    return ids
+
+def _import_batch(connection: Connection, songs: List[Dict], counts: Dict[str, int]):
+    """
+    Insert one batch of song records in a single transaction
+    Songs with the same title and artist as a stored song are skipped, so an
+    interrupted import can simply be run again
+    """
+    song_table = Song.__table__
+    now = datetime.utcnow()
+
+    with connection.begin():
+        _begin_write(connection)
+        stored = {(row.title, row.artist) for row in connection.execute(
+            select(song_table.c.title, song_table.c.artist).where(_in(song_table.c.artist, {song['artist'] for song in songs}))
+        )}
+        new_songs = []
+        for song in songs:
+            key = (song['title'], song['artist'])
+            if key in stored:
+                counts['skipped'] += 1
+                continue
+            stored.add(key)
+            new_songs.append(song)
+        if not new_songs:
+            return
+
+        artist_ids = _resolve_artists(connection, new_songs, now)
+        texts_before = _next_id(connection, TextContent.__table__)
+        song_id = _next_id(connection, song_table)
+        text_ids = _resolve_texts(connection, new_songs, song_id)
+
+        song_rows, text_links, audio_rows, audio_links, clip_rows = [], set(), [], [], []
+        audio_id = _next_id(connection, AudioSource.__table__)
+        for song in new_songs:
+            texts = song.get('texts', [])
+            song_rows.append({'id': song_id, 'title': song['title'], 'artist': song['artist'],
+                              'artist_id': artist_ids[normalize_artist_name(song['artist'])],
+                              'has_lyrics': any(record['content_type'] == 'lyrics' for record in texts),
+                              'languages': sorted({record['language'] for record in texts
+                                                   if record.get('language') and record['language'] != 'unknown'})})
+            for record in texts:
+                text_links.add((song_id, text_ids[_text_key(record, song_id)]))
+            for source in song.get('audio_sources', []):
+                audio_rows.append({'id': audio_id, 'url': source['url'], 'source_type': source['source_type'],
+                                   'video_id': parse_youtube_video_id(source['url'])})
+                audio_links.append({'song_id': song_id, 'audio_source_id': audio_id})
+                audio_id += 1
+            for clip in song.get('clips', []):
+                clip_rows.append(dict({field: clip.get(field) for field in CLIP_FIELDS}, song_id=song_id,
+                                      tags=clip.get('tags') or [], created_at=now))
+            song_id += 1
+
+        connection.execute(song_table.insert(), song_rows)
+        if text_links:
+            connection.execute(song_text_association.insert(),
+                               [{'song_id': song, 'text_content_id': text_id} for song, text_id in sorted(text_links)])
+        if audio_rows:
+            connection.execute(AudioSource.__table__.insert(), audio_rows)
+            connection.execute(song_audio_association.insert(), audio_links)
+        if clip_rows:
+            connection.execute(Clip.__table__.insert(), clip_rows)
+
+    counts['songs'] += len(song_rows)
+    counts['texts'] += sum(1 for text_id in set(text_ids.values()) if text_id >= texts_before)
+    counts['audio_sources'] += len(audio_rows)
+    counts['clips'] += len(clip_rows)
+
+def import_library(records: Iterable[Dict], batch_size: int = 1000,
+                   progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+    """
+    Import song records produced by export_library, checked by
+    validate_song_record (read_ndjson does that line by line)
+
+    Records are consumed as they come and written batch_size songs per
+    transaction with executemany inserts. Ids are assigned while holding the
+    write lock instead of reading them back row by row, identical texts are
+    stored once and artists and their counts are kept up to date.
+    Returns counters: "songs", "skipped", "texts" (new rows), "audio_sources" and "clips"
+    """
+    counts = {'songs': 0, 'skipped': 0, 'texts': 0, 'audio_sources': 0, 'clips': 0}
+    with db.engine.connect() as connection:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                _import_batch(connection, batch, counts)
+                batch = []
+                if progress:
+                    progress(counts)
+        if batch:
+            _import_batch(connection, batch, counts)
+            if progress:
+                progress(counts)
+    return counts
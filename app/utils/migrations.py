@@ -0,0 +1,220 @@
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, inspect, text
+from sqlalchemy.engine import Connection
+
+from app import db
+from app.utils.tracing import info
+
+# Versions applied to the database, kept out of db.metadata so create_all() never touches it
+migrations_table = Table(
+    'schema_migrations', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String, nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+    Column('duration_ms', Float)
+)
+
+
+class Migration:
+    """
+    One versioned schema change (see app/models/migrations.py)
+
+    upgrade(connection) receives a SQLAlchemy connection. Transactional
+    migrations run in one transaction together with recording their version,
+    so they either apply completely or not at all. Non-transactional ones
+    (index builds, batched backfills) commit as they go so they never hold
+    the write lock for long; they must be safe to run again after an
+    interruption - the version is only recorded once they finish.
+    """
+
+    def __init__(self, version: int, name: str, upgrade: Callable[[Connection], None], transactional: bool = True):
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+        self.transactional = transactional
+
+    def __repr__(self):
+        return f"<Migration({self.version}, '{self.name}')>"
+
+
+def has_column(connection: Connection, table: str, column: str) -> bool:
+    return column in {existing['name'] for existing in inspect(connection).get_columns(table)}
+
+def add_column(connection: Connection, table: str, column: str, column_type: str):
+    """
+    Add a nullable column unless it already exists
+    """
+    if not has_column(connection, table, column):
+        connection.execute(text(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {column_type}'))
+
+def create_index(connection: Connection, name: str, table: str, columns: List[str], unique: bool = False,
+                 where: Optional[str] = None):
+    """
+    Create an index unless it already exists (a partial one with `where`)
+
+    Run it from a non-transactional migration: on SQLite the build then only
+    holds the write lock for its own duration, and in WAL mode readers are not
+    blocked at all, so it can run against a live database.
+    """
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    unique_sql = 'UNIQUE ' if unique else ''
+    where_sql = f' WHERE {where}' if where else ''
+    with connection.begin():
+        connection.execute(text(f'CREATE {unique_sql}INDEX IF NOT EXISTS "{name}" ON "{table}" ({column_list}){where_sql}'))
+
+def rebuild_table(connection: Connection, table: str, create_sql: str, columns: List[str], where: str = '1 = 1') -> int:
+    """
+    Recreate a table from a new CREATE TABLE statement and copy the distinct
+    rows matching `where` into it - SQLite cannot add keys or constraints to
+    an existing table
+    Returns the number of rows that were not copied
+    """
+    old_table = f"{table}_old"
+    column_list = ', '.join(f'"{column}"' for column in columns)
+
+    connection.execute(text(f'ALTER TABLE "{table}" RENAME TO "{old_table}"'))
+    connection.execute(text(create_sql))
+    connection.execute(text(
+        f'INSERT INTO "{table}" ({column_list}) SELECT DISTINCT {column_list} FROM "{old_table}" WHERE {where}'
+    ))
+    old_count = connection.execute(text(f'SELECT COUNT(*) FROM "{old_table}"')).scalar()
+    new_count = connection.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar()
+    connection.execute(text(f'DROP TABLE "{old_table}"'))
+    return old_count - new_count
+
+def backfill(connection: Connection, table: str, columns: List[str], compute: Callable[[Dict], Optional[Dict]],
+             where: str = '1 = 1', batch_size: int = 500) -> int:
+    """
+    Fill computed column values in batches, each batch in its own short transaction
+
+    Rows matching `where` are read by id in pages of batch_size, compute(row)
+    returns a dict of new values for a row (or None to leave it alone) and the
+    batch is written with one executemany. Use a `where` that stops matching
+    filled rows so a re-run skips work that was already committed.
+    Returns the number of updated rows
+    """
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    last_id = 0
+    updated = 0
+
+    while True:
+        rows = connection.execute(text(
+            f'SELECT id, {column_list} FROM "{table}" WHERE id > :last_id AND ({where}) ORDER BY id LIMIT :limit'
+        ), {'last_id': last_id, 'limit': batch_size}).mappings().all()
+        if not rows:
+            break
+
+        changes = []
+        for row in rows:
+            values = compute(row)
+            if values:
+                changes.append(dict(values, _id=row['id']))
+
+        if changes:
+            assignments = ', '.join(f'"{column}" = :{column}' for column in changes[0] if column != '_id')
+            with connection.begin():
+                connection.execute(text(f'UPDATE "{table}" SET {assignments} WHERE id = :_id'), changes)
+            updated += len(changes)
+
+        last_id = rows[-1]['id']
+
+    return updated
+
+def _begin_write(connection: Connection):
+    """
+    Take the SQLite write lock at the start of a migration transaction, so two
+    processes migrating at the same time run one after the other
+    """
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+def _applied_versions(connection: Connection) -> Dict[int, Dict]:
+    rows = connection.execute(migrations_table.select()).mappings().all()
+    return {row['version']: dict(row) for row in rows}
+
+def _record(connection: Connection, migration: Migration, started: float):
+    connection.execute(migrations_table.insert().values(
+        version=migration.version,
+        name=migration.name,
+        applied_at=datetime.utcnow(),
+        duration_ms=round((time.perf_counter() - started) * 1000, 1)
+    ))
+
+def load_migrations() -> List[Migration]:
+    from app.models.migrations import MIGRATIONS
+    return sorted(MIGRATIONS, key=lambda migration: migration.version)
+
+def migration_status(migrations: Optional[List[Migration]] = None) -> List[Dict]:
+    """
+    List all migrations with their applied_at time (None if pending)
+    """
+    migrations = migrations or load_migrations()
+    with db.engine.connect() as connection:
+        applied = _applied_versions(connection) if inspect(connection).has_table(migrations_table.name) else {}
+
+    return [{
+        'version': migration.version,
+        'name': migration.name,
+        'applied_at': applied.get(migration.version, {}).get('applied_at')
+    } for migration in migrations]
+
+def migrate(target: Optional[int] = None, migrations: Optional[List[Migration]] = None,
+            progress: Optional[Callable[[Migration], None]] = None) -> List[Migration]:
+    """
+    Apply pending migrations in version order, up to and including `target`
+
+    A new, empty database is created from the models and stamped with all
+    versions instead. Databases created before migrations existed are
+    upgraded from version 1 - the migrations skip changes that are already
+    there.
+    Returns the applied migrations
+    """
+    migrations = migrations or load_migrations()
+    applied = []
+
+    with db.engine.connect() as connection:
+        inspector = inspect(connection)
+        fresh = not any(inspector.has_table(table.name) for table in db.metadata.sorted_tables)
+        migrations_table.create(connection, checkfirst=True)
+
+        if fresh:
+            with connection.begin():
+                db.metadata.create_all(connection)
+                for migration in migrations:
+                    _record(connection, migration, time.perf_counter())
+            info("Created database schema at version %s", migrations[-1].version)
+            return applied
+
+        for migration in migrations:
+            if target is not None and migration.version > target:
+                break
+            if migration.version in _applied_versions(connection):
+                continue
+
+            if progress:
+                progress(migration)
+            started = time.perf_counter()
+
+            if migration.transactional:
+                with connection.begin():
+                    _begin_write(connection)
+                    # Another process may have applied it while we waited for the lock
+                    if migration.version in _applied_versions(connection):
+                        continue
+                    migration.upgrade(connection)
+                    _record(connection, migration, started)
+            else:
+                migration.upgrade(connection)
+                with connection.begin():
+                    _begin_write(connection)
+                    if migration.version in _applied_versions(connection):
+                        continue
+                    _record(connection, migration, started)
+
+            applied.append(migration)
+            info("Applied migration %s (%s) in %.2fs", migration.version, migration.name, time.perf_counter() - started)
+
+    return applied
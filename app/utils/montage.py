@@ -0,0 +1,185 @@
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from app.models.models import Clip
+from app.utils.audio import BLOCK_FRAMES, mono, open_audio, to_int16, wav_header
+from app.utils.clips import clip_audio_path
+
+# Crossfade between consecutive clips by default, and the longest one allowed (seconds)
+CROSSFADE_SECONDS = 0.05
+MAX_CROSSFADE_SECONDS = 5.0
+
+# Montages are rendered in stereo - mono clips are doubled, surround ones keep their front pair
+MONTAGE_CHANNELS = 2
+
+
+def _to_channels(block: np.ndarray, channels: int) -> np.ndarray:
+    if block.shape[1] == channels:
+        return block
+    if block.shape[1] == 1:
+        return np.repeat(block, channels, axis=1)
+    if channels == 1:
+        return mono(block)[:, None]
+    return block[:, :channels]
+
+def _interpolate(buffer: np.ndarray, offset: int, first: int, last: int, step: float) -> np.ndarray:
+    # Output frame k mixes input frames floor(k * step) and the one after it
+    positions = np.arange(first, last) * step - offset
+    index = positions.astype(np.int64)
+    fraction = (positions - index).astype(np.float32)[:, None]
+    return buffer[index] * (1 - fraction) + buffer[index + 1] * fraction
+
+def resample_blocks(blocks: Iterator[np.ndarray], in_rate: int, out_rate: int, frames: int,
+                    channels: int) -> Iterator[np.ndarray]:
+    """
+    Stream exactly `frames` frames at out_rate from blocks at in_rate (linear interpolation)
+    Only the current block and a frame of the previous one are held. Input
+    that runs out early (a clip reaching past the end of its file) is padded with silence.
+    """
+    produced = 0
+    if in_rate == out_rate:
+        for block in blocks:
+            block = block[:frames - produced]
+            if len(block):
+                yield block
+                produced += len(block)
+            if produced >= frames:
+                return
+    else:
+        step = in_rate / out_rate
+        buffer = np.zeros((0, channels), dtype=np.float32)
+        offset = 0  # Input frame number of buffer[0]
+        for block in blocks:
+            buffer = np.concatenate([buffer, block])
+            ready = min(frames, int(np.floor((offset + len(buffer) - 2) / step)) + 1)
+            if ready > produced:
+                yield _interpolate(buffer, offset, produced, ready, step)
+                produced = ready
+                drop = int(produced * step) - offset
+                buffer = buffer[drop:]
+                offset += drop
+            if produced >= frames:
+                return
+        if len(buffer):
+            # The file's last frame has nothing to mix with - hold it
+            buffer = np.concatenate([buffer, buffer[-1:]])
+            ready = min(frames, int(np.floor((offset + len(buffer) - 2) / step)) + 1)
+            if ready > produced:
+                yield _interpolate(buffer, offset, produced, ready, step)
+                produced = ready
+    if produced < frames:
+        yield np.zeros((frames - produced, channels), dtype=np.float32)
+
+def crossfade(tail: np.ndarray, head: np.ndarray) -> np.ndarray:
+    """
+    Equal-power crossfade of the end of one clip into the start of the next (same lengths)
+    """
+    angle = (np.arange(len(head), dtype=np.float32) + 0.5) / len(head) * (np.pi / 2)
+    return tail * np.cos(angle)[:, None] + head * np.sin(angle)[:, None]
+
+
+class MontageSegment:
+    """
+    One clip of a montage: its part of a local audio file, streamed at the montage's rate
+    """
+
+    def __init__(self, clip: Clip, sample_rate: Optional[int] = None):
+        path = clip_audio_path(clip)
+        if path is None:
+            raise ValueError(f"Clip {clip.id} has no local audio file")
+        self.clip = clip
+        self.audio = open_audio(path)
+        self.sample_rate = sample_rate or self.audio.sample_rate
+        self.start = clip.start_time
+        self.end = clip.end_time if self.audio.duration is None else min(clip.end_time, self.audio.duration)
+        self.frames = max(0, int(round((self.end - self.start) * self.sample_rate)))
+
+    def blocks(self, channels: int) -> Iterator[np.ndarray]:
+        rate = self.audio.sample_rate
+        # One frame past the end, so the last output frames can be interpolated
+        source = self.audio.blocks(BLOCK_FRAMES, int(round(self.start * rate)), int(round(self.end * rate)) + 1)
+        return resample_blocks((_to_channels(block, channels) for block in source), rate, self.sample_rate,
+                               self.frames, channels)
+
+
+class Montage:
+    """
+    Clips (of any songs) played one after another with short crossfades
+
+    Rendering streams every clip block by block from its file - WAV files
+    through memory-mapped reads, others through the decoder - and only the
+    crossfade regions are held back, so memory use doesn't depend on the
+    length of the songs or the montage. The output is 16-bit PCM WAV whose
+    length is known up front, so the header can be sent first.
+    """
+
+    def __init__(self, clips: Sequence[Clip], crossfade_seconds: float = CROSSFADE_SECONDS,
+                 sample_rate: Optional[int] = None, channels: int = MONTAGE_CHANNELS):
+        if not clips:
+            raise ValueError("A montage needs at least one clip")
+        if not 0 <= crossfade_seconds <= MAX_CROSSFADE_SECONDS:
+            raise ValueError(f"The crossfade must be between 0 and {MAX_CROSSFADE_SECONDS} seconds")
+        segments = []
+        for clip in clips:
+            segment = MontageSegment(clip, sample_rate or (segments[0].sample_rate if segments else None))
+            segments.append(segment)
+        self.segments: List[MontageSegment] = [segment for segment in segments if segment.frames]
+        self.sample_rate = segments[0].sample_rate
+        self.channels = channels
+
+        # A crossfade takes at most half of each clip it joins
+        fade = int(round(crossfade_seconds * self.sample_rate))
+        self.fades = [min(fade, before.frames // 2, after.frames // 2)
+                      for before, after in zip(self.segments, self.segments[1:])]
+        self.frames = sum(segment.frames for segment in self.segments) - sum(self.fades)
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    @property
+    def size(self) -> int:
+        return len(self.header()) + self.frames * self.channels * 2
+
+    def header(self) -> bytes:
+        return wav_header(self.frames, self.sample_rate, self.channels)
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        """
+        The montage as float32 blocks of (frames, channels)
+        """
+        tail = None
+        for number, segment in enumerate(self.segments):
+            fade_in = self.fades[number - 1] if number else 0
+            fade_out = self.fades[number] if number < len(self.fades) else 0
+            body_end = segment.frames - fade_out
+
+            head, tail_parts, position = [], [], 0
+            for block in segment.blocks(self.channels):
+                head_end, tail_start = np.clip([fade_in - position, body_end - position], 0, len(block))
+                position += len(block)
+                if head is not None:
+                    head.append(block[:head_end])
+                    if position >= fade_in:
+                        if fade_in:
+                            yield crossfade(tail, np.concatenate(head))
+                        head = None
+                if tail_start > head_end:
+                    yield block[head_end:tail_start]
+                if tail_start < len(block):
+                    tail_parts.append(block[tail_start:])
+            tail = np.concatenate(tail_parts) if tail_parts else None
+
+    def chunks(self) -> Iterator[bytes]:
+        """
+        The montage as WAV file bytes: the header, then the samples block by block
+        """
+        yield self.header()
+        for block in self.blocks():
+            yield to_int16(block)
+
+    def write(self, path: str):
+        with open(path, 'wb') as f:
+            for chunk in self.chunks():
+                f.write(chunk)
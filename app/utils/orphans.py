@@ -0,0 +1,154 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+
+from app import db
+from app.utils.tracing import info, warning
+
+# Rows that depend on a text and go with it (table, column referencing text_contents.id)
+TEXT_DEPENDENTS = [('word_timestamps', 'text_content_id'), ('packed_word_timestamps', 'text_content_id')]
+
+# Queries for a batch of orphaned ids, in the order they are collected - dangling
+# links go first, so the texts and audio sources they kept alive follow in the same run
+ORPHAN_QUERIES: List[Tuple[str, str]] = [
+    ('song_text_association',
+     'SELECT song_id, text_content_id FROM song_text_association a '
+     'WHERE NOT EXISTS (SELECT 1 FROM songs s WHERE s.id = a.song_id) '
+     'OR NOT EXISTS (SELECT 1 FROM text_contents t WHERE t.id = a.text_content_id) LIMIT :limit'),
+    ('song_audio_association',
+     'SELECT song_id, audio_source_id FROM song_audio_association a '
+     'WHERE NOT EXISTS (SELECT 1 FROM songs s WHERE s.id = a.song_id) '
+     'OR NOT EXISTS (SELECT 1 FROM audio_sources t WHERE t.id = a.audio_source_id) LIMIT :limit'),
+    ('text_contents',
+     'SELECT id FROM text_contents t '
+     'WHERE NOT EXISTS (SELECT 1 FROM song_text_association a WHERE a.text_content_id = t.id) LIMIT :limit'),
+    ('audio_sources',
+     'SELECT id FROM audio_sources t '
+     'WHERE NOT EXISTS (SELECT 1 FROM song_audio_association a WHERE a.audio_source_id = t.id) LIMIT :limit'),
+    ('word_timestamps',
+     'SELECT id FROM word_timestamps w '
+     'WHERE NOT EXISTS (SELECT 1 FROM text_contents t WHERE t.id = w.text_content_id) LIMIT :limit'),
+    ('packed_word_timestamps',
+     'SELECT text_content_id FROM packed_word_timestamps p '
+     'WHERE NOT EXISTS (SELECT 1 FROM text_contents t WHERE t.id = p.text_content_id) LIMIT :limit'),
+    ('audio_features',
+     'SELECT audio_source_id FROM audio_features f '
+     'WHERE NOT EXISTS (SELECT 1 FROM audio_sources a WHERE a.id = f.audio_source_id) LIMIT :limit'),
+    ('clips',
+     'SELECT id FROM clips c '
+     'WHERE NOT EXISTS (SELECT 1 FROM songs s WHERE s.id = c.song_id) LIMIT :limit'),
+    ('artists',
+     'SELECT id FROM artists r '
+     'WHERE NOT EXISTS (SELECT 1 FROM songs s WHERE s.artist_id = r.id) LIMIT :limit')
+]
+
+# Key column of each table, for the DELETE of a batch (association tables have two)
+KEY_COLUMNS = {
+    'song_text_association': ('song_id', 'text_content_id'),
+    'song_audio_association': ('song_id', 'audio_source_id'),
+    'packed_word_timestamps': ('text_content_id',),
+    'audio_features': ('audio_source_id',)
+}
+
+
+def _begin_write(connection: Connection):
+    # Take the write lock before looking for orphans, so nothing links to them before they are gone
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+def _delete_batch(connection: Connection, table: str, query: str, batch_size: int) -> int:
+    """
+    Delete one batch of orphans from a table in its own transaction
+    Returns the number of deleted rows
+    """
+    with connection.begin():
+        _begin_write(connection)
+        keys = connection.execute(text(query), {'limit': batch_size}).all()
+        if not keys:
+            return 0
+
+        columns = KEY_COLUMNS.get(table, ('id',))
+        if len(columns) > 1:
+            conditions = ' AND '.join(f'"{column}" = :{column}' for column in columns)
+            connection.execute(text(f'DELETE FROM "{table}" WHERE {conditions}'),
+                               [dict(zip(columns, key)) for key in keys])
+            return len(keys)
+
+        ids = [key[0] for key in keys]
+        if table == 'text_contents':
+            for dependent, column in TEXT_DEPENDENTS:
+                connection.execute(text(f'DELETE FROM "{dependent}" WHERE "{column}" IN :ids')
+                                   .bindparams(bindparam('ids', expanding=True)), {'ids': ids})
+        connection.execute(text(f'DELETE FROM "{table}" WHERE "{columns[0]}" IN :ids')
+                           .bindparams(bindparam('ids', expanding=True)), {'ids': ids})
+        return len(ids)
+
+def delete_orphans(batch_size: int = 500, progress: Optional[Callable[[str, int], None]] = None) -> Dict[str, int]:
+    """
+    Delete rows nothing refers to any more: links to missing songs, texts and
+    audio sources no song uses (with their word timestamps), timestamps of
+    missing texts, features of missing audio sources, clips of missing songs
+    and artists without songs
+
+    Each batch is a short transaction of its own, so the job can run next to
+    the app. Song deletions clean up after themselves (see
+    delete_exclusive_children), this catches what bulk deletes and older
+    versions left behind.
+    Returns the number of deleted rows per table
+    """
+    counts = {table: 0 for table, _ in ORPHAN_QUERIES}
+    with db.engine.connect() as connection:
+        for table, query in ORPHAN_QUERIES:
+            while True:
+                deleted = _delete_batch(connection, table, query, batch_size)
+                counts[table] += deleted
+                if deleted and progress:
+                    progress(table, counts[table])
+                if deleted < batch_size:
+                    break
+    return counts
+
+def incremental_vacuum(max_pages: Optional[int] = None) -> int:
+    """
+    Return free pages at the end of the database file to the file system,
+    at most max_pages of them (all when None)
+
+    Needs auto_vacuum = INCREMENTAL (see migration 14) - without it SQLite only
+    reuses free pages and the file never shrinks.
+    Returns the number of bytes the file shrank by
+    """
+    with db.engine.connect() as connection:
+        if connection.dialect.name != 'sqlite':
+            return 0
+        if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() != 2:
+            warning("auto_vacuum is not INCREMENTAL, run 'flask db upgrade' - skipping incremental vacuum")
+            return 0
+
+        page_size = connection.exec_driver_sql('PRAGMA page_size').scalar()
+        before = connection.exec_driver_sql('PRAGMA page_count').scalar()
+        pages = connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+        if max_pages is not None:
+            pages = min(pages, max_pages)
+        # sqlite3 only steps the statement once and every step frees one page,
+        # so it runs once per page - in one transaction, that's a few µs each
+        with connection.begin():
+            _begin_write(connection)
+            for _ in range(pages):
+                connection.exec_driver_sql('PRAGMA incremental_vacuum(1)')
+        after = connection.exec_driver_sql('PRAGMA page_count').scalar()
+    return (before - after) * page_size
+
+def collect_garbage(batch_size: int = 500, vacuum_pages: Optional[int] = None, vacuum: bool = True,
+                    progress: Optional[Callable[[str, int], None]] = None) -> Dict[str, int]:
+    """
+    Delete orphaned rows, then give the freed space back with an incremental vacuum
+    Returns the deleted rows per table and the reclaimed bytes ("reclaimed_bytes")
+    """
+    counts = delete_orphans(batch_size, progress)
+    per_table = ', '.join(f"{table} {count}" for table, count in counts.items() if count)
+    info("Deleted %s orphaned rows%s", sum(counts.values()), f": {per_table}" if per_table else '')
+    counts['reclaimed_bytes'] = incremental_vacuum(vacuum_pages) if vacuum else 0
+    if vacuum:
+        info("Incremental vacuum reclaimed %.1f KB", counts['reclaimed_bytes'] / 1024)
+    return counts
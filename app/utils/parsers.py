@@ -0,0 +1,221 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from app.utils.tracing import stage
+
+# lxml is an optional, much faster parser backend - fall back to the built-in one
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Suffixes tekstowo.pl appends to page titles
+TEKSTOWO_TITLE_SUFFIXES = [' - tekst i tłumaczenie piosenki na Tekstowo.pl', ' - tekst piosenki na Tekstowo.pl']
+
+def parse_html(markup: str, parse_only: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    """
+    Parse an HTML page, timed as the "parse" stage of the current trace
+    With parse_only only the matching top-level subtrees are built
+    """
+    with stage('parse'):
+        return BeautifulSoup(markup, HTML_PARSER, parse_only=parse_only)
+
+def _classes(attrs: Dict) -> List[str]:
+    """Return the class list of a tag's raw attributes (string or list depending on the parser)"""
+    value = attrs.get('class') or ''
+    return value.split() if isinstance(value, str) else list(value)
+
+def _strainer(match: Callable[[str, Dict], bool]) -> SoupStrainer:
+    """
+    Build a SoupStrainer from a function of (tag name, attributes)
+    A matching tag is kept together with everything inside it
+    """
+    return SoupStrainer(lambda name, attrs: bool(name) and match(name, attrs or {}))
+
+# Tags used by the parsers below - everything else (navigation, scripts,
+# comments, footers) is skipped while parsing and never becomes a Tag object
+LINKS_STRAINER = SoupStrainer('a')
+
+TEKSTOWO_PAGE_STRAINER = _strainer(lambda name, attrs: (
+    name in ('title', 'h1')
+    or (name == 'div' and (attrs.get('id') == 'song-info' or 'inner-text' in _classes(attrs)))
+))
+
+TEKSTOWO_SEARCH_STRAINER = _strainer(lambda name, attrs: name == 'div' and 'content' in _classes(attrs))
+
+GENIUS_LYRICS_CLASSES = {'Lyrics__Container', 'lyrics', 'song_body-lyrics', 'song-lyrics'}
+
+GENIUS_PAGE_STRAINER = _strainer(lambda name, attrs: (
+    name == 'h1'
+    or (name == 'a' and '/artists/' in (attrs.get('href') or ''))
+    or attrs.get('data-lyrics-container') == 'true'
+    or bool(GENIUS_LYRICS_CLASSES.intersection(_classes(attrs)))
+))
+
+MUSIXMATCH_PAGE_STRAINER = _strainer(lambda name, attrs: bool(
+    {'mxm-track-title', 'mxm-lyrics__content', 'lyrics__content__ok'}.intersection(_classes(attrs))
+))
+
+def find_links(markup: str, match: Callable[[str], bool]) -> List[str]:
+    """
+    Return hrefs of all links in a page accepted by match(href), in page order
+    Used for Google result pages
+    """
+    soup = parse_html(markup, LINKS_STRAINER)
+    return [link['href'] for link in soup.find_all('a', href=True) if match(link['href'])]
+
+def parse_tekstowo_page(markup: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Extract lyrics, artist and title from a tekstowo.pl song page
+    Returns (lyrics, artist, title); lyrics is None if the page has no lyrics
+    """
+    soup = parse_html(markup, TEKSTOWO_PAGE_STRAINER)
+
+    lyrics_div = soup.find('div', {'class': 'inner-text'})
+    if not lyrics_div:
+        return None, None, None
+    lyrics = lyrics_div.get_text(strip=True)
+
+    # The structure of the site has changed, so we need to try multiple methods
+    actual_artist = None
+    actual_title = None
+
+    # First method: Try the traditional song-info structure
+    song_info_div = soup.find('div', {'id': 'song-info'})
+    if song_info_div:
+        artist_elem = song_info_div.find('a', {'class': 'artist'})
+        if artist_elem:
+            actual_artist = artist_elem.text.strip()
+
+        title_elem = song_info_div.find('h1')
+        if title_elem:
+            actual_title = title_elem.text.strip()
+
+    # Alternative method: Extract from the page title
+    if not actual_artist or not actual_title:
+        page_title = soup.find('title')
+        if page_title:
+            title_text = page_title.text.strip()
+            for suffix in TEKSTOWO_TITLE_SUFFIXES:
+                if suffix in title_text:
+                    title_text = title_text.replace(suffix, '')
+
+            if ' - ' in title_text:
+                parts = title_text.split(' - ', 1)
+                actual_artist = parts[0].strip()
+                actual_title = parts[1].strip()
+
+    # Third method: Try to extract from H1
+    if not actual_artist or not actual_title:
+        h1_elem = soup.find('h1')
+        if h1_elem and ' - ' in h1_elem.text:
+            parts = h1_elem.text.strip().split(' - ', 1)
+            actual_artist = parts[0].strip()
+            actual_title = parts[1].strip()
+
+    return lyrics, actual_artist, actual_title
+
+def parse_tekstowo_search(markup: str) -> List[Dict[str, Optional[str]]]:
+    """
+    Extract results from a tekstowo.pl search page
+    Returns a list of {"title", "href", "artist"} dicts in page order
+    """
+    soup = parse_html(markup, TEKSTOWO_SEARCH_STRAINER)
+
+    results = []
+    for link in soup.select('.content a.title'):
+        result_artist = None
+        parent_box = link.find_parent('div', class_='box-przeboje')
+        if parent_box:
+            artist_link = parent_box.select_one('a.artyst')
+            if artist_link:
+                result_artist = artist_link.text.strip()
+        results.append({
+            'title': link.text.strip(),
+            'href': link.get('href'),
+            'artist': result_artist
+        })
+    return results
+
+def parse_genius_page(markup: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Extract lyrics, artist and title from a Genius song page
+    Returns (lyrics, artist, title); any of them may be None
+    """
+    soup = parse_html(markup, GENIUS_PAGE_STRAINER)
+
+    title_element = soup.find('h1')
+    song_title = title_element.text.strip() if title_element else None
+
+    artist_element = soup.select_one('a[href*="/artists/"]')
+    artist_name = artist_element.text.strip() if artist_element else None
+
+    # Genius stores lyrics in multiple divs with class 'Lyrics__Container'
+    lyrics_divs = soup.find_all('div', {'class': 'Lyrics__Container'})
+    if lyrics_divs:
+        return ''.join(div.get_text() + '\n' for div in lyrics_divs), artist_name, song_title
+
+    lyrics_div = soup.select_one('[data-lyrics-container="true"]')
+    if lyrics_div:
+        return lyrics_div.get_text(), artist_name, song_title
+
+    # More generic selectors used by older page layouts
+    for selector in ('.lyrics', '.song_body-lyrics', '.song-lyrics'):
+        containers = soup.select(selector)
+        if containers:
+            return ''.join(container.get_text() + '\n' for container in containers), artist_name, song_title
+
+    return None, artist_name, song_title
+
+def parse_musixmatch_search(markup: str) -> Optional[str]:
+    """
+    Return the href of the first result on a Musixmatch search page
+    """
+    soup = parse_html(markup, LINKS_STRAINER)
+    for result in soup.select('.title'):
+        parent = result.parent
+        if parent and parent.name == 'a' and 'href' in parent.attrs:
+            return parent['href']
+    return None
+
+def parse_musixmatch_page(markup: str, generic_fallback: bool = True) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Extract lyrics, artist and title from a Musixmatch song page
+    Returns (lyrics, artist, title); any of them may be None
+    """
+    soup = parse_html(markup, MUSIXMATCH_PAGE_STRAINER)
+
+    song_header = soup.select_one('.mxm-track-title h1')
+    song_title = song_header.text.strip() if song_header else None
+
+    artist_header = soup.select_one('.mxm-track-title h2 a')
+    artist_name = artist_header.text.strip() if artist_header else None
+
+    lyrics_spans = soup.find_all('span', {'class': 'lyrics__content__ok'})
+    if lyrics_spans:
+        return ''.join(span.get_text() + '\n' for span in lyrics_spans), artist_name, song_title
+
+    lyrics_spans = soup.select('.mxm-lyrics__content span')
+    if lyrics_spans:
+        return ''.join(span.get_text() + '\n' for span in lyrics_spans), artist_name, song_title
+
+    if generic_fallback:
+        lyrics_content = soup.select_one('.mxm-lyrics__content')
+        if lyrics_content:
+            return lyrics_content.get_text(), artist_name, song_title
+
+    return None, artist_name, song_title
+
+def parse_lyrics_page(url: str, markup: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Extract (lyrics, artist, title) from a song page of any supported site, chosen by URL
+    """
+    if 'tekstowo.pl' in url:
+        return parse_tekstowo_page(markup)
+    if 'genius.com' in url:
+        return parse_genius_page(markup)
+    if 'musixmatch.com' in url:
+        return parse_musixmatch_page(markup)
+    return None, None, None
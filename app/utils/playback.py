@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.models.models import TextContent
+from app.utils.timestamps import WordTimeIndex
+
+# How many texts' time indexes are kept in memory and for how long
+# (other worker processes can change timestamps, so entries expire)
+INDEX_CACHE_SIZE = 64
+INDEX_CACHE_SECONDS = 300
+
+
+class WordIndexCache:
+    """
+    Least recently used cache of WordTimeIndex per text id
+    Playback asks for the current word many times per second - only the
+    first request for a text reads and decodes its timestamps
+    """
+
+    def __init__(self, size: int = INDEX_CACHE_SIZE, max_age: float = INDEX_CACHE_SECONDS):
+        self.size = size
+        self.max_age = max_age
+        self._entries = OrderedDict()  # text id -> (loaded at, index)
+        self._lock = threading.Lock()
+
+    def get(self, text_id: int) -> Optional[WordTimeIndex]:
+        """
+        Return the index for a text, loading it on a miss
+        Returns None if the text doesn't exist
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(text_id)
+            if entry and now - entry[0] < self.max_age:
+                self._entries.move_to_end(text_id)
+                return entry[1]
+
+        text = TextContent.query.get(text_id)
+        if text is None:
+            return None
+        index = WordTimeIndex(text.get_word_timings())
+
+        with self._lock:
+            self._entries[text_id] = (now, index)
+            self._entries.move_to_end(text_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return index
+
+    def invalidate(self, text_id: int):
+        with self._lock:
+            self._entries.pop(text_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+word_indexes = WordIndexCache()
+
+def words_at(text_id: int, at: float, count: int = 5, window: Optional[float] = None) -> Optional[Dict]:
+    """
+    Words of a text sung at time `at` plus the next `count` words (starting within `window` seconds)
+    "active" is the most recently started of the active words, or None between words
+    Returns None if the text doesn't exist
+    """
+    index = word_indexes.get(text_id)
+    if index is None:
+        return None
+
+    active = index.active(at)
+    return {
+        'text_content_id': text_id,
+        'time': at,
+        'active': index.timings[active[-1]].to_dict() if active else None,
+        'active_words': index.timings.to_dicts(active),
+        'next': index.timings.to_dicts(index.upcoming(at, count, window))
+    }
+
+def packed_timings(text_id: int) -> Optional[bytes]:
+    """
+    All word timings of a text in the packed binary layout (see app/utils/timestamps.py)
+    Returns None if the text doesn't exist
+    """
+    index = word_indexes.get(text_id)
+    return index.timings.pack() if index is not None else None
+
+def delta_timings(text_id: int, start: Optional[float] = None, end: Optional[float] = None) -> Optional[Dict]:
+    """
+    Delta-encoded word timings of a text (see WordTimings.to_deltas), all of
+    them or only the words overlapping [start, end) seconds
+    Returns None if the text doesn't exist
+    """
+    index = word_indexes.get(text_id)
+    if index is None:
+        return None
+
+    first, last = 0, len(index.timings)
+    if start is not None or end is not None:
+        first, last = index.window(start if start is not None else 0.0, end if end is not None else float('inf'))
+    result = index.timings.to_deltas(first, last)
+    result.update(text_content_id=text_id, total_count=len(index.timings))
+    return result
@@ -0,0 +1,177 @@
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Polish-specific letters - enough to tell Polish titles apart from English ones
+POLISH_CHARS = set("ąćęłńóśźżĄĆĘŁŃÓŚŹŻ")
+
+# Common Polish words that show up in titles written without diacritics
+# (none that are also English words, like "ten" or "ta")
+POLISH_WORDS = {"nie", "jest", "sie", "się", "dla", "jak", "moja", "moj", "twoj", "czy", "bez", "tylko", "kiedy"}
+
+# Pseudo-counts used to smooth the hit rate of providers we know little about.
+# A fresh provider starts at PRIOR_HITS / PRIOR_ATTEMPTS, so a couple of early
+# misses or hits don't flip the order straight away.
+PRIOR_HITS = 1.0
+PRIOR_ATTEMPTS = 2.0
+
+# Weight of the newest sample in the latency moving average
+LATENCY_ALPHA = 0.2
+
+# Assumed latency (seconds) for providers that were never called
+DEFAULT_LATENCY = 2.0
+
+def detect_language(text: str) -> str:
+    """
+    Very rough language guess for an artist/title pair
+    Returns "pl", "en" or "other"
+    """
+    if not text:
+        return "other"
+
+    if any(ch in POLISH_CHARS for ch in text):
+        return "pl"
+
+    words = set(re.findall(r"[a-ząćęłńóśźż]+", text.lower()))
+    if words & POLISH_WORDS:
+        return "pl"
+
+    if all(ord(ch) < 128 for ch in text):
+        return "en"
+
+    return "other"
+
+
+class ProviderStats:
+    """
+    Running success and latency statistics for one provider (and language bucket)
+    """
+
+    def __init__(self):
+        self.attempts = 0
+        self.hits = 0
+        self.avg_latency = None
+
+    def record(self, found: bool, elapsed: float):
+        self.attempts += 1
+        if found:
+            self.hits += 1
+        if self.avg_latency is None:
+            self.avg_latency = elapsed
+        else:
+            self.avg_latency = (1 - LATENCY_ALPHA) * self.avg_latency + LATENCY_ALPHA * elapsed
+
+    def hit_rate(self) -> float:
+        return (self.hits + PRIOR_HITS) / (self.attempts + PRIOR_ATTEMPTS)
+
+    def latency(self) -> float:
+        return self.avg_latency if self.avg_latency is not None else DEFAULT_LATENCY
+
+    def to_dict(self) -> Dict:
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "hit_rate": round(self.hit_rate(), 3),
+            "avg_latency": round(self.latency(), 3)
+        }
+
+
+class ProviderRegistry:
+    """
+    Registry of lyrics providers ordered by their observed usefulness
+
+    Providers are tried one after another until one returns lyrics, so the
+    expected cost of a lookup is lowest when providers are sorted by
+    hit_rate / latency (highest first). Statistics are kept both globally and
+    per detected language, and the language bucket is used once it has
+    enough samples.
+    """
+
+    def __init__(self, min_samples: int = 5):
+        self.min_samples = min_samples
+        self._providers = {}  # name -> (label, search function, static priority, per-language priority)
+        self._stats = {}  # (name, language or None) -> ProviderStats
+        self._lock = threading.Lock()
+
+    def register(self, name: str, label: str, search: Callable[[str, str], Optional[Dict]], priority: int = 100,
+                 language_priority: Optional[Dict[str, int]] = None):
+        """
+        Register a provider. `search(artist, title)` returns a lyrics result
+        dict or None. Lower priority values are tried first while
+        there are no statistics to go by; language_priority overrides the
+        priority for titles detected as a given language.
+        """
+        with self._lock:
+            self._providers[name] = (label, search, priority, language_priority or {})
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._providers.pop(name, None)
+
+    def _get_stats(self, name: str, language: Optional[str]) -> ProviderStats:
+        key = (name, language)
+        if key not in self._stats:
+            self._stats[key] = ProviderStats()
+        return self._stats[key]
+
+    def score(self, name: str, language: Optional[str] = None) -> float:
+        """
+        Expected hits per second of the provider - higher is better
+        """
+        with self._lock:
+            stats = self._get_stats(name, None)
+            if language:
+                lang_stats = self._get_stats(name, language)
+                if lang_stats.attempts >= self.min_samples:
+                    stats = lang_stats
+            return stats.hit_rate() / max(stats.latency(), 0.001)
+
+    def ordered(self, language: Optional[str] = None) -> List[Tuple[str, str, Callable[[str, str], Optional[Dict]]]]:
+        """
+        Return providers as (name, label, search) tuples in the order they should be tried
+        """
+        with self._lock:
+            providers = list(self._providers.items())
+
+        def sort_key(item):
+            name, (_, _, priority, language_priority) = item
+            return (-self.score(name, language), language_priority.get(language, priority))
+
+        ranked = sorted(providers, key=sort_key)
+        return [(name, label, search) for name, (label, search, _, _) in ranked]
+
+    def record(self, name: str, found: bool, elapsed: float, language: Optional[str] = None):
+        """
+        Record the outcome of a single provider call
+        """
+        with self._lock:
+            self._get_stats(name, None).record(found, elapsed)
+            if language:
+                self._get_stats(name, language).record(found, elapsed)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self) -> Dict:
+        """
+        Return statistics of all providers as a JSON-serializable dict
+        """
+        with self._lock:
+            result = {}
+            for name, (label, _, priority, _) in self._providers.items():
+                languages = {}
+                for (stats_name, language), stats in self._stats.items():
+                    if stats_name == name and language:
+                        languages[language] = stats.to_dict()
+                result[name] = {
+                    "label": label,
+                    "priority": priority,
+                    "overall": self._get_stats(name, None).to_dict(),
+                    "languages": languages
+                }
+            return result
+
+
+# Shared registry used by search_for_lyrics()
+lyrics_providers = ProviderRegistry()
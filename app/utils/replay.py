@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import threading
+import urllib.parse
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from app.utils.http import http_session
+
+# Name of the manifest file mapping URLs to saved responses
+MANIFEST_NAME = 'index.json'
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL so that percent-encoded and raw forms map to the same fixture
+    """
+    return urllib.parse.unquote(url)
+
+def load_manifest(directory: str) -> Dict[str, Dict]:
+    """
+    Load the fixture manifest of a directory
+    Returns dict of normalized URL -> {"file", "status", "headers"}
+    """
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    return {normalize_url(url): entry for url, entry in manifest.items()}
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter answering requests from saved fixture files
+
+    URLs missing from the manifest get an empty 404 (or raise in strict mode)
+    and are collected in `misses`, so a replay never touches the network.
+    """
+
+    def __init__(self, directory: str, strict: bool = False):
+        super().__init__()
+        self.directory = directory
+        self.strict = strict
+        self.manifest = load_manifest(directory)
+        self.misses = []
+        self._bodies = {}
+
+    def _read_body(self, filename: str) -> bytes:
+        # Cache file contents so benchmarks measure parsing, not disk reads
+        if filename not in self._bodies:
+            with open(os.path.join(self.directory, filename), 'rb') as f:
+                self._bodies[filename] = f.read()
+        return self._bodies[filename]
+
+    def send(self, request, **kwargs):
+        entry = self.manifest.get(normalize_url(request.url))
+
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+
+        if entry is None:
+            self.misses.append(request.url)
+            if self.strict:
+                raise requests.ConnectionError(f"No fixture recorded for {request.url}")
+            response.status_code = 404
+            response._content = b''
+            response.headers = CaseInsensitiveDict()
+            return response
+
+        response.status_code = entry.get('status', 200)
+        response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        response._content = self._read_body(entry['file'])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers) or 'utf-8'
+        return response
+
+    def close(self):
+        self._bodies.clear()
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    Transport adapter that performs real requests and saves every response as a fixture
+    """
+
+    def __init__(self, directory: str, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        content = response.content
+
+        parsed = urllib.parse.urlparse(request.url)
+        content_type = response.headers.get('Content-Type', '')
+        extension = '.json' if 'json' in content_type else '.html'
+        filename = f"{parsed.hostname}_{hashlib.sha1(request.url.encode('utf-8')).hexdigest()[:12]}{extension}"
+
+        with self._lock:
+            with open(os.path.join(self.directory, filename), 'wb') as f:
+                f.write(content)
+
+            manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+            manifest = {}
+            if os.path.exists(manifest_path):
+                with open(manifest_path, encoding='utf-8') as f:
+                    manifest = json.load(f)
+            manifest[normalize_url(request.url)] = {
+                'file': filename,
+                'status': response.status_code,
+                'headers': {'Content-Type': content_type} if content_type else {}
+            }
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False, sort_keys=True)
+
+        return response
+
+
+@contextmanager
+def _mounted(adapter: BaseAdapter, session: requests.Session):
+    previous = session.adapters.copy()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    try:
+        yield adapter
+    finally:
+        session.adapters = previous
+
+@contextmanager
+def replay_fixtures(directory: str, strict: bool = False, session: Optional[requests.Session] = None):
+    """
+    Serve all requests of the scraper session from fixtures in `directory`
+
+        with replay_fixtures('benchmarks/fixtures') as adapter:
+            search_tekstowo('Perfect', 'Autobiografia')
+    """
+    with _mounted(ReplayAdapter(directory, strict=strict), session or http_session) as adapter:
+        yield adapter
+
+@contextmanager
+def record_fixtures(directory: str, session: Optional[requests.Session] = None):
+    """
+    Perform real requests and save the responses as fixtures in `directory`
+    """
+    with _mounted(RecordingAdapter(directory), session or http_session) as adapter:
+        yield adapter
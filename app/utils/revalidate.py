@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import or_
+
+from app import db
+from app.models.models import TextContent
+from app.utils.http import http_get
+from app.utils.parsers import parse_lyrics_page
+from app.utils.playback import word_indexes
+from app.utils.tracing import debug, warning
+
+# Headers sent with revalidation requests
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+def record_lyrics_source(text: TextContent, result: Dict[str, Optional[str]]):
+    """
+    Store where fetched lyrics came from (see find_lyrics) on a TextContent
+    """
+    text.source_url = result.get('source_url')
+    text.etag = result.get('etag')
+    text.last_modified = result.get('last_modified')
+    text.fetched_at = datetime.utcnow()
+    text.checked_at = text.fetched_at
+
+def check_source(url: str, etag: Optional[str], last_modified: Optional[str]) -> Dict:
+    """
+    Issue a conditional GET for a lyrics page
+    Only pages that changed are parsed
+    Returns dict with "status" ("not_modified", "changed", "failed"), the new
+    validators and, for changed pages, the parsed lyrics
+    """
+    headers = dict(HEADERS)
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    try:
+        response = http_get(url, headers=headers)
+    except Exception as e:
+        warning("Revalidation request failed for %s: %s", url, e)
+        return {'status': 'failed'}
+
+    if response.status_code == 304:
+        debug("Not modified: %s", url)
+        return {'status': 'not_modified'}
+
+    if response.status_code != 200:
+        debug("Revalidation of %s returned %s", url, response.status_code)
+        return {'status': 'failed'}
+
+    new_etag = response.headers.get('ETag')
+    new_last_modified = response.headers.get('Last-Modified')
+
+    # Some servers ignore conditional headers but still send the same validators
+    if (etag and new_etag == etag) or (not etag and last_modified and new_last_modified == last_modified):
+        return {'status': 'not_modified'}
+
+    lyrics, _, _ = parse_lyrics_page(url, response.text)
+    return {
+        'status': 'changed' if lyrics else 'failed',
+        'lyrics': lyrics,
+        'etag': new_etag,
+        'last_modified': new_last_modified
+    }
+
+def texts_due_for_revalidation(older_than: timedelta, after_id: int, limit: int) -> List[TextContent]:
+    """
+    Get the next page of fetched texts not checked within `older_than`, ordered by id
+    """
+    cutoff = datetime.utcnow() - older_than
+    return TextContent.query.filter(
+        TextContent.id > after_id,
+        TextContent.source_url.isnot(None),
+        or_(TextContent.checked_at.is_(None), TextContent.checked_at < cutoff)
+    ).order_by(TextContent.id).limit(limit).all()
+
+def revalidate_lyrics(older_than: timedelta = timedelta(days=7), workers: int = 4, batch_size: int = 50,
+                      limit: Optional[int] = None, check: Callable[[str, Optional[str], Optional[str]], Dict] = check_source,
+                      progress: Optional[Callable[[Dict], None]] = None) -> Dict[str, int]:
+    """
+    Revalidate stored lyrics against their source pages
+
+    Requests run in a thread pool, results are written from the calling thread
+    with one commit per batch. Lyrics are only replaced when the page changed
+    and still contains lyrics.
+    Returns counters per outcome ("not_modified", "updated", "unchanged", "failed")
+    """
+    counts = {'checked': 0, 'not_modified': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+    last_id = 0
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='revalidate') as executor:
+        while limit is None or counts['checked'] < limit:
+            page_size = batch_size if limit is None else min(batch_size, limit - counts['checked'])
+            texts = texts_due_for_revalidation(older_than, last_id, page_size)
+            if not texts:
+                break
+
+            sources = [(text.source_url, text.etag, text.last_modified) for text in texts]
+            results = list(executor.map(lambda source: check(*source), sources))
+
+            now = datetime.utcnow()
+            changed = []
+            for text, result in zip(texts, results):
+                text.checked_at = now
+                status = result['status']
+                if status == 'changed':
+                    text.etag = result.get('etag')
+                    text.last_modified = result.get('last_modified')
+                    if result['lyrics'] != text.content:
+                        # Texts are unique - if the new lyrics are already stored, link the songs to that row
+                        existing = TextContent.find_by_content(result['lyrics'], text.content_type)
+                        if existing is not None:
+                            text.replace_with(existing)
+                        else:
+                            # The timings were for the old words
+                            text.content = result['lyrics']
+                            text.fetched_at = now
+                            text.clear_word_timings()
+                            changed.append(text.id)
+                        status = 'updated'
+                    else:
+                        status = 'unchanged'
+                counts[status] += 1
+            db.session.commit()
+            for text_id in changed:
+                word_indexes.invalidate(text_id)
+
+            counts['checked'] += len(texts)
+            last_id = texts[-1].id
+            if progress:
+                progress(counts)
+
+    return counts
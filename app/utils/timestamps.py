@@ -0,0 +1,200 @@
+import struct
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Packed layout: header, float32 starts[n], float32 ends[n], uint32 word offsets[n + 1], UTF-8 words
+# All numbers little-endian, so blobs are portable between machines
+PACKED_MAGIC = b'LCWT'
+PACKED_VERSION = 1
+PACKED_HEADER = struct.Struct('<4sHI')  # magic, version, word count
+
+# Delta-encoded timings count time in milliseconds
+DELTA_UNIT = 0.001
+
+
+def _seconds(value: np.float32) -> float:
+    """Convert a stored float32 to the shortest float that round-trips (0.3, not 0.30000001192092896)"""
+    return float(str(value))
+
+
+class TimedWord:
+    """
+    One word of a WordTimings - has the same attributes as a WordTimestamp row
+    """
+    __slots__ = ('word', 'start_time', 'end_time', 'text_content_id', 'index')
+
+    def __init__(self, word: str, start_time: float, end_time: float, text_content_id: Optional[int] = None, index: int = 0):
+        self.word = word
+        self.start_time = start_time
+        self.end_time = end_time
+        self.text_content_id = text_content_id
+        self.index = index
+
+    def to_dict(self):
+        return {'index': self.index, 'word': self.word, 'start_time': self.start_time, 'end_time': self.end_time}
+
+    def __repr__(self):
+        return f"<WordTimestamp(word='{self.word}', start_time={self.start_time}, end_time={self.end_time})>"
+
+
+class WordTimings:
+    """
+    Word timestamps of one text as columns: float32 start/end arrays and the
+    words as one UTF-8 buffer with an offset array
+
+    Decoding a packed blob only wraps the bytes in NumPy views - no object is
+    created per word until a word is accessed. Iterating or indexing yields
+    TimedWord objects, so code written for WordTimestamp rows keeps working.
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, offsets: np.ndarray, words: bytes,
+                 text_content_id: Optional[int] = None):
+        self.starts = starts
+        self.ends = ends
+        self.offsets = offsets
+        self.words = words
+        self.text_content_id = text_content_id
+
+    @classmethod
+    def from_words(cls, words: Iterable[Tuple[str, float, float]], text_content_id: Optional[int] = None) -> 'WordTimings':
+        """
+        Build from (word, start_time, end_time) tuples
+        """
+        words = list(words)
+        encoded = [word.encode('utf-8') for word, _, _ in words]
+        offsets = np.zeros(len(words) + 1, dtype='<u4')
+        np.cumsum([len(word) for word in encoded], out=offsets[1:])
+        return cls(
+            np.array([start for _, start, _ in words], dtype='<f4'),
+            np.array([end for _, _, end in words], dtype='<f4'),
+            offsets,
+            b''.join(encoded),
+            text_content_id
+        )
+
+    @classmethod
+    def from_rows(cls, rows: Iterable, text_content_id: Optional[int] = None) -> 'WordTimings':
+        """
+        Build from WordTimestamp-like objects (anything with word, start_time and end_time)
+        """
+        return cls.from_words(((row.word, row.start_time, row.end_time) for row in rows), text_content_id)
+
+    @classmethod
+    def unpack(cls, data: bytes, text_content_id: Optional[int] = None) -> 'WordTimings':
+        """
+        Decode a blob written by pack() without copying the arrays
+        """
+        magic, version, count = PACKED_HEADER.unpack_from(data)
+        if magic != PACKED_MAGIC or version != PACKED_VERSION:
+            raise ValueError(f"Not a packed word timestamps blob (magic {magic!r}, version {version})")
+
+        position = PACKED_HEADER.size
+        starts = np.frombuffer(data, dtype='<f4', count=count, offset=position)
+        position += starts.nbytes
+        ends = np.frombuffer(data, dtype='<f4', count=count, offset=position)
+        position += ends.nbytes
+        offsets = np.frombuffer(data, dtype='<u4', count=count + 1, offset=position)
+        position += offsets.nbytes
+        return cls(starts, ends, offsets, bytes(data[position:]), text_content_id)
+
+    def pack(self) -> bytes:
+        return b''.join([
+            PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, len(self)),
+            self.starts.astype('<f4', copy=False).tobytes(),
+            self.ends.astype('<f4', copy=False).tobytes(),
+            self.offsets.astype('<u4', copy=False).tobytes(),
+            self.words
+        ])
+
+    def word(self, index: int) -> str:
+        return self.words[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+
+    def word_list(self) -> List[str]:
+        return [self.word(index) for index in range(len(self))]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[TimedWord, List[TimedWord]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return TimedWord(self.word(index), _seconds(self.starts[index]), _seconds(self.ends[index]), self.text_content_id, index)
+
+    def __iter__(self) -> Iterator[TimedWord]:
+        return (self[index] for index in range(len(self)))
+
+    def to_deltas(self, first: int = 0, last: Optional[int] = None) -> dict:
+        """
+        Words [first, last) in a compact form: each start as whole DELTA_UNITs
+        after the previous start (the first one after 0) and each duration in DELTA_UNITs
+        """
+        last = len(self) if last is None else min(last, len(self))
+        first = max(0, min(first, last))
+        starts = np.rint(self.starts[first:last].astype(np.float64) / DELTA_UNIT).astype(np.int64)
+        ends = np.rint(self.ends[first:last].astype(np.float64) / DELTA_UNIT).astype(np.int64)
+        return {
+            'first_index': first,
+            'count': last - first,
+            'unit': DELTA_UNIT,
+            'words': [self.word(index) for index in range(first, last)],
+            'start_deltas': np.diff(starts, prepend=0).tolist(),
+            'durations': (ends - starts).tolist()
+        }
+
+    def to_dicts(self, indexes: Optional[Sequence[int]] = None) -> List[dict]:
+        indexes = range(len(self)) if indexes is None else indexes
+        return [self[index].to_dict() for index in indexes]
+
+    def __repr__(self):
+        return f"<WordTimings(words={len(self)}, text_content_id={self.text_content_id})>"
+
+
+class WordTimeIndex:
+    """
+    Answers "which words are sung at time t" for one WordTimings in O(log n)
+
+    Start times are sorted (import validates it), so the words that started
+    by t are a prefix found by bisection. Words may overlap, so a running
+    maximum of end times gives the first word that can still be active - only
+    the few words between the two bounds are checked one by one.
+    """
+
+    def __init__(self, timings: WordTimings):
+        self.timings = timings
+        self.starts = timings.starts
+        self.ends = timings.ends
+        self.max_ends = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    def active(self, time: float) -> List[int]:
+        """
+        Indexes of the words active at `time` (start <= time < end), in start order
+        """
+        # Compare in float32 like the stored times, so t=0.3 finds a word starting at 0.3
+        time = np.float32(time)
+        started = int(np.searchsorted(self.starts, time, side='right'))
+        first = int(np.searchsorted(self.max_ends, time, side='right'))
+        return [index for index in range(first, started) if self.ends[index] > time]
+
+    def upcoming(self, time: float, count: int, window: Optional[float] = None) -> List[int]:
+        """
+        Indexes of up to `count` words starting after `time` (and within `window` seconds of it)
+        """
+        first = int(np.searchsorted(self.starts, np.float32(time), side='right'))
+        last = min(first + count, len(self.starts))
+        if window is not None:
+            last = min(last, int(np.searchsorted(self.starts, np.float32(time + window), side='right')))
+        return list(range(first, last))
+
+    def window(self, start: float, end: float) -> Tuple[int, int]:
+        """
+        Index range [first, last) of the words overlapping [start, end)
+        May include a few earlier words that ended before start, overlapped by a longer word
+        """
+        first = int(np.searchsorted(self.max_ends, np.float32(start), side='right'))
+        last = int(np.searchsorted(self.starts, np.float32(end), side='left'))
+        return first, max(first, last)
@@ -0,0 +1,223 @@
+import csv
+import io
+import json
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+from app import db
+from app.models.models import PackedWordTimestamps, TextContent, WordTimestamp
+from app.utils.playback import word_indexes
+from app.utils.timestamps import WordTimings
+
+# (word, start_time, end_time)
+TimedWords = List[Tuple[str, float, float]]
+
+# Formats accepted by parse_word_timings, with the Content-Types that select them
+TIMING_FORMATS = {
+    'json': ('application/json',),
+    'lrc': ('text/x-lrc', 'application/x-lrc'),
+    'csv': ('text/csv',)
+}
+
+# How long the last word of an LRC file lasts - LRC has no end time for it
+LRC_LAST_WORD_SECONDS = 1.0
+
+LRC_TIME = r'(\d+):(\d+(?:\.\d+)?)'
+LRC_LINE_TAG = re.compile(r'\[' + LRC_TIME + r'\]')
+LRC_WORD_TAG = re.compile(r'<' + LRC_TIME + r'>')
+
+
+def _lrc_seconds(minutes: str, seconds: str) -> float:
+    return int(minutes) * 60 + float(seconds)
+
+def parse_json_timings(data: str) -> TimedWords:
+    """
+    Parse [{"word", "start_time", "end_time"}, ...] ("start"/"end" also work),
+    [[word, start, end], ...] or either of them under a "words" key
+    """
+    items = json.loads(data)
+    if isinstance(items, dict):
+        items = items.get('words')
+    if not isinstance(items, list):
+        raise ValueError('Expected a list of words')
+
+    words = []
+    for number, item in enumerate(items, 1):
+        try:
+            if isinstance(item, dict):
+                words.append((str(item['word']), float(item.get('start_time', item.get('start'))),
+                              float(item.get('end_time', item.get('end')))))
+            else:
+                word, start, end = item
+                words.append((str(word), float(start), float(end)))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Word {number}: expected word, start_time and end_time")
+    return words
+
+def _lrc_line_words(text: str) -> Tuple[List[Tuple[str, Optional[float]]], Optional[float]]:
+    """
+    Split the text of one LRC line into (word, start or None) pairs
+    Returns the pairs and the line's end time if it ends with a word tag ("... word <01:02.50>")
+    """
+    parts = LRC_WORD_TAG.split(text)
+    words = [(word, None) for word in parts[0].split()]
+    end = None
+    for index in range(1, len(parts), 3):
+        start = _lrc_seconds(parts[index], parts[index + 1])
+        tagged = parts[index + 2].split()
+        if tagged:
+            words += [(word, start if position == 0 else None) for position, word in enumerate(tagged)]
+            end = None
+        else:
+            end = start
+    return words, end
+
+def parse_lrc_timings(data: str) -> TimedWords:
+    """
+    Parse LRC lyrics: "[mm:ss.xx] line" and enhanced "[mm:ss.xx] <mm:ss.xx> word <mm:ss.xx> word"
+    Words without their own tag share the time up to the next known start
+    evenly. A word ends where the next one starts, or at a trailing word tag.
+    """
+    lines = []  # (line start, words, line end or None)
+    for line in data.splitlines():
+        tags = LRC_LINE_TAG.findall(line)
+        if not tags:
+            continue  # Metadata tags like [ar:...] and untimed lines
+        words, end = _lrc_line_words(LRC_LINE_TAG.sub('', line))
+        # A line can be repeated at several times: [00:10.00][01:20.00] chorus
+        for minutes, seconds in tags:
+            lines.append((_lrc_seconds(minutes, seconds), words, end))
+    lines.sort(key=lambda line: line[0])
+
+    timed = []  # [word, start, end or None]
+    for number, (line_start, words, line_end) in enumerate(lines):
+        if not words:
+            continue
+        next_line_start = lines[number + 1][0] if number + 1 < len(lines) else None
+
+        # Known starts, with the line start for an untagged first word and the line end as the last anchor
+        anchors = [(index, start) for index, (_, start) in enumerate(words) if start is not None]
+        if not anchors or anchors[0][0] != 0:
+            anchors.insert(0, (0, line_start))
+        boundary = line_end if line_end is not None else next_line_start
+        if boundary is None:
+            boundary = anchors[-1][1] + LRC_LAST_WORD_SECONDS * (len(words) - anchors[-1][0])
+        anchors.append((len(words), boundary))
+
+        starts = []
+        for (index, start), (next_index, next_start) in zip(anchors, anchors[1:]):
+            step = (next_start - start) / (next_index - index)
+            starts += [start + step * offset for offset in range(next_index - index)]
+
+        timed += [[word, start, None] for (word, _), start in zip(words, starts)]
+        if line_end is not None:
+            timed[-1][2] = line_end
+
+    for index, item in enumerate(timed):
+        if item[2] is None:
+            item[2] = timed[index + 1][1] if index + 1 < len(timed) else item[1] + LRC_LAST_WORD_SECONDS
+    return [(word, start, max(start, end)) for word, start, end in timed]
+
+def parse_csv_timings(data: str) -> TimedWords:
+    """
+    Parse CSV rows of word,start_time,end_time
+    A header row naming the columns ("word", "start"/"start_time", "end"/"end_time") may set another order
+    """
+    rows = [row for row in csv.reader(io.StringIO(data)) if row and any(cell.strip() for cell in row)]
+    columns = {'word': 0, 'start': 1, 'end': 2}
+    if rows:
+        header = [cell.strip().lower().replace('_time', '') for cell in rows[0]]
+        if {'word', 'start', 'end'}.issubset(header):
+            columns = {name: header.index(name) for name in columns}
+            rows = rows[1:]
+
+    words = []
+    for number, row in enumerate(rows, 1):
+        try:
+            words.append((row[columns['word']].strip(), float(row[columns['start']]), float(row[columns['end']])))
+        except (IndexError, ValueError):
+            raise ValueError(f"Row {number}: expected word, start_time and end_time")
+    return words
+
+PARSERS = {
+    'json': parse_json_timings,
+    'lrc': parse_lrc_timings,
+    'csv': parse_csv_timings
+}
+
+def timing_format_for(content_type: Optional[str], filename: Optional[str] = None) -> Optional[str]:
+    """
+    Guess the timing format from a Content-Type or a file name
+    """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    for name, content_types in TIMING_FORMATS.items():
+        if content_type in content_types:
+            return name
+    if filename and '.' in filename:
+        extension = filename.rsplit('.', 1)[1].lower()
+        if extension in PARSERS:
+            return extension
+    return None
+
+def validate_word_timings(words: TimedWords):
+    """
+    Check that times are finite and non-negative, every word ends after it
+    starts and words are ordered by start time (they may overlap)
+    Raises ValueError naming the first bad word
+    """
+    previous_start = 0.0
+    for number, (word, start, end) in enumerate(words, 1):
+        if not word:
+            raise ValueError(f"Word {number}: empty word")
+        if not (math.isfinite(start) and math.isfinite(end)) or start < 0:
+            raise ValueError(f"Word {number} ('{word}'): invalid time")
+        if end < start:
+            raise ValueError(f"Word {number} ('{word}'): ends at {end} before it starts at {start}")
+        if start < previous_start:
+            raise ValueError(f"Word {number} ('{word}'): starts at {start}, before the previous word ({previous_start})")
+        previous_start = start
+
+def parse_word_timings(data: str, timing_format: str) -> TimedWords:
+    """
+    Parse and validate a whole text's timings in one of TIMING_FORMATS
+    """
+    if timing_format not in PARSERS:
+        raise ValueError(f"Unknown format '{timing_format}', expected one of: {', '.join(PARSERS)}")
+    words = PARSERS[timing_format](data)
+    if not words:
+        raise ValueError('No timed words found')
+    validate_word_timings(words)
+    return words
+
+def save_word_timings(text: TextContent, words: TimedWords, packed: bool = True) -> Dict:
+    """
+    Replace all word timestamps of a text in one transaction
+
+    By default they are stored as one packed blob; with packed=False as
+    WordTimestamp rows written with a single executemany.
+    Returns a summary dict
+    """
+    try:
+        if packed:
+            text.set_word_timings(WordTimings.from_words(words, text.id))
+        else:
+            WordTimestamp.query.filter_by(text_content_id=text.id).delete(synchronize_session=False)
+            PackedWordTimestamps.query.filter_by(text_content_id=text.id).delete(synchronize_session=False)
+            db.session.execute(WordTimestamp.__table__.insert(), [
+                {'word': word, 'start_time': start, 'end_time': end, 'text_content_id': text.id}
+                for word, start, end in words
+            ])
+        db.session.commit()
+        word_indexes.invalidate(text.id)
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {
+        'text_content_id': text.id,
+        'word_count': len(words),
+        'start_time': words[0][1],
+        'end_time': max(end for _, _, end in words),
+        'storage': 'packed' if packed else 'rows'
+    }
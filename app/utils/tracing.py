@@ -0,0 +1,150 @@
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+# Log levels understood by the tracing helpers (same values as the logging module)
+LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR
+}
+
+# Messages outside of a trace go to this logger
+logger = logging.getLogger('lyraclipmap')
+
+# Trace of the current request (or None) - every thread and asyncio task sees its own value
+_current_trace = contextvars.ContextVar('lyraclipmap_trace', default=None)
+
+
+class Trace:
+    """
+    Collects log messages and stage timings of one request
+
+    A trace can be shared by worker threads started with run_in_context(),
+    so adding records is guarded by a lock.
+    """
+
+    def __init__(self, level: str = 'debug'):
+        self.level = LEVELS[level]
+        self.started = time.perf_counter()
+        self.records = []  # (elapsed seconds, level name, message)
+        self.timings = []  # (stage, name, elapsed seconds)
+        self._lock = threading.Lock()
+
+    def add(self, level: int, message: str):
+        if level < self.level:
+            return
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            self.records.append((elapsed, logging.getLevelName(level), message))
+
+    def add_timing(self, stage: str, name: str, elapsed: float):
+        with self._lock:
+            self.timings.append((stage, name, elapsed))
+
+    def format_log(self) -> str:
+        """
+        Return collected messages as text, one line per message
+        """
+        with self._lock:
+            return "\n".join(f"[+{elapsed:7.3f}s] {level:<7} {message}" for elapsed, level, message in self.records)
+
+    def stage_summary(self) -> Dict[str, Dict]:
+        """
+        Return total time and call count per stage, plus the individual timings
+        """
+        with self._lock:
+            timings = list(self.timings)
+
+        summary = {}
+        for stage_name, name, elapsed in timings:
+            entry = summary.setdefault(stage_name, {'count': 0, 'total_ms': 0.0, 'calls': []})
+            entry['count'] += 1
+            entry['total_ms'] += elapsed * 1000
+            entry['calls'].append({'name': name, 'ms': round(elapsed * 1000, 1)})
+        for entry in summary.values():
+            entry['total_ms'] = round(entry['total_ms'], 1)
+        return summary
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+def tracing_enabled(level: str = 'debug') -> bool:
+    """
+    Check if a message of the given level would be recorded anywhere
+    Use it to skip building expensive debug messages
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        return LEVELS[level] >= trace.level
+    return logger.isEnabledFor(LEVELS[level])
+
+@contextmanager
+def start_trace(level: str = 'debug'):
+    """
+    Collect all messages and timings of the enclosed code in a new Trace
+
+        with start_trace() as trace:
+            lyrics = search_for_lyrics(artist, title)
+        debug_log = trace.format_log()
+    """
+    trace = Trace(level)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+def _log(level: int, message: str, args: tuple):
+    # Arguments are only formatted into the message once we know it is recorded
+    trace = _current_trace.get()
+    if trace is not None:
+        if level >= trace.level:
+            trace.add(level, message % args if args else message)
+    elif logger.isEnabledFor(level):
+        logger.log(level, message, *args)
+
+def debug(message: str, *args):
+    """
+    Log a message, formatted logging-style ("found %s words", count) only if it is recorded
+    """
+    _log(logging.DEBUG, message, args)
+
+def info(message: str, *args):
+    _log(logging.INFO, message, args)
+
+def warning(message: str, *args):
+    _log(logging.WARNING, message, args)
+
+def error(message: str, *args):
+    _log(logging.ERROR, message, args)
+
+@contextmanager
+def stage(stage_name: str, name: str = ''):
+    """
+    Time the enclosed code as a stage ("provider", "http", "parse", ...) of the current trace
+    Does nothing when no trace is active
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_timing(stage_name, name, time.perf_counter() - started)
+
+def run_in_context(func: Callable, *args, **kwargs) -> Callable[[], object]:
+    """
+    Bind a call to a copy of the current context so that a worker thread
+    records into the caller's trace: executor.submit(run_in_context(func, arg))
+    """
+    context = contextvars.copy_context()
+    return lambda: context.run(func, *args, **kwargs)
@@ -0,0 +1,179 @@
+import json
+import os
+from threading import Lock
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.utils.audio import BLOCK_FRAMES, cache_dir_for, file_hash, mono, open_audio
+
+# Frames per window of the finest level; every next level halves the resolution
+BASE_WINDOW = 256
+
+# Levels are added until one has at most this many windows (a whole track at a glance)
+MIN_LEVEL_WINDOWS = 512
+
+# Bumped when the stored layout changes, so old caches are rebuilt
+WAVEFORM_VERSION = 1
+
+
+def _base_envelope(audio, block_frames: int = BLOCK_FRAMES) -> np.ndarray:
+    """
+    RMS and peak of the mono mix per BASE_WINDOW frames, streamed block by block
+    Returns a float32 array of shape (windows, 2): rms, peak
+    """
+    parts = []
+    carry = np.zeros(0, dtype=np.float32)
+    for block in audio.blocks(block_frames):
+        samples = np.concatenate([carry, mono(block)]) if len(carry) else mono(block)
+        count = len(samples) // BASE_WINDOW
+        windows = samples[:count * BASE_WINDOW].reshape(count, BASE_WINDOW)
+        parts.append(np.stack([np.sqrt(np.mean(np.square(windows), axis=1)), np.max(np.abs(windows), axis=1)], axis=1))
+        carry = samples[count * BASE_WINDOW:]
+    if len(carry):
+        parts.append(np.array([[np.sqrt(np.mean(np.square(carry))), np.max(np.abs(carry))]]))
+    if not parts:
+        return np.zeros((0, 2), dtype=np.float32)
+    return np.concatenate(parts).astype(np.float32)
+
+def _halve(level: np.ndarray) -> np.ndarray:
+    """
+    Merge pairs of windows: RMS of the two RMS values (equal lengths), max of the peaks
+    """
+    if len(level) % 2:
+        level = np.concatenate([level, level[-1:]])
+    pairs = level.reshape(-1, 2, 2)
+    return np.stack([np.sqrt(np.mean(np.square(pairs[:, :, 0]), axis=1)), np.max(pairs[:, :, 1], axis=1)], axis=1)
+
+def _save(path: str, array: np.ndarray):
+    tmp_path = path + '.tmp.npy'
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+class Waveform:
+    """
+    The envelope pyramid of one audio file, stored as one .npy file per level
+
+    Level 0 has one (rms, peak) pair per BASE_WINDOW frames, level k per
+    BASE_WINDOW * 2^k frames. Levels are memory-mapped when read, so serving
+    a slice only touches the pages of that slice.
+    """
+
+    def __init__(self, directory: str, meta: Dict):
+        self.directory = directory
+        self.meta = meta
+        self.sample_rate = meta['sample_rate']
+        self.levels = len(meta['levels'])
+        self._arrays = {}
+
+    @classmethod
+    def load(cls, directory: str) -> Optional['Waveform']:
+        try:
+            with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != WAVEFORM_VERSION:
+            return None
+        return cls(directory, meta)
+
+    @property
+    def duration(self) -> float:
+        return self.meta['frames'] / self.sample_rate
+
+    def window_seconds(self, level: int) -> float:
+        return BASE_WINDOW * 2 ** level / self.sample_rate
+
+    def level(self, level: int) -> np.ndarray:
+        if level not in self._arrays:
+            self._arrays[level] = np.load(os.path.join(self.directory, f'level_{level}.npy'), mmap_mode='r')
+        return self._arrays[level]
+
+    def level_for(self, seconds: float, width: int) -> int:
+        """
+        The coarsest level that still has at least `width` windows in `seconds`
+        """
+        for level in range(self.levels - 1, -1, -1):
+            if seconds / self.window_seconds(level) >= width:
+                return level
+        return 0
+
+    def slice(self, start: float = 0.0, end: Optional[float] = None, width: int = 1000,
+              level: Optional[int] = None) -> Dict:
+        """
+        Envelope values between start and end (seconds) at the level matching `width` points
+        """
+        end = self.duration if end is None else min(end, self.duration)
+        start = max(0.0, min(start, end))
+        if level is None:
+            level = self.level_for(end - start, width)
+        level = max(0, min(level, self.levels - 1))
+
+        window = self.window_seconds(level)
+        first = int(start / window)
+        last = int(np.ceil(end / window))
+        values = np.asarray(self.level(level)[first:last])
+        return {
+            'level': level,
+            'window_seconds': window,
+            'start': first * window,
+            'rms': np.round(values[:, 0].astype(float), 4).tolist(),
+            'peak': np.round(values[:, 1].astype(float), 4).tolist()
+        }
+
+
+def build_waveform(path: str, directory: str) -> Waveform:
+    """
+    Decode an audio file once and store all levels of its envelope pyramid in `directory`
+    meta.json is written last, so an interrupted build is simply redone
+    """
+    audio = open_audio(path)
+    base = _base_envelope(audio)
+    os.makedirs(directory, exist_ok=True)
+
+    levels: List[Dict] = []
+    level = base
+    while True:
+        number = len(levels)
+        _save(os.path.join(directory, f'level_{number}.npy'), level)
+        levels.append({'level': number, 'window': BASE_WINDOW * 2 ** number, 'windows': len(level)})
+        if len(level) <= MIN_LEVEL_WINDOWS:
+            break
+        level = _halve(level)
+
+    meta = {
+        'version': WAVEFORM_VERSION,
+        'sample_rate': audio.sample_rate,
+        'channels': audio.channels,
+        # ffmpeg doesn't report the length up front - count it from the envelope
+        'frames': audio.frames if audio.frames is not None else len(base) * BASE_WINDOW,
+        'base_window': BASE_WINDOW,
+        'levels': levels
+    }
+    tmp_path = os.path.join(directory, 'meta.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, 'meta.json'))
+    return Waveform(directory, meta)
+
+
+_build_locks: Dict[str, Lock] = {}
+_build_locks_lock = Lock()
+
+def waveform_for(path: str, build: bool = True) -> Optional[Waveform]:
+    """
+    The waveform of a local audio file, built on first use
+    Results are cached by file content, so renamed or re-added files are not decoded again
+    Returns None when it isn't built yet and build is False
+    """
+    directory = os.path.join(cache_dir_for(file_hash(path)), 'waveform')
+    waveform = Waveform.load(directory)
+    if waveform is not None or not build:
+        return waveform
+
+    with _build_locks_lock:
+        lock = _build_locks.setdefault(directory, Lock())
+    with lock:
+        # Another request may have built it while we waited
+        return Waveform.load(directory) or build_waveform(path, directory)